@@ -0,0 +1,93 @@
+import io
+import pstats
+from collections import Counter
+
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .profiling import CPROFILE, get_profile_store
+
+TOP_FUNCTIONS = 60
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls')
+
+
+def superuser_view(view):
+    """Представление админки, доступное только суперпользователям."""
+    def wrapped(request, *args, **kwargs):
+        if not request.user.is_superuser:
+            raise PermissionDenied
+        return view(request, *args, **kwargs)
+    return admin.site.admin_view(wrapped)
+
+
+def get_profile_or_404(profile_id):
+    found = get_profile_store().get(profile_id)
+    if found is None or not found[1].exists():
+        raise Http404('Профиль не найден или уже вытеснен новыми.')
+    return found
+
+
+def format_cprofile(path, sort):
+    output = io.StringIO()
+    stats = pstats.Stats(str(path), stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(TOP_FUNCTIONS)
+    return output.getvalue()
+
+
+def format_sampling(path):
+    """Сводка свёрнутых стеков: где поток запроса был чаще всего."""
+    own, total = Counter(), 0
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            own[stack.rsplit(';', 1)[-1]] += int(count)
+            total += int(count)
+    lines = [f'Снимков: {total}', '', 'Снимков  Доля  Кадр']
+    for frame, count in own.most_common(TOP_FUNCTIONS):
+        lines.append(f'{count:7d}  {count / total:4.0%}  {frame}')
+    return '\n'.join(lines)
+
+
+def profile_list(request):
+    return TemplateResponse(request, 'admin/api/profiles.html', {
+        **admin.site.each_context(request),
+        'title': 'Профили запросов',
+        'profiles': get_profile_store().list(),
+    })
+
+
+def profile_detail(request, profile_id):
+    meta, data_path = get_profile_or_404(profile_id)
+    sort = request.GET.get('sort')
+    if sort not in SORT_KEYS:
+        sort = SORT_KEYS[0]
+    if meta['kind'] == CPROFILE:
+        report = format_cprofile(data_path, sort)
+    else:
+        report = format_sampling(data_path)
+    return TemplateResponse(request, 'admin/api/profile_detail.html', {
+        **admin.site.each_context(request),
+        'title': f'{meta["method"]} {meta["path"]}',
+        'profile': meta,
+        'report': report,
+        'sort_keys': SORT_KEYS if meta['kind'] == CPROFILE else (),
+        'sort': sort,
+    })
+
+
+def profile_download(request, profile_id):
+    _, data_path = get_profile_or_404(profile_id)
+    return FileResponse(open(data_path, 'rb'), as_attachment=True,
+                        filename=data_path.name)
+
+
+profile_urls = [
+    path('', superuser_view(profile_list), name='list'),
+    path('<str:profile_id>/', superuser_view(profile_detail),
+         name='detail'),
+    path('<str:profile_id>/download/', superuser_view(profile_download),
+         name='download'),
+]
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from recipes.models import Recipe
+
+        from .fragments import recipe_changed
+
+        post_save.connect(recipe_changed, sender=Recipe)
+        post_delete.connect(recipe_changed, sender=Recipe)
@@ -0,0 +1,111 @@
+import base64
+import binascii
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from drf_base64.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+
+from recipes.images import get_variant_url
+
+BASE64_CHUNK_SIZE = 64 * 1024
+
+
+def iter_base64_chunks(encoded, size=BASE64_CHUNK_SIZE):
+    """Куски строки base64 длиной кратной 4, без пробелов и переводов
+    строк (многие клиенты переносят base64 по 76 символов)."""
+    rest = ''
+    for start in range(0, len(encoded), size):
+        chunk = rest + ''.join(encoded[start:start + size].split())
+        aligned = len(chunk) - len(chunk) % 4
+        rest = chunk[aligned:]
+        yield chunk[:aligned]
+    if rest:
+        # Хвост неполной длины: b64decode сообщит об ошибке.
+        yield rest
+
+
+class RecipeImageField(serializers.Field):
+    """Ссылка на производное изображение рецепта нужного размера.
+
+    Пока превью не построены, отдаётся ссылка на исходный файл
+    (для WebP - None).
+    """
+
+    def __init__(self, variant, extension='jpg', **kwargs):
+        self.variant = variant
+        self.extension = extension
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        url = get_variant_url(recipe, self.variant, self.extension)
+        if url is None:
+            if self.extension != 'jpg' or not recipe.image:
+                return None
+            url = recipe.image.url
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+class RecipeImageUploadField(Base64ImageField):
+    """Изображение рецепта: строка base64 или файл multipart/form-data.
+
+    base64 декодируется кусками во временный файл на диске, а размеры
+    картинки проверяются по заголовку до полного декодирования Pillow.
+    """
+
+    default_error_messages = {
+        'invalid_base64': 'Некорректная строка base64.',
+        'too_large': ('Изображение больше допустимого: не более '
+                      '{max_side} px по стороне и {max_pixels} пикселей.'),
+    }
+
+    def _decode(self, data):
+        if isinstance(data, str) and data.startswith('data:'):
+            data = self.decode_base64(data)
+        else:
+            data = super()._decode(data)
+        if hasattr(data, 'read'):
+            self.check_dimensions(data)
+        return data
+
+    def decode_base64(self, data):
+        header, _, encoded = data.partition(';base64,')
+        content_type = header[len('data:'):]
+        extension = content_type.split('/')[-1]
+        upload = TemporaryUploadedFile(
+            name=f'{uuid.uuid4()}.{extension}',
+            content_type=content_type,
+            size=0,
+            charset=None,
+        )
+        try:
+            for chunk in iter_base64_chunks(encoded):
+                upload.write(base64.b64decode(chunk))
+        except (binascii.Error, ValueError):
+            upload.close()
+            self.fail('invalid_base64')
+        upload.size = upload.tell()
+        upload.seek(0)
+        return upload
+
+    def check_dimensions(self, upload):
+        position = upload.tell()
+        try:
+            # Image.open читает только заголовок, пиксели не декодируются.
+            width, height = Image.open(upload).size
+        except Exception:
+            # Не картинка: ошибку вернёт стандартная проверка ImageField.
+            return
+        finally:
+            upload.seek(position)
+        max_side = settings.RECIPE_IMAGE_MAX_SIDE
+        max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+        if max(width, height) > max_side or width * height > max_pixels:
+            self.fail('too_large', max_side=max_side, max_pixels=max_pixels)
@@ -1,6 +1,7 @@
 from django_filters import rest_framework as filters
 
 from recipes.models import Ingredient, Recipe
+from recipes.search import search_recipes
 
 
 class IngredientFilter(filters.FilterSet):
@@ -28,6 +29,10 @@ class RecipeFilter(filters.FilterSet):
         method='get_is_in_shopping_cart',
         label='shopping_cart',
     )
+    search = filters.CharFilter(
+        method='get_search',
+        label='search',
+    )
 
     class Meta:
         model = Recipe
@@ -36,9 +41,12 @@ class RecipeFilter(filters.FilterSet):
             'author',
             'is_favorited',
             'is_in_shopping_cart',
+            'search',
         )
 
     def get_favorite(self, queryset, name, value):
+        if self.request.user.is_anonymous:
+            return queryset.none() if value else queryset
         if value:
             return queryset.filter(in_favorite__user=self.request.user)
         return queryset.exclude(
@@ -46,7 +54,15 @@ class RecipeFilter(filters.FilterSet):
         )
 
     def get_is_in_shopping_cart(self, queryset, name, value):
+        if self.request.user.is_anonymous:
+            return queryset.none() if value else queryset
         if value:
-            return Recipe.objects.filter(
+            return queryset.filter(
                 shopping_recipe__user=self.request.user
             )
+        return queryset.exclude(
+            shopping_recipe__user=self.request.user
+        )
+
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import count_cache
+from recipes.catalogue import get_catalogue_versions
+from recipes.models import Ingredient, Tag
+
+FRAGMENT_KEY = 'recipe-fragment:{}:{}'
+FRAGMENT_VARIANTS = ('list', 'detail')
+USER_FIELDS = ('is_favorited', 'is_in_shopping_cart')
+COUNTER_FIELDS = ('favorites_count', 'in_cart_count')
+IMAGE_FIELDS = ('image', 'image_webp')
+
+
+def get_fragment_key(recipe_id, variant):
+    return FRAGMENT_KEY.format(variant, recipe_id)
+
+
+def get_fragment_stamp(recipe, catalogue_versions):
+    """Состояние рецепта, из которого собран фрагмент.
+
+    Запись в кеше с другим штампом считается устаревшей: так ловятся и
+    изменения в обход сигналов (Recipe.touch, построение превью), и
+    правки автора, тегов и ингредиентов.
+    """
+    author = recipe.author
+    return (
+        recipe.updated_at, recipe.image.name, recipe.image_variants_for,
+        author.email, author.username, author.first_name, author.last_name,
+        *catalogue_versions,
+    )
+
+
+def get_fragments(recipes, variant):
+    """Актуальные фрагменты из кеша: {recipe_id: data}."""
+    versions = get_catalogue_versions(Tag, Ingredient)
+    keys = {get_fragment_key(recipe.pk, variant): recipe for recipe in recipes}
+    fragments = {}
+    for key, (stamp, data) in cache.get_many(keys).items():
+        recipe = keys[key]
+        if stamp == get_fragment_stamp(recipe, versions):
+            fragments[recipe.pk] = data
+    count_cache('recipe_fragment', len(fragments),
+                len(keys) - len(fragments))
+    return fragments
+
+
+def set_fragments(recipes, fragments, variant):
+    versions = get_catalogue_versions(Tag, Ingredient)
+    cache.set_many({
+        get_fragment_key(recipe.pk, variant): (
+            get_fragment_stamp(recipe, versions), fragments[recipe.pk]
+        )
+        for recipe in recipes
+    }, settings.RECIPE_FRAGMENT_CACHE_TIMEOUT)
+
+
+def make_fragment(data):
+    """Убирает из данных рецепта всё, что зависит от пользователя."""
+    fragment = dict(data)
+    for field in USER_FIELDS:
+        fragment[field] = False
+    for field in COUNTER_FIELDS:
+        fragment[field] = 0
+    fragment['author'] = {**fragment['author'], 'is_subscribed': False}
+    return fragment
+
+
+def apply_user_flags(fragment, request, is_favorited, is_in_shopping_cart,
+                     is_subscribed, **counters):
+    """Накладывает флаги пользователя, счётчики рецепта и абсолютные
+    ссылки на фрагмент."""
+    data = {
+        **fragment,
+        **counters,
+        'is_favorited': is_favorited,
+        'is_in_shopping_cart': is_in_shopping_cart,
+        'author': {**fragment['author'], 'is_subscribed': is_subscribed},
+    }
+    if request is not None:
+        for field in IMAGE_FIELDS:
+            if data[field] is not None:
+                data[field] = request.build_absolute_uri(data[field])
+    return data
+
+
+def invalidate_fragments(recipe_id):
+    cache.delete_many([
+        get_fragment_key(recipe_id, variant) for variant in FRAGMENT_VARIANTS
+    ])
+
+
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_fragments(instance.pk)
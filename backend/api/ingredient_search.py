@@ -0,0 +1,97 @@
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from time import monotonic
+
+from django.conf import settings
+
+from recipes.catalogue import get_catalogue_version
+from recipes.models import Ingredient
+
+PREFIX_SENTINEL = chr(0x10FFFF)
+KEY_SEPARATOR = '\n'
+SEARCH_CACHE_SIZE = 1024
+
+
+class IngredientSearchIndex:
+    """Отсортированный массив названий ингредиентов в нижнем регистре.
+
+    Совпадения по началу названия ищутся бинарным поиском и идут первыми,
+    за ними - совпадения по подстроке. Оба списка в алфавитном порядке.
+    Подстроки ищутся через str.find по всем названиям, склеенным
+    в одну строку, а не перебором списка в Python. Ответы на повторные
+    запросы (частые при автодополнении) берутся из LRU-кеша индекса.
+    """
+
+    def __init__(self, ingredients):
+        ingredients = sorted(ingredients, key=lambda item: (
+            item.name.casefold(), item.measurement_unit
+        ))
+        self.ingredients = ingredients
+        self.keys = [ingredient.name.casefold() for ingredient in ingredients]
+        self.haystack = KEY_SEPARATOR.join(self.keys)
+        self.offsets = []
+        offset = 0
+        for key in self.keys:
+            self.offsets.append(offset)
+            offset += len(key) + len(KEY_SEPARATOR)
+        self.search = lru_cache(maxsize=SEARCH_CACHE_SIZE)(self.find)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def find(self, query):
+        query = query.casefold()
+        if not query:
+            return tuple(self.ingredients)
+        start = bisect_left(self.keys, query)
+        end = bisect_left(self.keys, query + PREFIX_SENTINEL, start)
+        return tuple(self.ingredients[start:end]) + tuple(
+            self.find_substring(query)
+        )
+
+    def find_substring(self, query):
+        found = []
+        if KEY_SEPARATOR in query:
+            return found
+        position = self.haystack.find(query)
+        while position != -1:
+            number = bisect_right(self.offsets, position) - 1
+            if position != self.offsets[number]:
+                found.append(self.ingredients[number])
+            if number + 1 == len(self.offsets):
+                break
+            position = self.haystack.find(query, self.offsets[number + 1])
+        return found
+
+
+_index = None
+_index_version = None
+_index_checked_at = None
+
+
+def get_ingredient_index():
+    """Индекс текущего воркера; перестраивается при смене версии.
+
+    Версия справочника читается из базы не чаще раза в
+    INGREDIENT_INDEX_VERSION_TTL секунд, между проверками запросы
+    к базе не идут вовсе. Изменение справочника доходит до воркера
+    с задержкой не больше этого интервала.
+    """
+    global _index, _index_version, _index_checked_at
+    now = monotonic()
+    if _index is not None and (
+        now - _index_checked_at < settings.INGREDIENT_INDEX_VERSION_TTL
+    ):
+        return _index
+    version = get_catalogue_version(Ingredient)
+    if _index is None or version != _index_version:
+        _index = IngredientSearchIndex(
+            Ingredient.objects.only('id', 'name', 'measurement_unit')
+        )
+        _index_version = version
+    _index_checked_at = now
+    return _index
+
+
+def search_ingredients(query):
+    return get_ingredient_index().search(query)
@@ -0,0 +1,78 @@
+import csv
+import timeit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.filters import IngredientFilter
+from api.ingredient_search import IngredientSearchIndex
+from recipes.models import Ingredient
+
+DEFAULT_PATH = settings.BASE_DIR.parent / 'data' / 'ingredients.csv'
+DEFAULT_QUERIES = ('а', 'мо', 'сыр', 'кар', 'соль', 'перец', 'яйц')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск ингредиентов по индексу в памяти '
+            'с фильтром name__istartswith в базе. Замер идёт на временной '
+            'тестовой базе, рабочая не затрагивается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=DEFAULT_PATH,
+                            help='CSV-файл справочника ингредиентов.')
+        parser.add_argument('--repeat', type=int, default=200,
+                            help='Сколько раз повторять каждый запрос.')
+        parser.add_argument('queries', nargs='*', default=DEFAULT_QUERIES)
+
+    def handle(self, *args, **options):
+        with open(options['path'], encoding='utf-8') as file:
+            ingredients = [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in csv.reader(file)
+            ]
+        # Справочник грузится в тестовую базу, как у manage.py test:
+        # на рабочей замена ингредиентов каскадом задела бы рецепты
+        # и держала бы блокировки на всё время замера.
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            Ingredient.objects.bulk_create(ingredients)
+            self.run(options['queries'], options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, queries, repeat):
+        build_time = timeit.timeit(
+            lambda: IngredientSearchIndex(Ingredient.objects.all()), number=1
+        )
+        index = IngredientSearchIndex(Ingredient.objects.all())
+        self.stdout.write(
+            f'Ингредиентов: {len(index)}, индекс построен '
+            f'за {build_time * 1000:.1f} мс'
+        )
+        self.stdout.write(
+            f'{"запрос":<10}{"индекс, мкс":>14}{"найдено":>10}'
+            f'{"база, мкс":>14}{"найдено":>10}{"ускорение":>12}'
+        )
+        for query in queries:
+            index_time = timeit.timeit(
+                lambda: index.find(query), number=repeat
+            ) / repeat
+            db_time = timeit.timeit(
+                lambda: list(IngredientFilter(
+                    {'name': query}, queryset=Ingredient.objects.all()
+                ).qs),
+                number=repeat,
+            ) / repeat
+            db_found = IngredientFilter(
+                {'name': query}, queryset=Ingredient.objects.all()
+            ).qs.count()
+            self.stdout.write(
+                f'{query:<10}{index_time * 1e6:>14.1f}'
+                f'{len(index.find(query)):>10}'
+                f'{db_time * 1e6:>14.1f}{db_found:>10}'
+                f'{db_time / index_time:>11.1f}x'
+            )
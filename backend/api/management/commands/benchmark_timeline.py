@@ -0,0 +1,136 @@
+import json
+import statistics
+import time
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+
+from recipes.management.commands.seed_perf_data import batches
+from recipes.models import Recipe, TimelineEntry
+from recipes.timeline import FANOUT, JOIN, rebuild_timeline
+from users.models import Follow, User
+
+SIZES = (10, 1000, 10000)
+URL = '/api/recipes/timeline/?limit={}'
+
+
+class Command(BaseCommand):
+    help = ('Замеряет ленту подписок для читателя, подписанного на 10, '
+            '1000 и 10000 авторов, в режимах join и fanout. Данные '
+            'создаются в транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int,
+                            default=list(SIZES),
+                            help='Сколько авторов в подписках.')
+        parser.add_argument('--recipes-per-author', type=int, default=5)
+        parser.add_argument('--requests', type=int, default=20,
+                            help='Повторов каждого замера.')
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--depth', type=int, default=20,
+                            help='Номер страницы для замера глубокой '
+                                 'страницы.')
+        parser.add_argument('--output', default=None,
+                            help='Файл для результатов в JSON.')
+
+    def handle(self, *args, **options):
+        sizes = sorted(options['sizes'])
+        with transaction.atomic():
+            reader, authors = self.create_data(
+                max(sizes), options['recipes_per_author']
+            )
+            client = Client(HTTP_AUTHORIZATION='Token {}'.format(
+                Token.objects.create(user=reader).key
+            ))
+            results = []
+            followed = 0
+            for size in sizes:
+                Follow.objects.bulk_create([
+                    Follow(user=reader, author_id=author_id)
+                    for author_id in authors[followed:size]
+                ])
+                followed = size
+                rebuild_timeline([reader.id])
+                for backend in (JOIN, FANOUT):
+                    with override_settings(TIMELINE_BACKEND=backend):
+                        result = self.measure(client, options)
+                    result.update(following=size, backend=backend)
+                    results.append(result)
+                    self.stdout.write(self.format_row(result))
+            transaction.set_rollback(True)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'database': connection.vendor,
+                    'options': {key: options[key] for key in (
+                        'sizes', 'recipes_per_author', 'requests', 'limit',
+                        'depth',
+                    )},
+                    'results': results,
+                }, file, ensure_ascii=False, indent=2)
+
+    def create_data(self, authors_count, recipes_per_author):
+        run = uuid4().hex[:6]
+        prefix = f'timeline_{run}_'
+        User.objects.bulk_create([
+            User(username=f'{prefix}{number}',
+                 email=f'{prefix}{number}@example.com')
+            for number in range(authors_count + 1)
+        ])
+        user_ids = list(User.objects.filter(
+            username__startswith=prefix
+        ).order_by('id').values_list('id', flat=True))
+        reader_id, authors = user_ids[0], user_ids[1:]
+        # Рецепты авторов перемешаны по времени, как в живой базе.
+        recipes = (
+            Recipe(author_id=author_id, name=f'{prefix}{number}_{author_id}',
+                   text='-', cooking_time=10, image='recipes/timeline.jpg')
+            for number in range(recipes_per_author)
+            for author_id in authors
+        )
+        for batch in batches(recipes):
+            Recipe.objects.bulk_create(batch)
+        return User.objects.get(pk=reader_id), authors
+
+    def measure(self, client, options):
+        url = URL.format(options['limit'])
+        # Ссылка на глубокую страницу берётся из цепочки next.
+        deep_url = url
+        for _ in range(options['depth'] - 1):
+            deep_url = client.get(deep_url).json()['next']
+            if deep_url is None:
+                break
+        result = {'timeline_rows': TimelineEntry.objects.count()}
+        for name, page_url in (('first', url), ('deep', deep_url)):
+            if page_url is None:
+                continue
+            # Прогрев: кеш фрагментов заполняется первым запросом.
+            client.get(page_url)
+            latencies = []
+            for _ in range(options['requests']):
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(page_url)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(
+                        f'{page_url}: {response.status_code} '
+                        f'{response.content[:200]!r}'
+                    )
+            result[f'{name}_ms'] = round(
+                statistics.median(latencies) * 1000, 2
+            )
+            result[f'{name}_queries'] = len(queries)
+        return result
+
+    @staticmethod
+    def format_row(result):
+        deep = (f'{result["deep_ms"]} мс' if 'deep_ms' in result
+                else 'нет страницы')
+        return (f'{result["following"]:>6} подписок, {result["backend"]:>6}: '
+                f'первая страница {result["first_ms"]} мс '
+                f'({result["first_queries"]} SQL), глубокая {deep}')
@@ -0,0 +1,47 @@
+import json
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.recipe_import import CHUNK_SIZE, import_recipes
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Импортирует рецепты из NDJSON-файла (одна строка - один рецепт).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON-файл или - для stdin.')
+        parser.add_argument('--author', required=True,
+                            help='username автора рецептов.')
+        parser.add_argument('--workers', type=int,
+                            default=settings.RECIPE_IMPORT_WORKERS,
+                            help='Процессов для декодирования изображений.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Строк в одной пачке.')
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options['author'])
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {options["author"]} не найден.')
+        if options['path'] == '-':
+            report = self.run(sys.stdin, author, options)
+        else:
+            with open(options['path'], encoding='utf-8') as file:
+                report = self.run(file, author, options)
+        for error in report['errors']:
+            self.stderr.write(
+                f'Строка {error["line"]}: '
+                f'{json.dumps(error["errors"], ensure_ascii=False)}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано рецептов: {report["created"]}, '
+            f'строк с ошибками: {len(report["errors"])}.'
+        ))
+
+    @staticmethod
+    def run(lines, author, options):
+        return import_recipes(lines, author, workers=options['workers'],
+                              chunk_size=options['chunk_size'])
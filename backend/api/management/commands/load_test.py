@@ -0,0 +1,192 @@
+import argparse
+import json
+import math
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+PERCENTILES = (50, 95, 99)
+
+
+def recipes_url(rng, prefixes):
+    return f'/api/recipes/?page={rng.randint(1, 10)}&limit=6'
+
+
+def shopping_cart_url(rng, prefixes):
+    return '/api/recipes/download_shopping_cart/'
+
+
+def subscriptions_url(rng, prefixes):
+    return '/api/users/subscriptions/?recipes_limit=3'
+
+
+def ingredients_url(rng, prefixes):
+    return f'/api/ingredients/?name={rng.choice(prefixes)}'
+
+
+SCENARIOS = {
+    'recipes': recipes_url,
+    'download_shopping_cart': shopping_cart_url,
+    'subscriptions': subscriptions_url,
+    'ingredients': ingredients_url,
+}
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'нужно число >= 1, а не {value}')
+    return number
+
+
+def non_negative_int(value):
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f'нужно число >= 0, а не {value}')
+    return number
+
+
+def percentile(sorted_values, percent):
+    """Перцентиль методом ближайшего ранга."""
+    index = max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    summary = {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2),
+    }
+    for percent in PERCENTILES:
+        summary[f'p{percent}_ms'] = round(
+            percentile(latencies, percent) * 1000, 2
+        )
+    return summary
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест API внутри процесса: запросы идут через '
+            'настоящие URL, middleware и представления. Результаты '
+            'пишутся в JSON для сравнения запусков.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS,
+                            default=list(SCENARIOS))
+        parser.add_argument('--requests', type=positive_int, default=200,
+                            help='Запросов на сценарий.')
+        parser.add_argument('--warmup', type=non_negative_int, default=10,
+                            help='Запросов на прогрев, не учитываются.')
+        parser.add_argument('--concurrency', type=positive_int, default=1,
+                            help='Параллельных потоков.')
+        parser.add_argument('--users', type=positive_int, default=20,
+                            help='Сколько пользователей с корзинами '
+                                 'и подписками чередовать.')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--output', default=None,
+                            help='Файл результатов; по умолчанию '
+                                 'load-test-<время>.json.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        users = list(User.objects.filter(
+            shopping_user__isnull=False, follower__isnull=False,
+        ).distinct().order_by('id')[:options['users']])
+        if not users:
+            raise CommandError(
+                'Нет пользователей с корзиной и подписками: '
+                'сначала выполните seed_perf_data.'
+            )
+        tokens = [Token.objects.get_or_create(user=user)[0].key
+                  for user in users]
+        prefixes = sorted({
+            name[:length]
+            for name in Ingredient.objects.values_list('name', flat=True)
+            for length in (1, 2, 3) if len(name) >= length
+        })
+        started_at = datetime.now(timezone.utc)
+        results = {}
+        for name in options['scenarios']:
+            make_url = SCENARIOS[name]
+            requests = [
+                (rng.choice(tokens), make_url(rng, prefixes))
+                for _ in range(options['warmup'] + options['requests'])
+            ]
+            self.run_requests(requests[:options['warmup']], options)
+            results[name] = self.run_requests(
+                requests[options['warmup']:], options
+            )
+            self.stdout.write(self.format_row(name, results[name]))
+        report = {
+            'started_at': started_at.isoformat(),
+            'database': connection.vendor,
+            'dataset': {
+                'users': User.objects.count(),
+                'recipes': Recipe.objects.count(),
+                'ingredients': Ingredient.objects.count(),
+            },
+            'options': {
+                key: options[key] for key in
+                ('scenarios', 'requests', 'warmup', 'concurrency', 'users',
+                 'seed')
+            },
+            'results': results,
+        }
+        output = options['output'] or (
+            f'load-test-{started_at:%Y%m%d-%H%M%S}.json'
+        )
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Результаты: {output}'))
+
+    @staticmethod
+    def send(request):
+        token, url = request
+        client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+        started = time.perf_counter()
+        response = client.get(url)
+        # Потоковые ответы (список покупок) читаются до конца, иначе
+        # замер не включал бы их формирование.
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        else:
+            response.content
+        response.close()
+        return time.perf_counter() - started, response.status_code
+
+    def run_requests(self, requests, options):
+        if not requests:
+            return None
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            outcomes = list(pool.map(self.send, requests))
+        elapsed = time.perf_counter() - started
+        return summarize(
+            [latency for latency, _ in outcomes],
+            sum(1 for _, status in outcomes if status >= 400),
+            elapsed,
+        )
+
+    @staticmethod
+    def format_row(name, result):
+        percentiles = ' '.join(
+            f'p{percent}={result[f"p{percent}_ms"]}мс'
+            for percent in PERCENTILES
+        )
+        return (f'{name}: {result["requests"]} запросов, '
+                f'{result["throughput_rps"]} rps, {percentiles}, '
+                f'ошибок {result["errors"]}')
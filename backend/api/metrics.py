@@ -0,0 +1,285 @@
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+from time import monotonic
+from uuid import uuid4
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    'foodgram_request_duration_seconds': (
+        'Полное время обработки запроса.', LATENCY_BUCKETS,
+    ),
+    'foodgram_request_db_seconds': (
+        'Время запросов к базе за запрос.', LATENCY_BUCKETS,
+    ),
+    'foodgram_request_renderer_seconds': (
+        'Время рендерера DRF: кодирование готовых данных в JSON. '
+        'Сериализаторы работают в представлении и сюда не входят.',
+        LATENCY_BUCKETS,
+    ),
+    'foodgram_request_queries': (
+        'Число SQL-запросов за запрос.', QUERY_BUCKETS,
+    ),
+    'foodgram_response_size_bytes': (
+        'Размер тела ответа.', SIZE_BUCKETS,
+    ),
+}
+COUNTERS = {
+    'foodgram_requests_total': 'Запросы по представлениям и статусам.',
+    'foodgram_cache_requests_total': 'Обращения к кешам: hit и miss.',
+}
+LABELS = {
+    'foodgram_requests_total': ('view', 'method', 'status'),
+    'foodgram_cache_requests_total': ('cache', 'result'),
+}
+REQUEST_LABELS = ('view', 'method')
+ARCHIVE_NAME = 'archive.json'
+LOCK_NAME = '.lock'
+
+logger = logging.getLogger(__name__)
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Registry:
+    """Метрики одного процесса: гистограммы и счётчики в памяти."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # {(метрика, метки): [счётчики корзин..., +Inf, сумма]}
+        self.histograms = {}
+        self.counters = defaultdict(int)
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        with self.lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[name, labels] = (
+                    [0] * (len(buckets) + 1) + [0.0]
+                )
+            histogram[bisect_left(buckets, value)] += 1
+            histogram[-1] += value
+
+    def inc(self, name, labels, amount=1):
+        if amount:
+            with self.lock:
+                self.counters[name, labels] += amount
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'histograms': [[name, list(labels), list(values)]
+                               for (name, labels), values
+                               in self.histograms.items()],
+                'counters': [[name, list(labels), value]
+                             for (name, labels), value
+                             in self.counters.items()],
+            }
+
+
+class FileMetricsStore:
+    """Снимки метрик воркеров в файлах общего каталога.
+
+    Каждый процесс пишет свой файл {pid}-{id}.json атомарной заменой;
+    эндпоинт метрик суммирует все файлы. Файлы завершившихся воркеров
+    сливаются в один архивный, поэтому счётчики не уменьшаются при
+    перезапуске воркера, а число файлов не растёт.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.path = self.directory / f'{os.getpid()}-{uuid4().hex[:8]}.json'
+
+    def write_to(self, path, snapshot):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+                'w', dir=self.directory, suffix='.tmp',
+                delete=False) as file:
+            json.dump(snapshot, file)
+        os.replace(file.name, path)
+
+    def write(self, snapshot):
+        self.write_to(self.path, snapshot)
+
+    @staticmethod
+    def read(path):
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            # Файл удалили между glob и чтением.
+            return None
+
+    def read_all(self):
+        if not self.directory.exists():
+            return []
+        snapshots = (self.read(path) for path in self.directory.glob('*.json'))
+        return [snapshot for snapshot in snapshots if snapshot is not None]
+
+    def get_dead_files(self):
+        dead = []
+        for path in self.directory.glob('*-*.json'):
+            pid = path.stem.split('-')[0]
+            if pid.isdigit() and not is_alive(int(pid)):
+                dead.append(path)
+        return dead
+
+    def archive_dead(self):
+        """Сливает файлы завершившихся процессов в archive.json.
+
+        Блокировка не даёт двум процессам слить один файл дважды.
+        Каталог должен быть общим только для процессов одной машины.
+        """
+        if not self.directory.exists():
+            return
+        with open(self.directory / LOCK_NAME, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            dead = self.get_dead_files()
+            if not dead:
+                return
+            archive = self.directory / ARCHIVE_NAME
+            snapshots = [self.read(path) for path in (archive, *dead)]
+            self.write_to(archive, to_snapshot(*merge(
+                snapshot for snapshot in snapshots if snapshot is not None
+            )))
+            for path in dead:
+                path.unlink()
+
+
+registry = Registry()
+_store = None
+_last_flush = 0.0
+_flush_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None or _store.path.parent != Path(settings.METRICS_DIR):
+        _store = FileMetricsStore(settings.METRICS_DIR)
+    return _store
+
+
+def flush(force=False):
+    """Сохраняет снимок процесса не чаще METRICS_FLUSH_INTERVAL.
+
+    Ошибка записи (нет каталога, нет прав) не должна ломать запрос:
+    она пишется в лог, снимок попробуем сохранить в следующий раз.
+    """
+    global _last_flush
+    now = monotonic()
+    if not force and now - _last_flush < settings.METRICS_FLUSH_INTERVAL:
+        return
+    with _flush_lock:
+        _last_flush = now
+        try:
+            get_store().write(registry.snapshot())
+        except OSError:
+            logger.exception('Не удалось сохранить метрики в %s',
+                             settings.METRICS_DIR)
+
+
+def observe_request(view, method, status, duration, db_duration,
+                    render_duration, queries, size):
+    labels = (view, method)
+    registry.observe('foodgram_request_duration_seconds', labels, duration)
+    registry.observe('foodgram_request_db_seconds', labels, db_duration)
+    registry.observe('foodgram_request_renderer_seconds', labels,
+                     render_duration)
+    registry.observe('foodgram_request_queries', labels, queries)
+    if size is not None:
+        registry.observe('foodgram_response_size_bytes', labels, size)
+    registry.inc('foodgram_requests_total', (view, method, str(status)))
+    flush()
+
+
+def count_cache(cache, hits=0, misses=0):
+    """Учитывает попадания и промахи кеша cache, если метрики включены."""
+    if not settings.METRICS_ENABLED:
+        return
+    registry.inc('foodgram_cache_requests_total', (cache, 'hit'), hits)
+    registry.inc('foodgram_cache_requests_total', (cache, 'miss'), misses)
+
+
+def merge(snapshots):
+    histograms, counters = {}, defaultdict(int)
+    for snapshot in snapshots:
+        for name, labels, values in snapshot['histograms']:
+            key = (name, tuple(labels))
+            merged = histograms.setdefault(key, [0] * len(values))
+            for index, value in enumerate(values):
+                merged[index] += value
+        for name, labels, value in snapshot['counters']:
+            counters[name, tuple(labels)] += value
+    return histograms, counters
+
+
+def to_snapshot(histograms, counters):
+    return {
+        'histograms': [[name, list(labels), values]
+                       for (name, labels), values in histograms.items()],
+        'counters': [[name, list(labels), value]
+                     for (name, labels), value in counters.items()],
+    }
+
+
+def format_labels(names, values, **extra):
+    pairs = [*zip(names, values), *extra.items()]
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def render_prometheus():
+    """Метрики всех воркеров в текстовом формате Prometheus."""
+    flush(force=True)
+    store = get_store()
+    try:
+        store.archive_dead()
+    except OSError:
+        logger.exception('Не удалось слить метрики завершившихся процессов')
+    histograms, counters = merge(store.read_all())
+    lines = []
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {description}',
+                  f'# TYPE {name} histogram']
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), values):
+                cumulative += count
+                bucket_labels = format_labels(REQUEST_LABELS, labels,
+                                              le=bound)
+                lines.append(f'{name}_bucket{bucket_labels} {cumulative}')
+            label_text = format_labels(REQUEST_LABELS, labels)
+            lines.append(f'{name}_sum{label_text} {values[-1]}')
+            lines.append(f'{name}_count{label_text} {cumulative}')
+    for name, description in COUNTERS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(
+                    f'{name}{format_labels(LABELS[name], labels)} {value}'
+                )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,141 @@
+import logging
+import random
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def get_view_name(request, default=None):
+    """Имя представления вида RecipesViewSet.list или follow_author.
+
+    Без представления (404 до роутинга) - default или путь запроса.
+    """
+    view = getattr(request, 'timing_view', None)
+    if view is None:
+        return default or request.path
+    view_class = getattr(view, 'cls', None)
+    if view_class is None:
+        return f'{view.__module__}.{view.__qualname__}'
+    method = request.method.lower()
+    actions = getattr(view, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+class QueryTimer:
+    """execute_wrapper: считает запросы к базе и время их выполнения."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += perf_counter() - started
+
+
+class QueryTimingMiddleware:
+    """Число запросов и время базы для доли запросов к сайту.
+
+    Замеряется доля REQUEST_TIMING_SAMPLE_RATE запросов (0 - выключено:
+    на остальных middleware только сравнивает случайное число). Замер
+    уходит в заголовок Server-Timing, а при превышении
+    REQUEST_QUERY_BUDGET запросов или REQUEST_TIME_BUDGET_MS миллисекунд
+    пишется предупреждение с именем представления. Запросы, сделанные
+    при чтении потокового ответа, в замер не попадают.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_TIMING_SAMPLE_RATE
+        self.query_budget = settings.REQUEST_QUERY_BUDGET
+        self.time_budget = settings.REQUEST_TIME_BUDGET_MS / 1000
+
+    def __call__(self, request):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return self.get_response(request)
+        timer = QueryTimer()
+        started = perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = perf_counter() - started
+        response['Server-Timing'] = (
+            f'db;dur={timer.duration * 1000:.1f};'
+            f'desc="{timer.count} queries", '
+            f'total;dur={duration * 1000:.1f}'
+        )
+        if timer.count > self.query_budget or duration > self.time_budget:
+            logger.warning(
+                '%s %s (%s): %.0f ms, %d SQL queries, %.0f ms in DB',
+                request.method, request.path, get_view_name(request),
+                duration * 1000, timer.count, timer.duration * 1000,
+            )
+        return response
+
+    @staticmethod
+    def process_view(request, view_func, view_args, view_kwargs):
+        request.timing_view = view_func
+
+
+class MetricsMiddleware:
+    """Метрики каждого запроса для эндпоинта /api/metrics/.
+
+    Пишет полное время, время базы, время рендерера DRF, число
+    SQL-запросов и размер ответа с метками «представление, метод».
+    Сериализаторы DRF работают внутри представления, поэтому их время
+    входит в полное, а не во время рендерера. Имя представления берётся
+    из QueryTimingMiddleware, которая должна стоять раньше.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        request.metrics_render_time = 0.0
+        started = perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = perf_counter() - started
+        metrics.observe_request(
+            get_view_name(request, default='unmatched'), request.method,
+            response.status_code, duration, timer.duration,
+            request.metrics_render_time, timer.count,
+            self.get_size(response),
+        )
+        return response
+
+    @staticmethod
+    def process_template_response(request, response):
+        # Ответы DRF рендерятся после всех process_template_response.
+        started = perf_counter()
+
+        def finish(response):
+            request.metrics_render_time = perf_counter() - started
+
+        response.add_post_render_callback(finish)
+        return response
+
+    @staticmethod
+    def get_size(response):
+        if response.has_header('Content-Length'):
+            return int(response['Content-Length'])
+        if response.streaming:
+            return None
+        return len(response.content)
@@ -0,0 +1,92 @@
+import gzip
+import hashlib
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from .metrics import count_cache
+from recipes.catalogue import get_catalogue_version
+
+GZIP_LEVEL = 6
+
+_catalogue_blobs = {}
+
+
+def accepts_gzip(accept_encoding):
+    """Разрешён ли gzip заголовком Accept-Encoding (gzip;q=0 - нет)."""
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, *params = (part.strip() for part in item.split(';'))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    quality = qualities.get('gzip', qualities.get('*', 0.0))
+    return quality > 0
+
+
+class CatalogueBlob:
+    """Готовый JSON справочника: исходный, сжатый gzip и их ETag."""
+
+    def __init__(self, version, data):
+        self.version = version
+        self.body = JSONRenderer().render(data)
+        self.gzipped_body = gzip.compress(self.body, GZIP_LEVEL)
+        digest = hashlib.sha1(self.body).hexdigest()
+        self.etag = f'"{digest}"'
+        self.gzipped_etag = f'"{digest}-gzip"'
+
+
+class CatalogueCacheMixin:
+    """Отдаёт полный список справочника из памяти воркера.
+
+    JSON сериализуется и сжимается один раз на версию справочника
+    (recipes.catalogue), ответ несёт строгий ETag, а If-None-Match
+    с совпадающим ETag получает 304. Запрос к базе один - за версией.
+    """
+
+    def get_catalogue_blob(self):
+        model = self.queryset.model
+        version = get_catalogue_version(model)
+        blob = _catalogue_blobs.get(model)
+        hit = blob is not None and blob.version == version
+        count_cache('catalogue', int(hit), int(not hit))
+        if not hit:
+            data = self.get_serializer(self.get_queryset(), many=True).data
+            blob = _catalogue_blobs[model] = CatalogueBlob(version, data)
+        return blob
+
+    def catalogue_response(self, request):
+        blob = self.get_catalogue_blob()
+        use_gzip = accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        etag = blob.gzipped_etag if use_gzip else blob.etag
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = {
+                tag[2:] if tag.startswith('W/') else tag
+                for tag in parse_etags(if_none_match)
+            }
+            if '*' in etags or etag in etags:
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                patch_vary_headers(response, ('Accept-Encoding',))
+                return response
+        if use_gzip:
+            response = HttpResponse(blob.gzipped_body,
+                                    content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(blob.body,
+                                    content_type='application/json')
+        response['Content-Length'] = len(response.content)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, no-cache'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
@@ -1,6 +1,46 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+PAGE_SIZE = 6
+MAX_PAGE_SIZE = 100
+
+
+class LimitCursorPaginator(CursorPagination):
+    """Пагинация по курсору: без OFFSET и COUNT(*), на любой глубине."""
+
+    page_size = PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    ordering = '-id'
 
 
 class LimitPageNumberPaginator(PageNumberPagination):
-    page_size = 6
+    """Постраничная пагинация с переключением на курсор.
+
+    Курсорный режим включается параметром ?pagination=cursor; он же
+    сохраняется в ссылках next/previous вместе с параметром cursor.
+    Порядок курсора по умолчанию -id; представление с другим порядком
+    задаёт его атрибутом cursor_ordering.
+    """
+
+    page_size = PAGE_SIZE
     page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    mode_query_param = 'pagination'
+    cursor_paginator_class = LimitCursorPaginator
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.mode_query_param) == 'cursor':
+            self.cursor_paginator = self.cursor_paginator_class()
+            ordering = getattr(view, 'cursor_ordering', None)
+            if ordering is not None:
+                self.cursor_paginator.ordering = ordering
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,10 @@
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """NDJSON: тело запроса отдаётся потоком строк, без чтения в память."""
+
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return stream if stream is not None else ()
@@ -0,0 +1,216 @@
+import cProfile
+import json
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from uuid import uuid4
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .middleware import get_view_name
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_QUERY_PARAM = 'profile'
+CPROFILE = 'cprofile'
+SAMPLING = 'sampling'
+EXTENSIONS = {CPROFILE: 'prof', SAMPLING: 'txt'}
+PROFILE_ID_RE = re.compile(r'^[\w-]+$')
+
+
+class SamplingProfiler:
+    """Профилировщик по стенным часам.
+
+    Раз в interval секунд снимает стек потока запроса. Результат -
+    свёрнутые стеки в формате flamegraph.pl: «кадр;кадр;кадр число».
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread_id = None
+        self.thread = None
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} '
+                             f'({code.co_filename}:{frame.f_lineno})')
+                frame = frame.f_back
+            # Снимок, сделанный уже во время stop(), показал бы ожидание
+            # самого профилировщика.
+            if stack and not self.stopped.is_set():
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+class ProfileStore:
+    """Кольцевой буфер профилей на диске.
+
+    Хранится не больше max_entries последних профилей, старые удаляются
+    при записи новых. Каждый профиль - файл данных (.prof для cProfile,
+    .txt для свёрнутых стеков) и описание в .json рядом.
+    """
+
+    def __init__(self, directory, max_entries):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+
+    def new_id(self):
+        return f'{datetime.now():%Y%m%d-%H%M%S-%f}-{uuid4().hex[:6]}'
+
+    def get_data_path(self, profile_id, kind):
+        return self.directory / f'{profile_id}.{EXTENSIONS[kind]}'
+
+    def save(self, profile_id, meta, dump):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        dump(self.get_data_path(profile_id, meta['kind']))
+        meta_path = self.directory / f'{profile_id}.json'
+        meta_path.write_text(json.dumps(meta, ensure_ascii=False))
+        self.prune()
+
+    def prune(self):
+        for meta_path in sorted(self.directory.glob('*.json'))[
+                :-self.max_entries]:
+            for path in self.directory.glob(f'{meta_path.stem}.*'):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    # Тот же профиль мог удалить соседний воркер.
+                    pass
+
+    def list(self):
+        if not self.directory.exists():
+            return []
+        return [
+            self.read_meta(meta_path)
+            for meta_path in sorted(self.directory.glob('*.json'),
+                                    reverse=True)
+        ]
+
+    @staticmethod
+    def read_meta(meta_path):
+        meta = json.loads(meta_path.read_text())
+        meta['id'] = meta_path.stem
+        return meta
+
+    def get(self, profile_id):
+        """Описание и путь к данным профиля или None."""
+        if not PROFILE_ID_RE.match(profile_id):
+            return None
+        meta_path = self.directory / f'{profile_id}.json'
+        if not meta_path.exists():
+            return None
+        meta = self.read_meta(meta_path)
+        return meta, self.get_data_path(profile_id, meta['kind'])
+
+
+def get_profile_store():
+    return ProfileStore(settings.PROFILING_DIR,
+                        settings.PROFILING_MAX_ENTRIES)
+
+
+def get_requested_mode(request):
+    """Режим профилирования из заголовка X-Profile или ?profile=.
+
+    Для обычных запросов - одна проверка словаря и строки.
+    """
+    value = request.META.get(PROFILE_HEADER)
+    if value is None:
+        if f'{PROFILE_QUERY_PARAM}=' not in request.META.get(
+                'QUERY_STRING', ''):
+            return None
+        value = request.GET.get(PROFILE_QUERY_PARAM)
+        if value is None:
+            return None
+    return SAMPLING if value == SAMPLING else CPROFILE
+
+
+def is_superuser(request):
+    """Суперпользователь по сессии (админка) или по токену API."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_superuser:
+        return True
+    try:
+        authenticated = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return authenticated is not None and authenticated[0].is_superuser
+
+
+class ProfilingMiddleware:
+    """Профилирование отдельного запроса по требованию суперпользователя.
+
+    Заголовок X-Profile: 1 (или ?profile=1) включает cProfile, значение
+    sampling - профилировщик по стенным часам; он же используется, если
+    cProfile включить не удалось (активен другой профилировщик).
+    Результат сохраняется в ProfileStore, его id возвращается
+    в заголовке X-Profile-Id и виден в админке (/admin/profiles/).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = get_requested_mode(request)
+        if mode is None or not is_superuser(request):
+            return self.get_response(request)
+        store = get_profile_store()
+        profile_id = store.new_id()
+        started = perf_counter()
+        response, kind, dump = self.run_profiled(request, mode)
+        duration = perf_counter() - started
+        store.save(profile_id, {
+            'kind': kind,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': get_view_name(request),
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 1),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+        }, dump)
+        response['X-Profile-Id'] = profile_id
+        return response
+
+    def run_profiled(self, request, mode):
+        if mode == CPROFILE:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                pass
+            else:
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profiler.disable()
+                return response, CPROFILE, profiler.dump_stats
+        profiler = SamplingProfiler(settings.PROFILING_SAMPLE_INTERVAL)
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        return response, SAMPLING, profiler.dump
@@ -0,0 +1,248 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, connection, connections, transaction
+from rest_framework.settings import api_settings
+
+from recipes.counters import change_counter
+from recipes.images import decode_image_to_file, schedule_variants
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.search import update_search_index
+from recipes.timeline import fan_out_recipes, is_fanout
+from users.models import User
+
+from .serializers import RecipeImportSerializer
+
+CHUNK_SIZE = 200
+CONFLICT_ERROR = ('Строку не удалось сохранить: рецепт с таким названием '
+                  'появился во время импорта.')
+NON_FIELD_ERRORS = api_settings.NON_FIELD_ERRORS_KEY
+
+
+def row_error(number, errors):
+    if not isinstance(errors, dict):
+        errors = {NON_FIELD_ERRORS: [errors]}
+    return {'line': number, 'errors': errors}
+
+
+def iter_rows(lines):
+    """Пары (номер строки, текст); пустые строки пропускаются."""
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            yield number, line
+
+
+def parse_rows(rows, errors):
+    parsed = []
+    for number, line in rows:
+        try:
+            data = json.loads(line)
+        except ValueError as error:
+            errors.append(row_error(number, f'Некорректный JSON: {error}'))
+            continue
+        if not isinstance(data, dict):
+            errors.append(row_error(number, 'Ожидается JSON-объект.'))
+            continue
+        parsed.append((number, data))
+    return parsed
+
+
+def collect_ids(values):
+    ids = set()
+    for value in values if isinstance(values, list) else ():
+        try:
+            ids.add(int(value))
+        except (TypeError, ValueError):
+            pass
+    return ids
+
+
+def get_chunk_context(parsed):
+    """Всё, что нужно для проверки пачки, тремя запросами IN."""
+    tag_ids, ingredient_ids, names = set(), set(), set()
+    for _, data in parsed:
+        tag_ids |= collect_ids(data.get('tags'))
+        ingredients = data.get('ingredients')
+        if isinstance(ingredients, list):
+            ingredient_ids |= collect_ids([
+                item.get('id') for item in ingredients
+                if isinstance(item, dict)
+            ])
+        if isinstance(data.get('name'), str):
+            names.add(data['name'])
+    return {
+        'known_ids': {
+            Tag: set(Tag.objects.filter(
+                pk__in=tag_ids
+            ).values_list('pk', flat=True)),
+            Ingredient: set(Ingredient.objects.filter(
+                pk__in=ingredient_ids
+            ).values_list('pk', flat=True)),
+        },
+        'taken_names': set(Recipe.objects.filter(
+            name__in=names
+        ).values_list('name', flat=True)),
+    }
+
+
+def validate_rows(parsed, errors):
+    context = get_chunk_context(parsed)
+    valid = []
+    for number, data in parsed:
+        serializer = RecipeImportSerializer(data=data, context=context)
+        if serializer.is_valid():
+            valid.append((number, serializer.validated_data))
+            # Повтор названия внутри пачки - тоже ошибка своей строки.
+            context['taken_names'].add(serializer.validated_data['name'])
+        else:
+            errors.append(row_error(number, serializer.errors))
+    return valid
+
+
+def decode_images(pool, valid, errors):
+    decode = partial(
+        decode_image_to_file,
+        max_side=settings.RECIPE_IMAGE_MAX_SIDE,
+        max_pixels=settings.RECIPE_IMAGE_MAX_PIXELS,
+    )
+    results = (pool.map if pool is not None else map)(
+        decode, [data['image'] for _, data in valid]
+    )
+    rows = []
+    for (number, data), (path, extension, error) in zip(valid, results):
+        if error is not None:
+            errors.append(row_error(number, {'image': [error]}))
+        else:
+            rows.append((number, data, path, extension))
+    return rows
+
+
+def insert_recipes(recipes):
+    if connection.features.can_return_ids_from_bulk_insert:
+        Recipe.objects.bulk_create(recipes)
+        # bulk_create не отправляет post_save: индекс поиска, превью
+        # и счётчик рецептов автора обновляются здесь, для всей пачки.
+        update_search_index([recipe.pk for recipe in recipes])
+        # Все рецепты пачки - одного автора.
+        change_counter(User, 'recipes_count',
+                       {recipe.author_id for recipe in recipes},
+                       len(recipes))
+        if is_fanout():
+            fan_out_recipes([recipe.pk for recipe in recipes])
+        for recipe in recipes:
+            schedule_variants(recipe)
+    else:
+        # Без RETURNING id (SQLite) рецепты сохраняются по одному,
+        # связи с тегами и ингредиентами - всё равно пачками.
+        for recipe in recipes:
+            recipe.save()
+
+
+def insert_chunk(rows, author):
+    recipes = []
+    try:
+        for _, data, path, extension in rows:
+            recipe = Recipe(author=author, name=data['name'],
+                            text=data['text'],
+                            cooking_time=data['cooking_time'])
+            with open(path, 'rb') as file:
+                recipe.image.save(f'{uuid4()}.{extension}', File(file),
+                                  save=False)
+            recipes.append(recipe)
+        with transaction.atomic():
+            insert_recipes(recipes)
+            Recipe.tags.through.objects.bulk_create([
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                for recipe, (_, data, _, _) in zip(recipes, rows)
+                for tag_id in dict.fromkeys(data['tags'])
+            ])
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(recipe=recipe,
+                                 ingredient_id=ingredient['id'],
+                                 amount=ingredient['amount'])
+                for recipe, (_, data, _, _) in zip(recipes, rows)
+                for ingredient in data['ingredients']
+            ])
+    except Exception:
+        for recipe in recipes:
+            recipe.image.delete(save=False)
+        raise
+    return len(recipes)
+
+
+def save_rows(rows, author, errors):
+    try:
+        try:
+            return insert_chunk(rows, author)
+        except IntegrityError:
+            # Параллельная запись заняла название: пачка сохраняется
+            # построчно, чтобы ошибка досталась только своей строке.
+            created = 0
+            for row in rows:
+                try:
+                    created += insert_chunk([row], author)
+                except IntegrityError:
+                    # Текст ошибки базы клиенту не показывается.
+                    errors.append(row_error(row[0], CONFLICT_ERROR))
+            return created
+    finally:
+        for _, _, path, _ in rows:
+            os.remove(path)
+
+
+@contextmanager
+def get_pool(workers):
+    if not workers:
+        yield None
+        return
+    # Дочерние процессы не должны унаследовать соединения с базой
+    # и потоки пула превью, поэтому они запускаются через spawn.
+    connections.close_all()
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn')) as pool:
+        yield pool
+
+
+def import_recipes(lines, author, workers=0, chunk_size=CHUNK_SIZE,
+                   max_rows=None):
+    """Импорт рецептов из NDJSON.
+
+    Каждая строка - рецепт в формате POST /api/recipes/ (image - base64).
+    Строки проверяются пачками по chunk_size, изображения декодируются
+    в пуле из workers процессов (0 - в текущем процессе; пул нужен
+    только команде import_recipes, HTTP-запрос не запускает процессы),
+    рецепты, теги и ингредиенты пачки вставляются через bulk_create
+    в одной транзакции. Ошибочные строки попадают в отчёт и не
+    прерывают импорт остальных.
+    """
+    report = {'created': 0, 'errors': []}
+    errors = report['errors']
+    all_rows = iter_rows(lines)
+    rows = islice(all_rows, max_rows) if max_rows is not None else all_rows
+    with get_pool(workers) as pool:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            valid = validate_rows(parse_rows(chunk, errors), errors)
+            decoded = decode_images(pool, valid, errors)
+            report['created'] += save_rows(decoded, author, errors)
+    if max_rows is not None:
+        extra = next(all_rows, None)
+        if extra is not None:
+            errors.append(row_error(
+                extra[0],
+                f'Не более {max_rows} строк за запрос; '
+                f'эта и следующие строки не импортированы.',
+            ))
+    errors.sort(key=lambda error: error['line'])
+    return report
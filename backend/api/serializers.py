@@ -1,12 +1,21 @@
-from django.db.models import F
-from drf_base64.fields import Base64ImageField
+import json
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import (Case, Prefetch, Value, When,
+                              prefetch_related_objects)
 from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingList, Tag)
+                            RecipeIngredient, ShoppingCartIngredient,
+                            ShoppingList, Tag)
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from users.models import User
 
-from users.serializers import CustomUserSerializer
+from users.serializers import CustomUserSerializer, get_followed_author_ids
+
+from .fields import RecipeImageField, RecipeImageUploadField
+from .fragments import (apply_user_flags, get_fragments, make_fragment,
+                        set_fragments)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -52,35 +61,106 @@ class ShowIngredientsInRecipeSerializer(serializers.ModelSerializer):
 
 class RecipeSerializer(serializers.ModelSerializer):
 
-    image = Base64ImageField()
+    image = RecipeImageField('small')
+    image_webp = RecipeImageField('small', 'webp')
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_webp', 'cooking_time')
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список рецептов для пакетных операций с избранным и корзиной."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_BATCH_MAX_SIZE,
+    )
+
+
+class RecipeFragmentListSerializer(serializers.ListSerializer):
+    """Список рецептов: кеш фрагментов читается одним запросом к кешу."""
+
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, models.Manager) else data
+        return self.child.to_representation_many(list(recipes))
 
 
 class ShowRecipeSerializer(serializers.ModelSerializer):
+    """Рецепт для чтения.
 
+    Не зависящая от пользователя часть ответа берётся из кеша фрагментов
+    (api.fragments); теги и ингредиенты загружаются только для рецептов,
+    которых там нет. Флаги пользователя накладываются поверх.
+    """
+
+    fragment_variant = 'detail'
     tags = TagSerializer(many=True, read_only=True)
     author = CustomUserSerializer(read_only=True)
     ingredients = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
-    image = Base64ImageField()
+    image = RecipeImageField('large')
+    image_webp = RecipeImageField('large', 'webp')
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image', 'text', 'cooking_time')
+                  'favorites_count', 'in_cart_count',
+                  'name', 'image', 'image_webp', 'text', 'cooking_time')
+        list_serializer_class = RecipeFragmentListSerializer
+
+    def to_representation(self, instance):
+        return self.to_representation_many([instance])[0]
+
+    def to_representation_many(self, recipes):
+        fragments = get_fragments(recipes, self.fragment_variant)
+        missing = [recipe for recipe in recipes if recipe.pk not in fragments]
+        if missing:
+            prefetch_related_objects(missing, 'tags', Prefetch(
+                'recipe_ingredient',
+                queryset=RecipeIngredient.objects.select_related('ingredient'),
+            ))
+            # Без запроса в контексте флаги не считаются, а ссылки
+            # на изображения остаются относительными.
+            serializer = type(self)(context={})
+            fresh = {
+                recipe.pk: make_fragment(
+                    super(ShowRecipeSerializer, serializer).to_representation(
+                        recipe
+                    )
+                )
+                for recipe in missing
+            }
+            set_fragments(missing, fresh, self.fragment_variant)
+            fragments.update(fresh)
+        request = self.context.get('request')
+        followed_ids = get_followed_author_ids(request)
+        return [
+            apply_user_flags(
+                fragments[recipe.pk], request,
+                is_favorited=self.get_is_favorited(recipe),
+                is_in_shopping_cart=self.get_is_in_shopping_cart(recipe),
+                is_subscribed=recipe.author_id in followed_ids,
+                # Счётчики меняются без правки рецепта, поэтому берутся
+                # из уже загруженной строки, а не из фрагмента.
+                favorites_count=recipe.favorites_count,
+                in_cart_count=recipe.in_cart_count,
+            )
+            for recipe in recipes
+        ]
 
     @staticmethod
     def get_ingredients(obj):
-        ingredients = RecipeIngredient.objects.filter(recipe=obj)
-        return ShowIngredientsInRecipeSerializer(ingredients, many=True).data
+        return ShowIngredientsInRecipeSerializer(
+            obj.recipe_ingredient.all(), many=True
+        ).data
 
     def get_is_favorited(self, obj):
-
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
@@ -88,7 +168,8 @@ class ShowRecipeSerializer(serializers.ModelSerializer):
                                              user=request.user).exists()
 
     def get_is_in_shopping_cart(self, obj):
-
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
@@ -96,9 +177,16 @@ class ShowRecipeSerializer(serializers.ModelSerializer):
                                            user=request.user).exists()
 
 
+class ShowRecipeListSerializer(ShowRecipeSerializer):
+
+    fragment_variant = 'list'
+    image = RecipeImageField('small')
+    image_webp = RecipeImageField('small', 'webp')
+
+
 class AddIngredientRecipeSerializer(serializers.ModelSerializer):
 
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -109,9 +197,8 @@ class AddIngredientRecipeSerializer(serializers.ModelSerializer):
 class AddRecipeSerializer(serializers.ModelSerializer):
 
     ingredients = AddIngredientRecipeSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all(),
-                                              many=True)
-    image = Base64ImageField()
+    tags = serializers.ListField(child=serializers.IntegerField())
+    image = RecipeImageUploadField()
     name = serializers.CharField(max_length=200)
     cooking_time = serializers.IntegerField()
     author = CustomUserSerializer(read_only=True)
@@ -122,6 +209,34 @@ class AddRecipeSerializer(serializers.ModelSerializer):
                   'image', 'name', 'text',
                   'cooking_time', 'author')
 
+    def to_internal_value(self, data):
+        if hasattr(data, 'getlist'):
+            data = self.parse_multipart(data)
+        return super().to_internal_value(data)
+
+    @staticmethod
+    def parse_multipart(data):
+        """Приводит multipart/form-data к виду JSON-запроса.
+
+        ingredients передаются JSON-строкой, tags - повторяющимся полем
+        или JSON-списком, image - файлом.
+        """
+        parsed = {key: data.get(key) for key in data}
+        if 'tags' in data:
+            tags = data.getlist('tags')
+            if len(tags) == 1 and tags[0].lstrip().startswith('['):
+                tags = tags[0]
+            parsed['tags'] = tags
+        for field in ('ingredients', 'tags'):
+            if isinstance(parsed.get(field), str):
+                try:
+                    parsed[field] = json.loads(parsed[field])
+                except ValueError:
+                    raise ValidationError(
+                        {field: 'Ожидается JSON-список.'}
+                    )
+        return parsed
+
     def validate(self, obj):
         for field in ['name', 'text', 'cooking_time']:
             if not obj.get(field):
@@ -164,18 +279,61 @@ class AddRecipeSerializer(serializers.ModelSerializer):
         return value
 
     @staticmethod
-    def add_ingredients(ingredients, recipe):
-        for ingredient in ingredients:
-            ingredient_id = ingredient['id']
-            amount = ingredient['amount']
-            if RecipeIngredient.objects.filter(
-                    recipe=recipe, ingredient=ingredient_id).exists():
-                amount += F('amount')
-            RecipeIngredient.objects.update_or_create(
-                recipe=recipe, ingredient=ingredient_id,
-                defaults={'amount': amount}
-            )
+    def check_ids_exist(model, ids):
+        """Проверяет id одним запросом IN, а не запросом на каждый."""
+        found = set(
+            model.objects.filter(pk__in=ids).values_list('pk', flat=True)
+        )
+        for pk in ids:
+            if pk not in found:
+                raise ValidationError(
+                    f'Недопустимый первичный ключ "{pk}" - '
+                    f'объект не существует.'
+                )
+
+    def validate_tags(self, tag_ids):
+        self.check_ids_exist(Tag, tag_ids)
+        return tag_ids
 
+    def validate_ingredients(self, ingredients):
+        self.check_ids_exist(Ingredient, [item['id'] for item in ingredients])
+        return ingredients
+
+    @staticmethod
+    def get_amounts(ingredients):
+        return {item['id']: item['amount'] for item in ingredients}
+
+    @staticmethod
+    def write_ingredients(recipe, old_amounts, new_amounts):
+        """Приводит состав рецепта к new_amounts.
+
+        Меняются только отличающиеся строки: удаление, обновление
+        количеств и вставка - не более чем по одному запросу.
+        """
+        rows = RecipeIngredient.objects.filter(recipe=recipe)
+        removed = old_amounts.keys() - new_amounts.keys()
+        if removed:
+            rows.filter(ingredient_id__in=removed).delete()
+        changed = {
+            ingredient_id: amount
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id in old_amounts
+            and old_amounts[ingredient_id] != amount
+        }
+        if changed:
+            rows.filter(ingredient_id__in=changed).update(amount=Case(
+                *(When(ingredient_id=ingredient_id, then=Value(amount))
+                  for ingredient_id, amount in changed.items()),
+                output_field=models.IntegerField(),
+            ))
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=recipe, ingredient_id=ingredient_id,
+                             amount=amount)
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in old_amounts
+        ])
+
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context.get('request').user
         tags_data = validated_data.pop('tags')
@@ -183,18 +341,33 @@ class AddRecipeSerializer(serializers.ModelSerializer):
         image = validated_data.pop('image')
         recipe = Recipe.objects.create(image=image, author=author,
                                        **validated_data)
-        self.add_ingredients(ingredients_data, recipe)
+        self.write_ingredients(recipe, {}, self.get_amounts(ingredients_data))
         recipe.tags.set(tags_data)
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        RecipeIngredient.objects.filter(recipe=recipe).delete()
-        self.add_ingredients(ingredients, recipe)
+        old_amounts = ShoppingCartIngredient.objects.get_recipe_amounts(recipe)
+        new_amounts = self.get_amounts(ingredients)
+        self.write_ingredients(recipe, old_amounts, new_amounts)
+        ShoppingCartIngredient.objects.change_recipe(
+            recipe, old_amounts, new_amounts
+        )
         recipe.tags.set(tags)
         return super().update(recipe, validated_data)
 
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            # Временный файл загрузки больше не нужен: хранилище уже
+            # переместило или скопировало его.
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
+
     def to_representation(self, recipe):
         data = ShowRecipeSerializer(
             recipe,
@@ -202,12 +375,44 @@ class AddRecipeSerializer(serializers.ModelSerializer):
         return data
 
 
+class RecipeImportSerializer(AddRecipeSerializer):
+    """Строка пакетного импорта (api.recipe_import).
+
+    Правила те же, что у AddRecipeSerializer, но без запросов на строку:
+    известные id тегов и ингредиентов и занятые названия передаются
+    в context для всей пачки. Изображение остаётся строкой base64 и
+    декодируется в пуле процессов.
+    """
+
+    image = serializers.RegexField(
+        r'^data:image/[\w.+-]+;base64,',
+        error_messages={'invalid': 'Ожидается изображение в base64.'},
+    )
+
+    def check_ids_exist(self, model, ids):
+        known_ids = self.context['known_ids'][model]
+        for pk in ids:
+            if pk not in known_ids:
+                raise ValidationError(
+                    f'Недопустимый первичный ключ "{pk}" - '
+                    f'объект не существует.'
+                )
+
+    def validate_name(self, name):
+        if name in self.context['taken_names']:
+            raise ValidationError('Рецепт с таким названием уже существует.')
+        return name
+
+
 class ShowFavoriteRecipeShopListSerializer(serializers.ModelSerializer):
 
+    image = RecipeImageField('small')
+    image_webp = RecipeImageField('small', 'webp')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name',
-                  'image', 'cooking_time')
+                  'image', 'image_webp', 'cooking_time')
 
 
 class FavoriteRecipeSerializer(serializers.ModelSerializer):
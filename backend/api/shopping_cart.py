@@ -0,0 +1,211 @@
+import csv
+import hashlib
+import io
+import tempfile
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from .metrics import count_cache
+from recipes.models import ShoppingCartIngredient
+
+TITLE = 'Список покупок с сайта Foodgram:'
+HEADER = ('Ингредиент', 'Количество', 'Единица измерения')
+FILENAME = 'shopping-list'
+ITERATOR_CHUNK_SIZE = 500
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_CACHE_PREFIX = 'shopping-list-pdf'
+
+
+class Echo:
+    """Псевдо-файл для csv.writer: возвращает строку вместо записи."""
+
+    @staticmethod
+    def write(value):
+        return value
+
+
+def get_shopping_list(user):
+    """Сводный список покупок: чтение готовых сумм по индексу user."""
+    return ShoppingCartIngredient.objects.filter(
+        user=user
+    ).values_list(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'amount',
+    ).order_by('ingredient__name')
+
+
+def iter_rows(user):
+    for name, measurement_unit, amount in get_shopping_list(user).iterator(
+            chunk_size=ITERATOR_CHUNK_SIZE):
+        yield name, amount, measurement_unit
+
+
+def render_txt(rows):
+    yield f'{TITLE}\n\n'
+    for name, amount, measurement_unit in rows:
+        yield f'{name}, {amount} {measurement_unit}\n'
+
+
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def render_xlsx(rows):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title='Foodgram')
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    # write_only-книга сбрасывает строки на диск по мере добавления,
+    # поэтому готовый файл отдаём из временного файла, а не из памяти.
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+@lru_cache(maxsize=None)
+def get_pdf_font():
+    """Регистрирует шрифт с кириллицей один раз на процесс."""
+    pdfmetrics.registerFont(
+        TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_PDF_FONT)
+    )
+    return PDF_FONT_NAME
+
+
+@lru_cache(maxsize=None)
+def get_pdf_layout():
+    """Разметка страницы: считается один раз на процесс."""
+    width, height = A4
+    margin = 20 * mm
+    line_height = 7 * mm
+    title_y = height - margin
+    first_line_y = title_y - 2 * line_height
+    return {
+        'margin': margin,
+        'line_height': line_height,
+        'title_y': title_y,
+        'first_line_y': first_line_y,
+        'lines_per_page': int((first_line_y - margin) // line_height) + 1,
+        'footer_x': width - margin,
+    }
+
+
+def start_pdf_page(pdf, font, layout, page_number):
+    pdf.setFont(font, 16)
+    pdf.drawString(layout['margin'], layout['title_y'], TITLE)
+    pdf.setFont(font, 10)
+    pdf.drawRightString(layout['footer_x'], layout['margin'] / 2,
+                        str(page_number))
+    pdf.setFont(font, 12)
+
+
+def render_pdf(rows):
+    """PDF со списком во временном файле.
+
+    canvas reportlab держит все страницы в памяти до save(), так что
+    память растёт с числом строк (около 0,4 КБ на строку). Поэтому
+    рисуется не больше SHOPPING_LIST_PDF_MAX_ROWS строк, остальные
+    только считаются. Сводный список - строка на ингредиент, и на
+    справочнике из data/ предел не достигается.
+    """
+    font = get_pdf_font()
+    layout = get_pdf_layout()
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.SHOPPING_LIST_PDF_SPOOL_SIZE
+    )
+    pdf = canvas.Canvas(output, pagesize=A4, pageCompression=1)
+    pdf.setTitle(TITLE)
+    page_number, line, skipped = 1, 0, 0
+    start_pdf_page(pdf, font, layout, page_number)
+    lines = (f'• {name} — {amount} {measurement_unit}'
+             for name, amount, measurement_unit in rows)
+    for number, text in enumerate(lines):
+        if number == settings.SHOPPING_LIST_PDF_MAX_ROWS:
+            skipped = sum(1 for _ in lines) + 1
+            text = (f'Не поместилось позиций: {skipped}. Полный список - '
+                    f'в форматах txt, csv и xlsx.')
+        if line == layout['lines_per_page']:
+            pdf.showPage()
+            page_number, line = page_number + 1, 0
+            start_pdf_page(pdf, font, layout, page_number)
+        y = layout['first_line_y'] - line * layout['line_height']
+        pdf.drawString(layout['margin'], y, text)
+        line += 1
+    pdf.showPage()
+    pdf.save()
+    output.seek(0)
+    return output
+
+
+def get_pdf_cache_key(rows):
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update(repr(row).encode())
+    return f'{PDF_CACHE_PREFIX}:{digest.hexdigest()}'
+
+
+def shopping_cart_pdf(user):
+    """PDF-файл из кеша; отрисовывается только при изменении корзины.
+
+    Строки корзины читаются потоком дважды: для ключа кеша и, при
+    промахе, для отрисовки. В кеш попадают файлы не больше
+    SHOPPING_LIST_PDF_SPOOL_SIZE - они и так в памяти; большие
+    отдаются из временного файла без чтения в память.
+    """
+    key = get_pdf_cache_key(iter_rows(user))
+    content = cache.get(key)
+    count_cache('shopping_list_pdf', int(content is not None),
+                int(content is None))
+    if content is not None:
+        return io.BytesIO(content)
+    output = render_pdf(iter_rows(user))
+    output.seek(0, io.SEEK_END)
+    size = output.tell()
+    output.seek(0)
+    if size <= settings.SHOPPING_LIST_PDF_SPOOL_SIZE:
+        cache.set(key, output.read(),
+                  settings.SHOPPING_LIST_PDF_CACHE_TIMEOUT)
+        output.seek(0)
+    return output
+
+
+RENDERERS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (
+        render_xlsx,
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    ),
+    'pdf': (shopping_cart_pdf, 'application/pdf'),
+}
+DEFAULT_FILE_TYPE = 'txt'
+
+
+def shopping_cart_response(user, file_type=DEFAULT_FILE_TYPE):
+    """Потоковый ответ со списком покупок в запрошенном формате."""
+    render, content_type = RENDERERS[file_type]
+    filename = f'{FILENAME}.{file_type}'
+    if file_type == 'pdf':
+        content = render(user)
+    else:
+        content = render(iter_rows(user))
+    if file_type in ('xlsx', 'pdf'):
+        return FileResponse(content, as_attachment=True,
+                            filename=filename, content_type=content_type)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
@@ -0,0 +1,93 @@
+import gzip
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from api import mixins
+from api.mixins import accepts_gzip
+from recipes.models import Ingredient, Tag
+
+TAGS_URL = '/api/tags/'
+INGREDIENTS_URL = '/api/ingredients/'
+
+
+class AcceptsGzipTest(SimpleTestCase):
+
+    def test_accepts_gzip(self):
+        for header, expected in (
+            ('', False),
+            ('gzip', True),
+            ('deflate, GZIP;q=0.5', True),
+            ('gzip;q=0', False),
+            ('gzip; q=0.0, *', False),
+            ('*', True),
+            ('br, *;q=0', False),
+            ('gzip;q=abc', False),
+        ):
+            with self.subTest(header=header):
+                self.assertIs(accepts_gzip(header), expected)
+
+
+class CatalogueResponseTest(TestCase):
+    """Справочники отдаются готовым JSON с ETag, 304 и gzip по
+    Accept-Encoding."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+
+    def setUp(self):
+        # Готовые ответы общие для процесса: у каждого теста свои.
+        patcher = mock.patch.object(mixins, '_catalogue_blobs', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def get(self, url, status=200, queries=1, **headers):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, status)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        return response
+
+    def test_gzip_negotiation(self):
+        for url in (TAGS_URL, INGREDIENTS_URL):
+            with self.subTest(url=url):
+                plain = self.get(url, queries=2)
+                self.assertNotIn('Content-Encoding', plain)
+                self.assertEqual(len(json.loads(plain.content)), 1)
+                compressed = self.get(url, HTTP_ACCEPT_ENCODING='gzip')
+                self.assertEqual(compressed['Content-Encoding'], 'gzip')
+                self.assertEqual(gzip.decompress(compressed.content),
+                                 plain.content)
+                self.assertEqual(int(compressed['Content-Length']),
+                                 len(compressed.content))
+                self.assertNotEqual(compressed['ETag'], plain['ETag'])
+                refused = self.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+                self.assertNotIn('Content-Encoding', refused)
+                self.assertEqual(refused.content, plain.content)
+
+    def test_not_modified(self):
+        etag = self.get(TAGS_URL, queries=2)['ETag']
+        for if_none_match in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            with self.subTest(if_none_match=if_none_match):
+                response = self.get(TAGS_URL, 304,
+                                    HTTP_IF_NONE_MATCH=if_none_match)
+                self.assertEqual(response['ETag'], etag)
+                self.assertFalse(response.content)
+        # ETag несжатого ответа не подходит к сжатому.
+        self.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag,
+                 HTTP_ACCEPT_ENCODING='gzip')
+
+    def test_change_invalidates(self):
+        etag = self.get(TAGS_URL, queries=2)['ETag']
+        Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+        response = self.get(TAGS_URL, queries=2, HTTP_IF_NONE_MATCH=etag)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(
+            {tag['slug'] for tag in json.loads(response.content)},
+            {'breakfast', 'lunch'},
+        )
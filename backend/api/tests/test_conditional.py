@@ -0,0 +1,94 @@
+from django.test import TestCase
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from recipes.models import FavoriteRecipe, Recipe
+from users.models import User
+
+URL = '/api/recipes/{}/'
+
+
+class RecipeConditionalGetTest(TestCase):
+    """ETag и Last-Modified рецепта: 304 без загрузки рецепта, новый
+    ETag после изменений, флаги пользователя не попадают к другим."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='-'
+        )
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com', password='-'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='-', cooking_time=10,
+            image='recipes/test.png',
+        )
+
+    def get_client(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+
+    def get(self, client, status_code=200, **headers):
+        response = client.get(URL.format(self.recipe.id), **headers)
+        self.assertEqual(response.status_code, status_code)
+        return response
+
+    def test_not_modified(self):
+        for user in (None, self.reader):
+            with self.subTest(user=user):
+                client = self.get_client(user)
+                etag = self.get(client)['ETag']
+                # Состояние рецепта с флагами и версии справочников;
+                # сам рецепт и связанные строки не загружаются.
+                with self.assertNumQueries(2):
+                    response = self.get(client, 304,
+                                        HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response['ETag'], etag)
+                self.assertFalse(response.content)
+
+    def test_if_modified_since_for_anonymous(self):
+        client = self.get_client()
+        response = self.get(client)
+        last_modified = response['Last-Modified']
+        self.get(client, 304, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.get(client, 200, HTTP_IF_MODIFIED_SINCE=http_date(0))
+        # Флаги пользователя не меняют дату: ему Last-Modified не нужен.
+        response = self.get(self.get_client(self.reader))
+        self.assertNotIn('Last-Modified', response)
+
+    def test_etag_changes_after_update(self):
+        client = self.get_client()
+        etag = self.get(client)['ETag']
+        self.recipe.text = 'Новое описание'
+        self.recipe.save()
+        response = self.get(client, 200, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data['text'], 'Новое описание')
+        self.assertNotEqual(response['ETag'], etag)
+        etag = response['ETag']
+        FavoriteRecipe.objects.create(user=self.author, recipe=self.recipe)
+        self.assertNotEqual(self.get(client)['ETag'], etag)
+
+    def test_user_flags_do_not_leak(self):
+        FavoriteRecipe.objects.create(user=self.reader, recipe=self.recipe)
+        reader = self.get(self.get_client(self.reader))
+        self.assertTrue(reader.data['is_favorited'])
+        self.assertIn('Authorization', reader['Vary'])
+        self.assertIn('private', reader['Cache-Control'])
+        for user in (None, self.author):
+            with self.subTest(user=user):
+                response = self.get(self.get_client(user), 200,
+                                    HTTP_IF_NONE_MATCH=reader['ETag'])
+                self.assertFalse(response.data['is_favorited'])
+                self.assertNotEqual(response['ETag'], reader['ETag'])
+
+    def test_missing_and_invalid_pk(self):
+        client = self.get_client()
+        for pk in (self.recipe.id + 1, 'abc'):
+            with self.subTest(pk=pk):
+                response = client.get(URL.format(pk),
+                                      HTTP_IF_NONE_MATCH='*')
+                self.assertEqual(response.status_code, 404)
+                self.assertNotIn('ETag', response)
@@ -0,0 +1,90 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, Tag)
+from users.models import User
+
+LIST_URL = '/api/recipes/'
+DETAIL_URL = '/api/recipes/{}/'
+
+
+class RecipeFragmentsTest(TestCase):
+    """Фрагменты рецептов берутся из кеша, пока рецепт, его автор,
+    теги и ингредиенты не изменились."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='-'
+        )
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com', password='-'
+        )
+        cls.tag = Tag.objects.create(name='Обед', color='#49B64E',
+                                     slug='lunch')
+        cls.ingredient = Ingredient.objects.create(name='Соль',
+                                                   measurement_unit='г')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Старый', cooking_time=10,
+            image='recipes/test.png',
+        )
+        cls.recipe.tags.add(cls.tag)
+        RecipeIngredient.objects.create(recipe=cls.recipe,
+                                        ingredient=cls.ingredient, amount=5)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        responses = (client.get(LIST_URL),
+                     client.get(DETAIL_URL.format(self.recipe.id)))
+        for response in responses:
+            self.assertEqual(response.status_code, 200)
+        listed, detail = responses[0].data['results'][0], responses[1].data
+        self.assertEqual(listed, detail)
+        return detail
+
+    def test_cached_until_recipe_changes(self):
+        self.assertEqual(self.get()['text'], 'Старый')
+        # Изменение в обход сигналов и даты изменения не видно: ответ
+        # собран из кеша.
+        Recipe.objects.filter(pk=self.recipe.pk).update(text='Новый')
+        self.assertEqual(self.get()['text'], 'Старый')
+        Recipe.touch([self.recipe.pk])
+        self.assertEqual(self.get()['text'], 'Новый')
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.name = 'Переименован'
+        recipe.save()
+        self.assertEqual(self.get()['name'], 'Переименован')
+
+    def test_related_changes(self):
+        self.get()
+        self.author.first_name = 'Автор'
+        self.author.save()
+        self.assertEqual(self.get()['author']['first_name'], 'Автор')
+        tag = Tag.objects.get(pk=self.tag.pk)
+        tag.name = 'Ужин'
+        tag.save()
+        self.assertEqual(self.get()['tags'][0]['name'], 'Ужин')
+        ingredient = Ingredient.objects.get(pk=self.ingredient.pk)
+        ingredient.name = 'Перец'
+        ingredient.save()
+        self.assertEqual(self.get()['ingredients'][0]['name'], 'Перец')
+
+    def test_user_fields_are_not_cached(self):
+        FavoriteRecipe.objects.create(user=self.reader, recipe=self.recipe)
+        data = self.get(self.reader)
+        self.assertTrue(data['is_favorited'])
+        self.assertEqual(data['favorites_count'], 1)
+        data = self.get()
+        self.assertFalse(data['is_favorited'])
+        self.assertEqual(data['favorites_count'], 1)
+        FavoriteRecipe.objects.all().delete()
+        data = self.get(self.reader)
+        self.assertFalse(data['is_favorited'])
+        self.assertEqual(data['favorites_count'], 0)
@@ -0,0 +1,173 @@
+import base64
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.files.uploadedfile import (SimpleUploadedFile,
+                                            TemporaryUploadedFile)
+from django.test import TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from api.fields import RecipeImageUploadField
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+IMAGE_SIDE = 2000
+# Файл около 12 МБ: в память не должно попадать и половины.
+PEAK_MEMORY_LIMIT = 6 * 1024 * 1024
+MEMORY_UPLOAD_HANDLER = (
+    'django.core.files.uploadhandler.MemoryFileUploadHandler'
+)
+MEASURE_RSS_SCRIPT = """
+import os
+import sys
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.wsgi import WSGIRequest
+
+from api.fields import RecipeImageUploadField
+from api.tests.test_image_upload import make_png
+
+
+def get_peak_rss():
+    # VmHWM, в отличие от ru_maxrss, не наследует пик родителя после exec.
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+
+
+path, content_type, handler = sys.argv[1:]
+if handler:
+    settings.FILE_UPLOAD_HANDLERS = [handler]
+    settings.FILE_UPLOAD_MAX_MEMORY_SIZE = os.path.getsize(path)
+# Прогрев: импорты и плагины Pillow не входят в замер.
+RecipeImageUploadField().to_internal_value(
+    SimpleUploadedFile('small.png', make_png(8))
+)
+try:
+    # Пик сбрасывается до текущего RSS (Linux 4.0+).
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+except OSError:
+    pass
+baseline = get_peak_rss()
+with open(path, 'rb') as body:
+    request = WSGIRequest({
+        'REQUEST_METHOD': 'POST', 'PATH_INFO': '/', 'SERVER_NAME': 'test',
+        'SERVER_PORT': '80', 'wsgi.url_scheme': 'http', 'wsgi.input': body,
+        'CONTENT_TYPE': content_type,
+        'CONTENT_LENGTH': str(os.path.getsize(path)),
+    })
+    RecipeImageUploadField().to_internal_value(request.FILES['image'])
+print(get_peak_rss() - baseline)
+"""
+
+
+def make_png(side, compress_level=0):
+    image = Image.frombytes('RGB', (side, side), os.urandom(side * side * 3))
+    output = io.BytesIO()
+    image.save(output, 'PNG', compress_level=compress_level)
+    return output.getvalue()
+
+
+class RecipeImageUploadTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='author', email='author@example.com', password='-'
+        )
+        cls.tag = Tag.objects.create(name='Тег', color='#000000', slug='tag')
+        cls.ingredient = Ingredient.objects.create(
+            name='Ингредиент', measurement_unit='г'
+        )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_multipart_upload(self):
+        content = make_png(IMAGE_SIDE)
+        image = io.BytesIO(content)
+        image.name = 'large.png'
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch.object(RecipeImageUploadField, 'check_dimensions',
+                               autospec=True) as check_dimensions:
+            response = client.post('/api/recipes/', {
+                'name': 'Рецепт', 'text': '-', 'cooking_time': 5,
+                'tags': [self.tag.id],
+                'ingredients': json.dumps([
+                    {'id': self.ingredient.id, 'amount': 1}
+                ]),
+                'image': image,
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        # Файл пришёл в поле уже на диске, а не в памяти.
+        _, upload = check_dimensions.call_args[0]
+        self.assertIsInstance(upload, TemporaryUploadedFile)
+        recipe = Recipe.objects.get(pk=response.data['id'])
+        self.assertEqual(recipe.image.size, len(content))
+
+    @skipUnless(sys.platform.startswith('linux'), 'нужен /proc/self')
+    def test_multipart_upload_peak_rss(self):
+        # tracemalloc не видит памяти Pillow и буферов на C, поэтому
+        # замеряется пиковый RSS отдельного процесса. Контроль -
+        # MemoryFileUploadHandler, который держит файл в памяти.
+        body = encode_multipart(BOUNDARY, {'image': SimpleUploadedFile(
+            'large.png', make_png(IMAGE_SIDE)
+        )})
+        with tempfile.NamedTemporaryFile() as file:
+            file.write(body)
+            file.flush()
+            configured = self.measure_rss(file.name)
+            in_memory = self.measure_rss(file.name, MEMORY_UPLOAD_HANDLER)
+        self.assertLess(configured, PEAK_MEMORY_LIMIT)
+        self.assertGreater(in_memory, len(body))
+
+    @staticmethod
+    def measure_rss(path, handler=''):
+        """Прирост пикового RSS при разборе тела и проверке картинки."""
+        result = subprocess.run(
+            [sys.executable, '-c', MEASURE_RSS_SCRIPT, path,
+             MULTIPART_CONTENT, handler],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'foodgram.settings'},
+        )
+        if result.returncode:
+            raise AssertionError(result.stderr)
+        return int(result.stdout) * 1024
+
+    def test_base64_with_line_breaks(self):
+        content = make_png(200)
+        # base64.encodebytes переносит строки через каждые 76 символов,
+        # строка длиннее BASE64_CHUNK_SIZE - куски режутся не по 4.
+        encoded = base64.encodebytes(content).decode()
+        self.assertIn('\n', encoded)
+        field = RecipeImageUploadField()
+        upload = field.decode_base64(f'data:image/png;base64,{encoded}')
+        self.assertEqual(upload.read(), content)
+        upload.close()
+
+    def test_base64_invalid_length(self):
+        field = RecipeImageUploadField()
+        with self.assertRaises(ValidationError):
+            field.decode_base64('data:image/png;base64,iVBORw0KG')
@@ -0,0 +1,116 @@
+import base64
+import json
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+URL = '/api/recipes/import/'
+CONTENT_TYPE = 'application/x-ndjson'
+
+
+def get_image():
+    output = BytesIO()
+    Image.new('RGB', (8, 8), (200, 120, 40)).save(output, 'PNG')
+    encoded = base64.b64encode(output.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+class RecipeImportTest(TestCase):
+    """NDJSON-импорт сохраняет верные строки и сообщает об ошибочных
+    с номерами строк."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='-'
+        )
+        cls.tag = Tag.objects.create(name='Обед', color='#49B64E',
+                                     slug='lunch')
+        cls.ingredient = Ingredient.objects.create(name='Соль',
+                                                   measurement_unit='г')
+        Recipe.objects.create(author=cls.user, name='Существующий',
+                              text='-', cooking_time=10,
+                              image='recipes/test.png')
+        cls.image = get_image()
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root,
+                                              IMAGE_VARIANT_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_row(self, name, **fields):
+        return json.dumps({
+            'name': name, 'text': '-', 'cooking_time': 10,
+            'tags': [self.tag.id],
+            'ingredients': [{'id': self.ingredient.id, 'amount': 3}],
+            'image': self.image,
+            **fields,
+        }, ensure_ascii=False)
+
+    def post(self, lines):
+        response = self.client.post(URL, '\n'.join(lines).encode(),
+                                    content_type=CONTENT_TYPE)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_row_errors(self):
+        report = self.post([
+            self.make_row('Первый'),
+            '{"name": ',
+            '',
+            '[]',
+            self.make_row('Без тега', tags=[10 ** 6]),
+            self.make_row('Первый'),
+            self.make_row('Существующий'),
+            self.make_row('Битое фото', image='data:image/png;base64,AAAA'),
+            self.make_row('Второй'),
+        ])
+        self.assertEqual(report['created'], 2)
+        self.assertEqual(
+            [(error['line'], sorted(error['errors'])) for error
+             in report['errors']],
+            [(2, ['non_field_errors']), (4, ['non_field_errors']),
+             (5, ['tags']), (6, ['name']), (7, ['name']), (8, ['image'])],
+        )
+        recipes = Recipe.objects.filter(name__in=('Первый', 'Второй'))
+        self.assertEqual(recipes.count(), 2)
+        for recipe in recipes:
+            self.assertEqual(recipe.author, self.user)
+            self.assertEqual(list(recipe.tags.all()), [self.tag])
+            self.assertEqual(
+                list(RecipeIngredient.objects.filter(
+                    recipe=recipe
+                ).values_list('ingredient', 'amount')),
+                [(self.ingredient.id, 3)],
+            )
+            self.assertTrue(recipe.image.name)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.recipes_count, 3)
+
+    @override_settings(RECIPE_IMPORT_MAX_ROWS=2)
+    def test_max_rows(self):
+        report = self.post([
+            self.make_row(f'Рецепт {number}') for number in range(4)
+        ])
+        self.assertEqual(report['created'], 2)
+        self.assertEqual([error['line'] for error in report['errors']], [3])
+        self.assertFalse(Recipe.objects.filter(
+            name__in=('Рецепт 2', 'Рецепт 3')
+        ).exists())
+
+    def test_anonymous(self):
+        response = APIClient().post(URL, self.make_row('Аноним').encode(),
+                                    content_type=CONTENT_TYPE)
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,73 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import ingredient_search
+from api.ingredient_search import IngredientSearchIndex, search_ingredients
+from recipes.models import Ingredient
+
+URL = '/api/ingredients/?name={}'
+NAMES = ('Сок морковный', 'мороженое', 'Морковь', 'Мёд', 'Семга',
+         'Хлеб')
+
+
+class IngredientSearchTest(TestCase):
+    """Автодополнение: сначала совпадения по началу, потом по подстроке."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create([
+            Ingredient(name=name, measurement_unit='г') for name in NAMES
+        ])
+
+    def setUp(self):
+        # Индекс общий для процесса: у каждого теста он строится заново.
+        patcher = mock.patch.object(ingredient_search, '_index', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def names(ingredients):
+        return [ingredient.name for ingredient in ingredients]
+
+    def test_prefix_matches_go_first(self):
+        index = IngredientSearchIndex(Ingredient.objects.all())
+        self.assertEqual(self.names(index.find('МОР')),
+                         ['Морковь', 'мороженое', 'Сок морковный'])
+        self.assertEqual(self.names(index.find('ок')), ['Сок морковный'])
+        self.assertEqual(self.names(index.find('хлеб')), ['Хлеб'])
+        self.assertEqual(index.find('\n'), ())
+        self.assertEqual(len(index.find('')), len(NAMES))
+
+    def test_api_order(self):
+        response = APIClient().get(URL.format('мор'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['name'] for item in response.data],
+            ['Морковь', 'мороженое', 'Сок морковный'],
+        )
+
+    @override_settings(INGREDIENT_INDEX_VERSION_TTL=60)
+    def test_index_is_rebuilt_after_version_bump(self):
+        with mock.patch.object(ingredient_search, 'monotonic',
+                               return_value=1000):
+            self.assertEqual(self.names(search_ingredients('мё')), ['Мёд'])
+            # Сигнал справочника поднимает версию.
+            Ingredient.objects.create(name='Мёд липовый',
+                                      measurement_unit='г')
+            # До конца интервала индекс берётся из памяти без запросов.
+            with self.assertNumQueries(0):
+                self.assertEqual(self.names(search_ingredients('мё')),
+                                 ['Мёд'])
+        with mock.patch.object(ingredient_search, 'monotonic',
+                               return_value=1061):
+            self.assertEqual(self.names(search_ingredients('мё')),
+                             ['Мёд', 'Мёд липовый'])
+            with self.assertNumQueries(0):
+                search_ingredients('мё')
+        with mock.patch.object(ingredient_search, 'monotonic',
+                               return_value=1122):
+            # Версия не менялась: только её проверка, без перестроения.
+            with self.assertNumQueries(1):
+                search_ingredients('мё')
@@ -0,0 +1,154 @@
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.managers import RecipeLinkManager
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCartIngredient,
+                            ShoppingList)
+from users.models import User
+
+FAVORITE_URL = '/api/recipes/{}/favorite/'
+CART_URL = '/api/recipes/{}/shopping_cart/'
+FAVORITE_BATCH_URL = '/api/recipes/favorite/'
+CART_BATCH_URL = '/api/recipes/shopping_cart/'
+CART_CLEAR_URL = '/api/recipes/shopping_cart/clear/'
+MISSING_ID = 10 ** 6
+
+
+class RecipeLinksTest(TestCase):
+    """Повторные запросы к избранному и корзине ничего не меняют."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='-'
+        )
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(4)
+        ])
+        ingredients = list(Ingredient.objects.order_by('id'))
+        cls.recipes = []
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=f'Рецепт {number}', text='-',
+                cooking_time=10, image='recipes/test.png',
+            )
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=number + 1)
+                for ingredient in ingredients[number:number + 2]
+            ])
+            cls.recipes.append(recipe)
+        cls.ids = [recipe.id for recipe in cls.recipes]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertCart(self, recipe_ids):
+        self.assertCountEqual(
+            ShoppingList.objects.filter(user=self.user).values_list(
+                'recipe_id', flat=True
+            ),
+            recipe_ids,
+        )
+        stored = dict(ShoppingCartIngredient.objects.filter(
+            user=self.user
+        ).values_list('ingredient_id', 'amount'))
+        expected = {}
+        for ingredient_id, amount in RecipeIngredient.objects.filter(
+                recipe_id__in=recipe_ids).values_list('ingredient_id',
+                                                      'amount'):
+            expected[ingredient_id] = expected.get(ingredient_id, 0) + amount
+        self.assertEqual(stored, expected)
+
+    def assertCounters(self, field, counts):
+        self.assertEqual(
+            dict(Recipe.objects.values_list('id', field)),
+            dict(zip(self.ids, counts)),
+        )
+
+    def test_repeated_post_and_delete(self):
+        for url, model, field in (
+            (FAVORITE_URL, FavoriteRecipe, 'favorites_count'),
+            (CART_URL, ShoppingList, 'in_cart_count'),
+        ):
+            with self.subTest(url=url):
+                url = url.format(self.ids[0])
+                self.assertEqual(self.client.post(url).status_code, 201)
+                self.assertEqual(self.client.post(url).status_code, 200)
+                self.assertEqual(model.objects.count(), 1)
+                self.assertCounters(field, [1, 0, 0])
+                self.assertEqual(self.client.delete(url).status_code, 204)
+                self.assertEqual(self.client.delete(url).status_code, 204)
+                self.assertFalse(model.objects.exists())
+                self.assertCounters(field, [0, 0, 0])
+
+    def test_delete_missing_recipe(self):
+        for url in (FAVORITE_URL, CART_URL):
+            with self.subTest(url=url):
+                response = self.client.delete(url.format(MISSING_ID))
+                self.assertEqual(response.status_code, 204)
+
+    def test_cart_deltas_are_applied_once(self):
+        url = CART_URL.format(self.ids[0])
+        self.client.post(url)
+        self.client.post(url)
+        self.assertCart(self.ids[:1])
+        self.client.delete(url)
+        self.client.delete(url)
+        self.assertCart([])
+
+    def test_batch_changes_each_recipe_once(self):
+        for url, model, field in (
+            (FAVORITE_BATCH_URL, FavoriteRecipe, 'favorites_count'),
+            (CART_BATCH_URL, ShoppingList, 'in_cart_count'),
+        ):
+            with self.subTest(url=url):
+                response = self.client.post(
+                    url, {'recipes': self.ids[:2]}, format='json'
+                )
+                self.assertCountEqual(response.data['recipes'],
+                                      self.ids[:2])
+                response = self.client.post(
+                    url, {'recipes': [*self.ids[1:], MISSING_ID]},
+                    format='json',
+                )
+                self.assertEqual(response.data['recipes'], self.ids[2:])
+                self.assertEqual(model.objects.count(), 3)
+                self.assertCounters(field, [1, 1, 1])
+                response = self.client.delete(
+                    url, {'recipes': [self.ids[0], MISSING_ID]},
+                    format='json',
+                )
+                self.assertEqual(response.data['recipes'], self.ids[:1])
+                response = self.client.delete(
+                    url, {'recipes': self.ids[:2]}, format='json'
+                )
+                self.assertEqual(response.data['recipes'], self.ids[1:2])
+                self.assertCounters(field, [0, 0, 1])
+        self.assertCart(self.ids[2:])
+
+    def test_clear_cart(self):
+        self.client.post(CART_BATCH_URL, {'recipes': self.ids},
+                         format='json')
+        self.assertCart(self.ids)
+        for _ in range(2):
+            response = self.client.delete(CART_CLEAR_URL)
+            self.assertEqual(response.status_code, 204)
+            self.assertCart([])
+            self.assertCounters('in_cart_count', [0, 0, 0])
+
+
+class RecipeLinksFallbackTest(RecipeLinksTest):
+    """То же без RETURNING: проверка и bulk_create в транзакции."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(RecipeLinkManager, 'supports_returning',
+                                    return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
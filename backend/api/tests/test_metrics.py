@@ -0,0 +1,145 @@
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import metrics
+from api.metrics import (ARCHIVE_NAME, FileMetricsStore, Registry,
+                         count_cache, merge)
+from users.models import User
+
+METRICS_URL = '/api/metrics/'
+LABELS = ('TagViewSet.list', 'GET')
+DURATION = 'foodgram_request_duration_seconds'
+CACHE = 'foodgram_cache_requests_total'
+
+
+def get_dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', ''])
+    process.wait()
+    return process.pid
+
+
+class TemporaryDirectoryMixin:
+
+    def setUp(self):
+        super().setUp()
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+
+
+class FileMetricsStoreTest(TemporaryDirectoryMixin, SimpleTestCase):
+    """Снимки воркеров суммируются, файлы завершившихся сливаются
+    в архив без потери значений."""
+
+    @staticmethod
+    def make_snapshot(duration, hits):
+        registry = Registry()
+        registry.observe(DURATION, LABELS, duration)
+        registry.inc(CACHE, ('catalogue', 'hit'), hits)
+        return registry.snapshot()
+
+    def write(self, snapshot, pid=None):
+        store = FileMetricsStore(self.directory)
+        if pid is not None:
+            store.path = self.directory / f'{pid}-test.json'
+        store.write(snapshot)
+        return store
+
+    def read_totals(self):
+        return merge(FileMetricsStore(self.directory).read_all())
+
+    def assertTotalsEqual(self, first, second):
+        # Суммы гистограмм - float, порядок сложения может отличаться.
+        first_histograms, first_counters = first
+        second_histograms, second_counters = second
+        self.assertEqual(first_counters, second_counters)
+        self.assertEqual(first_histograms.keys(), second_histograms.keys())
+        for key, values in first_histograms.items():
+            self.assertEqual(values[:-1], second_histograms[key][:-1])
+            self.assertAlmostEqual(values[-1], second_histograms[key][-1])
+
+    def test_merge_sums_workers(self):
+        self.write(self.make_snapshot(0.003, 2))
+        self.write(self.make_snapshot(0.2, 3))
+        histograms, counters = self.read_totals()
+        self.assertEqual(counters[CACHE, ('catalogue', 'hit')], 5)
+        values = histograms[DURATION, LABELS]
+        # Корзины 0.005 и 0.25, +Inf пуста, последнее значение - сумма.
+        self.assertEqual(values[:-1], [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0])
+        self.assertAlmostEqual(values[-1], 0.203)
+
+    def test_dead_workers_are_archived(self):
+        live = self.write(self.make_snapshot(0.01, 1))
+        self.write(self.make_snapshot(0.02, 2), pid=get_dead_pid())
+        self.write(self.make_snapshot(0.03, 3), pid=get_dead_pid())
+        totals = self.read_totals()
+        live.archive_dead()
+        self.assertCountEqual(
+            [path.name for path in self.directory.glob('*.json')],
+            [ARCHIVE_NAME, live.path.name],
+        )
+        self.assertTotalsEqual(self.read_totals(), totals)
+        # Следующий завершившийся воркер добавляется к архиву.
+        self.write(self.make_snapshot(0.04, 4), pid=get_dead_pid())
+        live.archive_dead()
+        live.archive_dead()
+        _, counters = self.read_totals()
+        self.assertEqual(counters[CACHE, ('catalogue', 'hit')], 10)
+        self.assertEqual(len(list(self.directory.glob('*.json'))), 2)
+
+    def test_flush_error_is_logged(self):
+        not_a_directory = self.directory / 'file'
+        not_a_directory.write_text('')
+        with override_settings(METRICS_DIR=not_a_directory / 'metrics'):
+            with self.assertLogs('api.metrics', 'ERROR'):
+                metrics.flush(force=True)
+
+
+class MetricsEndpointTest(TemporaryDirectoryMixin, TestCase):
+    """Эндпоинт и учёт кешей работают только при METRICS_ENABLED."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='-'
+        )
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='-'
+        )
+
+    def get_client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        before = metrics.registry.snapshot()
+        count_cache('catalogue', hits=1, misses=1)
+        self.assertEqual(metrics.registry.snapshot(), before)
+        response = self.get_client(self.admin).get(METRICS_URL)
+        self.assertEqual(response.status_code, 404)
+
+    def test_enabled(self):
+        with override_settings(METRICS_ENABLED=True,
+                               METRICS_DIR=self.directory):
+            # Клиент создаётся при включённых метриках: middleware
+            # собирается при первом запросе.
+            self.assertEqual(APIClient().get('/api/tags/').status_code, 200)
+            response = self.get_client(self.user).get(METRICS_URL)
+            self.assertEqual(response.status_code, 403)
+            response = self.get_client(self.admin).get(METRICS_URL)
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        labels = 'view="TagViewSet.list",method="GET"'
+        self.assertIn(f'foodgram_requests_total{{{labels},status="200"}}',
+                      content)
+        self.assertIn(f'foodgram_request_renderer_seconds_count{{{labels}}}',
+                      content)
+        self.assertIn('foodgram_cache_requests_total{cache="catalogue",',
+                      content)
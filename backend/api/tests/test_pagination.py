@@ -0,0 +1,103 @@
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.pagination import MAX_PAGE_SIZE
+from recipes.models import Recipe, TrendingRecipe
+from users.models import User
+
+URL = '/api/recipes/?limit={}'
+CURSOR_URL = URL + '&pagination=cursor'
+TRENDING_URL = '/api/recipes/trending/?limit={}'
+RECIPES = MAX_PAGE_SIZE + 5
+
+
+class PaginationTest(TestCase):
+    """Размер страницы ограничен, курсор не теряет и не повторяет
+    рецепты при вставках между страницами."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='-'
+        )
+        Recipe.objects.bulk_create([
+            Recipe(author=cls.author, name=f'Рецепт {number}', text='-',
+                   cooking_time=10, image='recipes/test.png')
+            for number in range(RECIPES)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_limit_is_capped(self):
+        for url in (URL, CURSOR_URL):
+            with self.subTest(url=url):
+                data = self.get(url.format(MAX_PAGE_SIZE * 10))
+                self.assertEqual(len(data['results']), MAX_PAGE_SIZE)
+                self.assertIsNotNone(data['next'])
+
+    def test_cursor_is_stable_across_pages(self):
+        expected = list(Recipe.objects.order_by('-id').values_list(
+            'id', flat=True
+        ))
+        url, walked = CURSOR_URL.format(7), []
+        while url:
+            self.assertIn('pagination=cursor', url)
+            data = self.get(url)
+            walked += [recipe['id'] for recipe in data['results']]
+            url = data['next']
+            if len(walked) == 7:
+                # Новый рецепт появляется в начале ленты и не сдвигает
+                # следующие страницы.
+                Recipe.objects.create(
+                    author=self.author, name='Новый', text='-',
+                    cooking_time=10, image='recipes/test.png',
+                )
+        self.assertEqual(walked, expected)
+
+
+class TrendingPaginationTest(TestCase):
+    """Популярные листаются курсором по целой позиции без пропусков
+    и повторов, при равенстве - по id."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='-'
+        )
+        Recipe.objects.bulk_create([
+            Recipe(author=author, name=f'Рецепт {number}', text='-',
+                   cooking_time=10, image='recipes/test.png')
+            for number in range(9)
+        ])
+        # Соседние позиции различаются на единицу, часть совпадает.
+        base = 10 ** 17
+        TrendingRecipe.objects.bulk_create([
+            TrendingRecipe(recipe=recipe, score=0,
+                           rank=base + number * 5 % 8 // 2,
+                           refreshed_at=timezone.now())
+            # Первый рецепт не в рейтинге и в выдачу не попадает.
+            for number, recipe in enumerate(Recipe.objects.order_by('id')[1:])
+        ])
+
+    def test_order_and_cursor_walk(self):
+        expected = list(TrendingRecipe.objects.order_by(
+            '-rank', '-recipe_id'
+        ).values_list('recipe_id', flat=True))
+        client = APIClient()
+        response = client.get(TRENDING_URL.format(100))
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']], expected
+        )
+        url, walked = TRENDING_URL.format(3) + '&pagination=cursor', []
+        while url:
+            data = client.get(url).data
+            walked += [recipe['id'] for recipe in data['results']]
+            url = data['next']
+        self.assertEqual(walked, expected)
@@ -0,0 +1,80 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.profiling import get_profile_store
+from users.models import User
+
+URL = '/api/recipes/'
+
+
+class ProfilingMiddlewareTest(TestCase):
+    """Профиль снимается только по запросу суперпользователя."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='-'
+        )
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='-'
+        )
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.directory = Path(directory)
+        settings_override = override_settings(PROFILING_DIR=self.directory,
+                                              PROFILING_MAX_ENTRIES=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def get_token_client(self, user):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}'
+        )
+        return client
+
+    def get(self, client, url=URL, **headers):
+        response = client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_not_superuser(self):
+        for client in (APIClient(), self.get_token_client(self.user)):
+            response = self.get(client, HTTP_X_PROFILE='1')
+            self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    def test_superuser(self):
+        session = APIClient()
+        session.force_login(self.admin)
+        token = self.get_token_client(self.admin)
+        for client, headers, url, kind in (
+            (session, {'HTTP_X_PROFILE': '1'}, URL, 'cprofile'),
+            (token, {'HTTP_X_PROFILE': 'sampling'}, URL, 'sampling'),
+            (token, {}, f'{URL}?profile=1', 'cprofile'),
+        ):
+            with self.subTest(kind=kind, url=url):
+                response = self.get(client, url, **headers)
+                meta, path = get_profile_store().get(
+                    response['X-Profile-Id']
+                )
+                self.assertEqual(meta['kind'], kind)
+                self.assertEqual(meta['view'], 'RecipesViewSet.list')
+                self.assertEqual(meta['status'], 200)
+                self.assertTrue(path.exists())
+        # Хранятся только последние PROFILING_MAX_ENTRIES профилей.
+        self.assertEqual(len(get_profile_store().list()), 2)
+        self.assertEqual(len(list(self.directory.glob('*.json'))), 2)
+        self.assertNotIn('X-Profile-Id', self.get(session))
+
+    def test_profile_id_is_checked(self):
+        store = get_profile_store()
+        self.assertIsNone(store.get('../secret'))
+        self.assertIsNone(store.get('missing'))
@@ -0,0 +1,121 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCartIngredient, ShoppingList, Tag)
+from users.models import User
+
+DETAIL_URL = '/api/recipes/{}/'
+
+
+class RecipeIngredientsUpdateTest(TestCase):
+    """Правка рецепта меняет только отличающиеся строки состава
+    и сводные корзины."""
+
+    def setUp(self):
+        # Тесты меняют состав, поэтому рецепт свой у каждого.
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com', password='-'
+        )
+        self.reader = User.objects.create_user(
+            username='reader', email='reader@example.com', password='-'
+        )
+        self.tags = [
+            Tag.objects.create(name=f'Тег {number}', color=f'#00000{number}',
+                               slug=f'tag{number}')
+            for number in range(2)
+        ]
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(30)
+        ])
+        self.ingredients = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='-', cooking_time=10,
+            image='recipes/test.png',
+        )
+        self.recipe.tags.set(self.tags[:1])
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=self.recipe, ingredient_id=ingredient_id,
+                             amount=number + 1)
+            for number, ingredient_id in enumerate(self.ingredients[:3])
+        ])
+        for user in (self.author, self.reader):
+            ShoppingList.objects.link_recipes(user.id, [self.recipe.id])
+            ShoppingCartIngredient.objects.add_recipes(user,
+                                                       [self.recipe.id])
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def patch(self, amounts, tags=None):
+        response = self.client.patch(DETAIL_URL.format(self.recipe.id), {
+            'name': 'Рецепт', 'text': '-', 'cooking_time': 10,
+            'tags': tags or [self.tags[0].id],
+            'ingredients': [{'id': ingredient_id, 'amount': amount}
+                            for ingredient_id, amount in amounts.items()],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def stored_rows(self):
+        return {
+            ingredient_id: (pk, amount)
+            for pk, ingredient_id, amount in RecipeIngredient.objects.filter(
+                recipe=self.recipe
+            ).values_list('pk', 'ingredient_id', 'amount')
+        }
+
+    def assertCartsMatch(self):
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in ShoppingCartIngredient.objects.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            )
+        }
+        self.assertEqual(stored, ShoppingCartIngredient.objects.expected())
+
+    def test_diff(self):
+        first, second, third, fourth = self.ingredients[:4]
+        before = self.stored_rows()
+        response = self.patch({second: 5, third: 3, fourth: 4},
+                              tags=[tag.id for tag in self.tags])
+        rows = self.stored_rows()
+        self.assertEqual(
+            {ingredient_id: amount for ingredient_id, (_, amount)
+             in rows.items()},
+            {second: 5, third: 3, fourth: 4},
+        )
+        # Существующие строки обновлены на месте, а не пересозданы.
+        self.assertEqual(rows[second][0], before[second][0])
+        self.assertEqual(rows[third][0], before[third][0])
+        self.assertEqual(
+            sorted((item['id'], item['amount'])
+                   for item in response.data['ingredients']),
+            sorted(((second, 5), (third, 3), (fourth, 4))),
+        )
+        self.assertCountEqual(self.recipe.tags.all(), self.tags)
+        self.assertCartsMatch()
+        # Тот же состав ничего не меняет.
+        self.patch({second: 5, third: 3, fourth: 4})
+        self.assertEqual(self.stored_rows(), rows)
+        self.assertCartsMatch()
+
+    def count_queries(self, amounts):
+        with CaptureQueriesContext(connection) as queries:
+            self.patch(amounts)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_ingredients(self):
+        small = self.count_queries({
+            ingredient_id: 2 for ingredient_id in self.ingredients[1:4]
+        })
+        large = self.count_queries({
+            ingredient_id: 3 for ingredient_id in self.ingredients[2:30]
+        })
+        self.assertEqual(small, large)
+        self.assertCartsMatch()
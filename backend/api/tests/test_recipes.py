@@ -0,0 +1,118 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingList, Tag)
+from users.models import Follow, User
+
+LIST_URL = '/api/recipes/?limit={}'
+DETAIL_URL = '/api/recipes/{}/'
+PAGE_SIZES = (6, 50)
+QUERY_BUDGET = 10
+
+
+class RecipeQueryBudgetTest(TestCase):
+    """Число запросов списка и рецепта не зависит от размера страницы
+    и числа связанных объектов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com', password='-',
+            )
+            for number in range(5)
+        ]
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com', password='-'
+        )
+        tags = [
+            Tag.objects.create(name=f'Тег {number}', color=f'#00000{number}',
+                               slug=f'tag{number}')
+            for number in range(3)
+        ]
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(20)
+        ])
+        ingredients = list(Ingredient.objects.order_by('id'))
+        cls.recipes = []
+        for number in range(60):
+            recipe = Recipe.objects.create(
+                author=cls.authors[number % len(cls.authors)],
+                name=f'Рецепт {number}', text='-', cooking_time=10,
+                image='recipes/test.png',
+            )
+            recipe.tags.set(tags[:number % len(tags) + 1])
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=1)
+                for ingredient in ingredients[:number % 10 + 1]
+            ])
+            cls.recipes.append(recipe)
+        for recipe in cls.recipes[::2]:
+            FavoriteRecipe.objects.create(user=cls.reader, recipe=recipe)
+        for recipe in cls.recipes[::3]:
+            ShoppingList.objects.create(user=cls.reader, recipe=recipe)
+        for author in cls.authors[:2]:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def get_clients(self):
+        authenticated = APIClient()
+        authenticated.force_authenticate(self.reader)
+        return {'anonymous': APIClient(), 'authenticated': authenticated}
+
+    def count_queries(self, client, url):
+        # Кеш фрагментов сбрасывается: замеряется худший случай.
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), QUERY_BUDGET)
+        return len(queries), response
+
+    def test_list_query_count_does_not_depend_on_page_size(self):
+        for name, client in self.get_clients().items():
+            with self.subTest(user=name):
+                counts = []
+                for page_size in PAGE_SIZES:
+                    count, response = self.count_queries(
+                        client, LIST_URL.format(page_size)
+                    )
+                    self.assertEqual(len(response.json()['results']),
+                                     page_size)
+                    counts.append(count)
+                self.assertEqual(counts[0], counts[1])
+
+    def test_detail_query_count_does_not_depend_on_relations(self):
+        # У первого рецепта 1 тег и 1 ингредиент, у последнего - 3 и 10.
+        small, large = self.recipes[0], self.recipes[-1]
+        for name, client in self.get_clients().items():
+            with self.subTest(user=name):
+                self.assertEqual(
+                    self.count_queries(client, DETAIL_URL.format(small.id))[0],
+                    self.count_queries(client, DETAIL_URL.format(large.id))[0],
+                )
+
+    def test_list_flags_match_database(self):
+        client = self.get_clients()['authenticated']
+        _, response = self.count_queries(client, LIST_URL.format(50))
+        favorited = set(FavoriteRecipe.objects.filter(
+            user=self.reader
+        ).values_list('recipe_id', flat=True))
+        in_cart = set(ShoppingList.objects.filter(
+            user=self.reader
+        ).values_list('recipe_id', flat=True))
+        followed = set(Follow.objects.filter(
+            user=self.reader
+        ).values_list('author_id', flat=True))
+        for recipe in response.json()['results']:
+            self.assertEqual(recipe['is_favorited'], recipe['id'] in favorited)
+            self.assertEqual(recipe['is_in_shopping_cart'],
+                             recipe['id'] in in_cart)
+            self.assertEqual(recipe['author']['is_subscribed'],
+                             recipe['author']['id'] in followed)
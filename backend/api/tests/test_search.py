@@ -0,0 +1,62 @@
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes import search
+from recipes.models import Recipe
+from users.models import User
+
+URL = '/api/recipes/?search={}'
+RECIPES = (
+    ('Soup', 'Borscht base with beets'),
+    ('Borscht', 'Beets and cabbage'),
+    ('Salad', 'Cabbage'),
+    ('Green borscht', 'Sorrel'),
+    ('Борщ', 'Свёкла'),
+)
+
+
+class SearchTest(TestCase):
+    """Поиск находит рецепты по названию и описанию, совпадения
+    в названии идут первыми."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='-'
+        )
+        for name, text in RECIPES:
+            Recipe.objects.create(author=author, name=name, text=text,
+                                  cooking_time=10, image='recipes/test.png')
+
+    def search(self, value):
+        response = APIClient().get(URL.format(value))
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.data['results']]
+
+    def test_fts(self):
+        found = self.search('borscht')
+        self.assertCountEqual(found[:2], ['Borscht', 'Green borscht'])
+        self.assertEqual(found[2:], ['Soup'])
+        # Слова ищутся по префиксу и без учёта регистра.
+        self.assertEqual(self.search('CABB'), ['Salad', 'Borscht'])
+        self.assertEqual(self.search('бОРЩ'), ['Борщ'])
+        self.assertEqual(self.search('beets sorrel'), [])
+        self.assertEqual(self.search('!!!'), [])
+
+    def test_fts_follows_updates(self):
+        recipe = Recipe.objects.get(name='Salad')
+        recipe.text = 'Sorrel'
+        recipe.save()
+        self.assertEqual(self.search('sorrel'), ['Salad', 'Green borscht'])
+        recipe.delete()
+        self.assertEqual(self.search('sorrel'), ['Green borscht'])
+
+    def test_icontains_fallback(self):
+        with mock.patch.object(search, 'connection',
+                               mock.Mock(vendor='mysql')):
+            self.assertEqual(self.search('borscht'),
+                             ['Green borscht', 'Borscht', 'Soup'])
+            self.assertEqual(self.search('cabbage'), ['Salad', 'Borscht'])
+            self.assertEqual(self.search('sorrel soup'), [])
@@ -0,0 +1,158 @@
+import os
+import re
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import shopping_cart
+
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCartIngredient, ShoppingList)
+from users.models import User
+
+URL = '/api/recipes/download_shopping_cart/?type={}'
+FILE_TYPES = ('txt', 'csv', 'xlsx')
+INGREDIENTS_PER_RECIPE = 5
+# Один запрос: сводные строки корзины, без чтения рецептов.
+DOWNLOAD_QUERIES = 1
+
+
+class ShoppingCartTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='-'
+        )
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(50)
+        ])
+        cls.ingredients = list(Ingredient.objects.order_by('id'))
+        cls.recipes = []
+        for number in range(30):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}', text='-',
+                cooking_time=10, image='recipes/test.png',
+            )
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=cls.ingredients[
+                        (number + offset) % len(cls.ingredients)
+                    ],
+                    amount=offset + 1,
+                )
+                for offset in range(INGREDIENTS_PER_RECIPE)
+            ])
+            cls.recipes.append(recipe)
+
+    def create_user_with_cart(self, username, recipes_count):
+        user = User.objects.create_user(
+            username=username, email=f'{username}@example.com', password='-'
+        )
+        recipe_ids = [recipe.id for recipe in self.recipes[:recipes_count]]
+        ShoppingList.objects.link_recipes(user.id, recipe_ids)
+        ShoppingCartIngredient.objects.add_recipes(user, recipe_ids)
+        return user
+
+
+class DownloadShoppingCartQueriesTest(ShoppingCartTestCase):
+    """Число запросов к базе не зависит от размера корзины."""
+
+    def download(self, user, file_type):
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.assertNumQueries(DOWNLOAD_QUERIES):
+            response = client.get(URL.format(file_type))
+            # Строки читаются при отдаче потокового ответа.
+            content = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(content)
+
+    def test_query_count_does_not_grow_with_cart(self):
+        small = self.create_user_with_cart('small', 1)
+        large = self.create_user_with_cart('large', len(self.recipes))
+        for file_type in FILE_TYPES:
+            with self.subTest(file_type=file_type):
+                self.download(small, file_type)
+                self.download(large, file_type)
+
+    def test_amounts_are_summed_per_ingredient(self):
+        user = self.create_user_with_cart('cart', len(self.recipes))
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(URL.format('txt'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        expected = {}
+        for recipe_ingredient in RecipeIngredient.objects.select_related(
+                'ingredient'):
+            name = recipe_ingredient.ingredient.name
+            expected[name] = (
+                expected.get(name, 0) + recipe_ingredient.amount
+            )
+        self.assertEqual(
+            sorted(lines[2:]),
+            sorted(f'{name}, {amount} г' for name, amount in expected.items()),
+        )
+
+
+@skipUnless(os.path.exists(settings.SHOPPING_LIST_PDF_FONT),
+            'нет шрифта для PDF')
+class ShoppingCartPdfTest(ShoppingCartTestCase):
+    """PDF отрисовывается заново, только когда меняются строки списка."""
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(shopping_cart, 'render_pdf',
+                                    wraps=shopping_cart.render_pdf)
+        self.render_pdf = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def download(self, client, queries):
+        # Строки корзины читаются дважды: для ключа кеша и для
+        # отрисовки; при попадании в кеш - один раз.
+        with self.assertNumQueries(queries):
+            response = client.get(URL.format('pdf'))
+            content = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('shopping-list.pdf',
+                      response['Content-Disposition'])
+        self.assertTrue(content.startswith(b'%PDF'))
+        return content
+
+    def test_cache_hit_and_miss(self):
+        user = self.create_user_with_cart('pdf', 3)
+        client = APIClient()
+        client.force_authenticate(user)
+        first = self.download(client, 2)
+        self.assertEqual(self.render_pdf.call_count, 1)
+        self.assertEqual(self.download(client, 1), first)
+        self.assertEqual(self.render_pdf.call_count, 1)
+        # Те же строки у другого пользователя - тот же файл из кеша.
+        other = self.create_user_with_cart('same', 3)
+        client.force_authenticate(other)
+        self.assertEqual(self.download(client, 1), first)
+        self.assertEqual(self.render_pdf.call_count, 1)
+        ShoppingList.objects.link_recipes(other.id, [self.recipes[3].id])
+        ShoppingCartIngredient.objects.add_recipes(other,
+                                                   [self.recipes[3].id])
+        self.assertNotEqual(self.download(client, 2), first)
+        self.assertEqual(self.render_pdf.call_count, 2)
+
+    def test_query_count_does_not_grow_with_cart(self):
+        user = self.create_user_with_cart('large', len(self.recipes))
+        client = APIClient()
+        client.force_authenticate(user)
+        self.download(client, 2)
+
+    @override_settings(SHOPPING_LIST_PDF_MAX_ROWS=3)
+    def test_rows_are_capped(self):
+        rows = [(f'Ингредиент {number}', 1, 'г') for number in range(200)]
+        content = shopping_cart.render_pdf(iter(rows)).read()
+        self.assertEqual(re.search(rb'/Count (\d+)', content).group(1),
+                         b'1')
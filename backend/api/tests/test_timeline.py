@@ -0,0 +1,93 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, TimelineEntry
+from users.models import Follow, User
+
+URL = '/api/recipes/timeline/?limit={}'
+
+
+@override_settings(TIMELINE_BACKEND='join')
+class TimelineJoinTest(TestCase):
+    """Лента подписок: рецепты авторов из подписок от новых к старым."""
+
+    def setUp(self):
+        # Подписки меняются в тестах, а ленты fanout ведут сигналы.
+        self.reader = User.objects.create_user(
+            username='reader', email='reader@example.com', password='-'
+        )
+        self.authors = [
+            User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com', password='-',
+            )
+            for number in range(4)
+        ]
+        for number in range(12):
+            self.create_recipe(self.authors[number % 4], number)
+        for author in self.authors[:3]:
+            Follow.objects.create(user=self.reader, author=author)
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def create_recipe(self, author, number):
+        return Recipe.objects.create(
+            author=author, name=f'Рецепт {number}', text='-',
+            cooking_time=10, image='recipes/test.png',
+        )
+
+    def walk(self, limit=5):
+        url, walked = URL.format(limit), []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            walked += [recipe['id'] for recipe in response.data['results']]
+            url = response.data['next']
+        return walked
+
+    def expected(self):
+        return list(Recipe.objects.filter(
+            author__following__user=self.reader
+        ).order_by('-id').values_list('id', flat=True))
+
+    def test_follows_and_new_recipes(self):
+        self.assertEqual(len(self.expected()), 9)
+        self.assertEqual(self.walk(), self.expected())
+        recipe = self.create_recipe(self.authors[1], 12)
+        self.create_recipe(self.authors[3], 13)
+        Follow.objects.filter(user=self.reader,
+                              author=self.authors[2]).delete()
+        walked = self.walk()
+        self.assertEqual(walked, self.expected())
+        self.assertEqual(walked[0], recipe.id)
+        Follow.objects.create(user=self.reader, author=self.authors[3])
+        self.assertEqual(self.walk(limit=100), self.expected())
+
+    def test_empty(self):
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertEqual(self.walk(), [])
+
+
+@override_settings(TIMELINE_BACKEND='fanout')
+class TimelineFanoutTest(TimelineJoinTest):
+    """То же из готовых лент, и с тем же результатом, что join."""
+
+    def walk(self, limit=5):
+        walked = super().walk(limit)
+        with override_settings(TIMELINE_BACKEND='join'):
+            self.assertEqual(super().walk(limit), walked)
+        return walked
+
+    def test_rebuild_timeline(self):
+        entries = set(TimelineEntry.objects.values_list('user_id',
+                                                        'recipe_id'))
+        self.assertEqual(len(entries), 9)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timeline', stdout=StringIO())
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('user_id', 'recipe_id')),
+            entries,
+        )
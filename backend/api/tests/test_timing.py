@@ -0,0 +1,51 @@
+import re
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import middleware
+
+URL = '/api/recipes/'
+SERVER_TIMING_RE = re.compile(
+    r'^db;dur=[\d.]+;desc="(\d+) queries", total;dur=[\d.]+$'
+)
+
+
+class QueryTimingMiddlewareTest(TestCase):
+    """Замер запросов к базе делается только для выборки запросов."""
+
+    def get(self, random_value=0.0):
+        # Middleware читает настройки при создании обработчика, то есть
+        # при первом запросе нового клиента.
+        with mock.patch.object(middleware.random, 'random',
+                               return_value=random_value):
+            response = APIClient().get(URL)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_disabled(self):
+        self.assertNotIn('Server-Timing', self.get())
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0.5)
+    def test_sampled(self):
+        self.assertNotIn('Server-Timing', self.get(0.5))
+        match = SERVER_TIMING_RE.match(self.get(0.49)['Server-Timing'])
+        self.assertIsNotNone(match)
+        self.assertGreater(int(match.group(1)), 0)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1, REQUEST_QUERY_BUDGET=0)
+    def test_over_budget_is_logged(self):
+        with self.assertLogs('api.middleware', 'WARNING') as logs:
+            self.get()
+        self.assertIn('GET /api/recipes/ (RecipesViewSet.list)',
+                      logs.output[0])
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1,
+                       REQUEST_QUERY_BUDGET=100,
+                       REQUEST_TIME_BUDGET_MS=10 ** 6)
+    def test_within_budget_is_not_logged(self):
+        with mock.patch.object(middleware.logger, 'warning') as warning:
+            self.assertIn('Server-Timing', self.get())
+        warning.assert_not_called()
@@ -3,7 +3,8 @@ from rest_framework.routers import DefaultRouter
 
 from .views import (IngredientViewSet,
                     RecipesViewSet,
-                    TagViewSet)
+                    TagViewSet,
+                    prometheus_metrics)
 
 app_name = 'recipes'
 
@@ -15,5 +16,6 @@ api_recipes_router_v1.register(r'recipes', RecipesViewSet,
                                basename='recipes')
 
 urlpatterns = [
+    path('metrics/', prometheus_metrics, name='metrics'),
     path(r'', include(api_recipes_router_v1.urls)),
 ]
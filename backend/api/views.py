@@ -1,81 +1,219 @@
-from django.db.models import F, Sum
-from django.http import HttpResponse
+import hashlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, status, viewsets
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import LimitPageNumberPaginator
+from .ingredient_search import search_ingredients
+from .metrics import render_prometheus
+from .mixins import CatalogueCacheMixin
+from .pagination import LimitCursorPaginator, LimitPageNumberPaginator
+from .parsers import NDJSONParser
 from .permissions import IsAdminOrReadOnly, IsAuthorOrAdmin
-from recipes.models import (Ingredient,
+from recipes.models import (FavoriteRecipe,
+                            Ingredient,
                             Recipe,
-                            RecipeIngredient,
+                            ShoppingCartIngredient,
                             ShoppingList,
                             Tag)
 from .serializers import (AddRecipeSerializer,
                           IngredientSerializer,
+                          RecipeIdsSerializer,
                           RecipeSerializer,
-                          ShowIngredientsInRecipeSerializer,
+                          ShowRecipeListSerializer,
                           ShowRecipeSerializer,
                           TagSerializer)
-
-
-class GetListIngredientsViewSet(viewsets.ModelViewSet):
-    queryset = Ingredient.objects.all()
-    serializer_classes = ShowIngredientsInRecipeSerializer
-
-    def get_list_ingredients(user):
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_recipe__user=user).values(
-            name=F('ingredient__name'),
-            measurement_unit=F('ingredient__measurement_unit')
-        ).annotate(amount=Sum('amount')).values_list(
-                'ingredient__name', 'amount', 'ingredient__measurement_unit')
-        return ingredients
+from .recipe_import import import_recipes
+from .shopping_cart import (DEFAULT_FILE_TYPE,
+                            RENDERERS,
+                            shopping_cart_response)
+from recipes.catalogue import get_catalogue_versions
+from recipes.timeline import timeline_recipes
+from users.models import Follow
 
 
 class RecipesViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_classes = {
         'retrieve': ShowRecipeSerializer,
-        'list': ShowRecipeSerializer,
+        'list': ShowRecipeListSerializer,
+        'trending': ShowRecipeListSerializer,
+        'timeline': ShowRecipeListSerializer,
     }
     default_serializer_class = AddRecipeSerializer
     permission_classes = (IsAuthorOrAdmin,)
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
     pagination_class = LimitPageNumberPaginator
+    lookup_value_regex = r'\d+'
+
+    def get_queryset(self):
+        if self.action not in self.serializer_classes:
+            return super().get_queryset()
+        # Теги и ингредиенты подгружает сериализатор, и только для
+        # рецептов, которых нет в кеше фрагментов.
+        queryset = Recipe.objects.select_related('author')
+        if self.action == 'trending':
+            queryset = queryset.filter(trending__isnull=False).annotate(
+                trending_rank=F('trending__rank')
+            )
+        elif self.action == 'timeline':
+            queryset = timeline_recipes(queryset, self.request.user)
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset
+        return queryset.annotate(
+            is_favorited=Exists(FavoriteRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+        )
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'trending':
+            # Поиск сортирует по релевантности, здесь порядок - рейтинг.
+            return queryset.order_by('-trending_rank', '-id')
+        return queryset
+
+    @property
+    def cursor_ordering(self):
+        # ?pagination=cursor у популярных листает по рейтингу, а не по id.
+        # Ключ - целая позиция: float в курсоре мог бы потерять точность.
+        if self.action == 'trending':
+            return ('-trending_rank', '-id')
+        return None
 
     def get_serializer_class(self):
         return self.serializer_classes.get(self.action,
                                            self.default_serializer_class)
 
-    def _favorite_shopping_post(self, related_manager):
+    def get_detail_validators(self):
+        """ETag и Last-Modified рецепта одним лёгким запросом.
+
+        Связанные строки не загружаются: ETag складывается из даты
+        изменения рецепта, его счётчиков, полей автора, версий
+        справочников тегов и ингредиентов и, для авторизованного
+        пользователя, его флагов избранного, корзины и подписки.
+        Last-Modified отдаётся только анонимам: флаги пользователя
+        не меняют дату изменения рецепта.
+        """
+        pk = str(self.kwargs['pk'])
+        if not pk.isdigit():
+            # Не число - get_object ответит 404.
+            return None, None
+        user = self.request.user
+        queryset = Recipe.objects.filter(pk=pk)
+        fields = ['updated_at', 'image_variants_for', 'favorites_count',
+                  'in_cart_count', 'author__email',
+                  'author__username', 'author__first_name',
+                  'author__last_name']
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_favorited=Exists(FavoriteRecipe.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+                is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+                is_subscribed=Exists(Follow.objects.filter(
+                    user=user, author=OuterRef('author')
+                )),
+            )
+            fields += ['is_favorited', 'is_in_shopping_cart',
+                       'is_subscribed']
+        state = queryset.values_list(*fields).first()
+        if state is None:
+            return None, None
+        state += get_catalogue_versions(Tag, Ingredient)
+        etag = '"{}"'.format(hashlib.sha1(repr(state).encode()).hexdigest())
+        if user.is_authenticated:
+            return etag, None
+        return etag, int(state[0].timestamp())
+
+    def retrieve(self, request, *args, **kwargs):
+        etag, last_modified = self.get_detail_validators()
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        if etag is not None:
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            patch_vary_headers(response, ('Authorization',))
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        ShoppingCartIngredient.objects.remove_recipe_from_all(instance)
+        instance.delete()
+
+    def _link_recipes(self, model, recipe_ids, on_change=None):
+        """Добавляет рецепты одним INSERT, возвращает id добавленных.
+
+        Повторное добавление ничего не меняет, on_change вызывается
+        только для действительно добавленных рецептов.
+        """
+        user = self.request.user
+        with transaction.atomic():
+            added = model.objects.link_recipes(user.id, recipe_ids)
+            if added and on_change is not None:
+                on_change(user, added)
+        return added
+
+    def _unlink_recipes(self, model, recipe_ids=None, on_change=None):
+        """Удаляет рецепты одним DELETE, возвращает id удалённых."""
+        user = self.request.user
+        with transaction.atomic():
+            removed = model.objects.unlink_recipes(user.id, recipe_ids)
+            if removed and on_change is not None:
+                on_change(user, removed)
+        return removed
+
+    def _favorite_shopping_post(self, model, on_change=None):
         recipe = self.get_object()
-        if related_manager.filter(recipe=recipe).exists():
-            raise ValidationError('Рецепт уже в избранном')
-        related_manager.create(recipe=recipe)
+        added = self._link_recipes(model, [recipe.id], on_change)
         serializer = RecipeSerializer(instance=recipe)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED if added else status.HTTP_200_OK,
+        )
 
-    def _favorite_shopping_delete(self, related_manager):
-        recipe = self.get_object()
-        related_manager.get(recipe_id=recipe.id).delete()
+    def _favorite_shopping_delete(self, model, on_change=None):
+        self._unlink_recipes(model, [int(self.kwargs['pk'])], on_change)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def _batch_links(self, model, on_add=None, on_remove=None):
+        serializer = RecipeIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        if self.request.method == 'POST':
+            changed = self._link_recipes(model, recipe_ids, on_add)
+        else:
+            changed = self._unlink_recipes(model, recipe_ids, on_remove)
+        return Response({'recipes': changed})
+
     @action(detail=True,
             permission_classes=[permissions.IsAuthenticated],
             methods=('POST', 'DELETE',), )
     def favorite(self, request, pk=None):
         if request.method == 'POST':
-            return self._favorite_shopping_post(
-                request.user.favorite
-            )
-        return self._favorite_shopping_delete(
-            request.user.favorite
-        )
+            return self._favorite_shopping_post(FavoriteRecipe)
+        return self._favorite_shopping_delete(FavoriteRecipe)
 
     @action(detail=True,
             permission_classes=[permissions.IsAuthenticated],
@@ -83,57 +221,146 @@ class RecipesViewSet(viewsets.ModelViewSet):
     def shopping_cart(self, request, pk=None):
         if request.method == 'POST':
             return self._favorite_shopping_post(
-                request.user.shopping_user
+                ShoppingList,
+                ShoppingCartIngredient.objects.add_recipes,
             )
         return self._favorite_shopping_delete(
-            request.user.shopping_user
+            ShoppingList,
+            ShoppingCartIngredient.objects.remove_recipes,
         )
 
     @action(
         detail=False,
-        methods=('get',),
-        permission_classes=(IsAuthorOrAdmin,)
+        methods=('post', 'delete'),
+        url_path='favorite',
+        url_name='favorite-batch',
+        permission_classes=(permissions.IsAuthenticated,),
     )
-    def download_shopping_cart(self, request):
-        shopping_cart = ShoppingList.objects.filter(user=self.request.user)
-        recipes = [item.recipe.id for item in shopping_cart]
-        buy_list = RecipeIngredient.objects.filter(
-            recipe__in=recipes
-        ).values(
-            'ingredient'
-        ).annotate(
-            amount=Sum('amount')
+    def favorite_batch(self, request):
+        """Добавляет или удаляет пачку рецептов: {"recipes": [id, ...]}.
+
+        В ответе - id рецептов, которые действительно изменились.
+        """
+        return self._batch_links(FavoriteRecipe)
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def shopping_cart_batch(self, request):
+        return self._batch_links(
+            ShoppingList,
+            ShoppingCartIngredient.objects.add_recipes,
+            ShoppingCartIngredient.objects.remove_recipes,
         )
 
-        buy_list_text = 'Список покупок с сайта Foodgram:\n\n'
-        for item in buy_list:
-            ingredient = Ingredient.objects.get(pk=item['ingredient'])
-            amount = item['amount']
-            buy_list_text += (
-                f'{ingredient.name}, {amount} '
-                f'{ingredient.measurement_unit}\n'
-            )
+    @action(
+        detail=False,
+        methods=('delete',),
+        url_path='shopping_cart/clear',
+        url_name='shopping-cart-clear',
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def clear_shopping_cart(self, request):
+        # Сводный список очищается целиком, без вычитания рецептов.
+        with transaction.atomic():
+            ShoppingList.objects.unlink_recipes(request.user.id)
+            ShoppingCartIngredient.objects.clear(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-        response = HttpResponse(buy_list_text, content_type="text/plain")
-        response['Content-Disposition'] = (
-            'attachment; filename=shopping-list.txt'
+    @action(detail=False, methods=('get',))
+    def trending(self, request):
+        """Популярные рецепты из таблицы TrendingRecipe.
+
+        Рейтинг - затухающая со временем сумма добавлений в избранное
+        и корзину, его пересчитывает команда refresh_trending. Фильтры
+        те же, что у списка рецептов.
+        """
+        return self.list(request)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def timeline(self, request):
+        """Рецепты авторов из подписок, от новых к старым.
+
+        Пагинация только по курсору (ключ - id рецепта), поэтому
+        стоимость страницы не растёт с глубиной ленты.
+        """
+        paginator = LimitCursorPaginator()
+        paginator.ordering = '-timeline_position'
+        page = paginator.paginate_queryset(
+            self.filter_queryset(self.get_queryset()), request, view=self
         )
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
-        return response
+    @action(
+        detail=False,
+        methods=('post',),
+        url_path='import',
+        permission_classes=(permissions.IsAuthenticated,),
+        parser_classes=(NDJSONParser,),
+    )
+    def bulk_import(self, request):
+        report = import_recipes(
+            request.data, request.user,
+            max_rows=settings.RECIPE_IMPORT_MAX_ROWS,
+        )
+        return Response(report)
 
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def download_shopping_cart(self, request):
+        file_type = request.query_params.get('type', DEFAULT_FILE_TYPE)
+        if file_type not in RENDERERS:
+            raise ValidationError(
+                f'Формат {file_type} не поддерживается. '
+                f'Доступные форматы: {", ".join(RENDERERS)}.'
+            )
+        return shopping_cart_response(request.user, file_type)
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+class TagViewSet(CatalogueCacheMixin, viewsets.ReadOnlyModelViewSet):
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = (IsAdminOrReadOnly,)
 
+    def list(self, request, *args, **kwargs):
+        return self.catalogue_response(request)
+
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogueCacheMixin, viewsets.ReadOnlyModelViewSet):
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None:
+            return self.catalogue_response(request)
+        serializer = self.get_serializer(search_ingredients(name), many=True)
+        return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def prometheus_metrics(request):
+    """Метрики всех воркеров в формате Prometheus, только для админов."""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(render_prometheus(),
+                        content_type='text/plain; version=0.0.4')
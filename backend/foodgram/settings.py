@@ -26,11 +26,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.QueryTimingMiddleware',
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -97,6 +100,61 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+SHOPPING_LIST_PDF_SPOOL_SIZE = 1024 * 1024
+# PDF собирается в памяти целиком: больше строк не рисуется.
+SHOPPING_LIST_PDF_MAX_ROWS = 5000
+SHOPPING_LIST_PDF_CACHE_TIMEOUT = 60 * 60 * 24
+
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+RECIPE_IMAGE_MAX_SIDE = 8000
+RECIPE_IMAGE_MAX_PIXELS = 40_000_000
+
+RECIPE_IMPORT_WORKERS = int(os.getenv('RECIPE_IMPORT_WORKERS', default=2))
+RECIPE_IMPORT_MAX_ROWS = 1000
+RECIPE_BATCH_MAX_SIZE = 500
+
+RECIPE_FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+# Как часто воркер сверяет версию справочника для автодополнения
+# ингредиентов, секунды.
+INGREDIENT_INDEX_VERSION_TTL = 5
+
+TRENDING_HALF_LIFE_HOURS = int(
+    os.getenv('TRENDING_HALF_LIFE_HOURS', default=48)
+)
+TRENDING_WINDOW_DAYS = 30
+TRENDING_REFRESH_LAG = 60
+
+# join - лента запросом по подпискам, fanout - из таблицы TimelineEntry,
+# которая заполняется при записи. При переключении на fanout выполнить
+# manage.py rebuild_timeline.
+TIMELINE_BACKEND = os.getenv('TIMELINE_BACKEND', default='join')
+
+REQUEST_TIMING_SAMPLE_RATE = float(
+    os.getenv('REQUEST_TIMING_SAMPLE_RATE', default=0)
+)
+REQUEST_QUERY_BUDGET = int(os.getenv('REQUEST_QUERY_BUDGET', default=30))
+REQUEST_TIME_BUDGET_MS = int(os.getenv('REQUEST_TIME_BUDGET_MS', default=500))
+
+PROFILING_DIR = os.getenv('PROFILING_DIR', default=BASE_DIR / 'profiles')
+PROFILING_MAX_ENTRIES = 50
+PROFILING_SAMPLE_INTERVAL = 0.001
+
+# Включает MetricsMiddleware: замер времени и запросов к базе на каждом
+# запросе, поэтому по умолчанию выключено.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', default='0') == '1'
+# Общий для всех воркеров gunicorn каталог.
+METRICS_DIR = os.getenv('METRICS_DIR', default=BASE_DIR / 'metrics')
+METRICS_FLUSH_INTERVAL = 5
+
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', default=2))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
@@ -1,12 +1,15 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from api.admin import profile_urls
+
 api_patterns = [
     path('', include('users.urls', namespace='api_users')),
     path('', include('api.urls', namespace='api_recipes')),
 ]
 
 urlpatterns = [
+    path('admin/profiles/', include((profile_urls, 'profiles'))),
     path('admin/', admin.site.urls),
     path('api/', include(api_patterns)),
     path('api/', include('djoser.urls')),
@@ -1,4 +1,7 @@
+from collections import defaultdict
+
 from django.contrib import admin
+from django.db import transaction
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 
@@ -6,8 +9,10 @@ from .models import (FavoriteRecipe,
                      Ingredient,
                      Recipe,
                      RecipeIngredient,
+                     ShoppingCartIngredient,
                      ShoppingList,
-                     Tag)
+                     Tag,
+                     TrendingRecipe)
 
 
 @admin.register(Tag)
@@ -42,6 +47,27 @@ class RecipeIngredientsAdmin(admin.ModelAdmin):
         'amount',
     )
 
+    def save_model(self, request, obj, form, change):
+        recipe_ids = {obj.recipe_id}
+        if change:
+            recipe_ids |= set(RecipeIngredient.objects.filter(
+                pk=obj.pk
+            ).values_list('recipe_id', flat=True))
+        with ShoppingCartIngredient.objects.track_recipes(recipe_ids):
+            super().save_model(request, obj, form, change)
+        Recipe.touch(recipe_ids)
+
+    def delete_model(self, request, obj):
+        with ShoppingCartIngredient.objects.track_recipes([obj.recipe_id]):
+            super().delete_model(request, obj)
+        Recipe.touch([obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        with ShoppingCartIngredient.objects.track_recipes(recipe_ids):
+            super().delete_queryset(request, queryset)
+        Recipe.touch(recipe_ids)
+
 
 class RecipeIngredientsInline(admin.TabularInline):
     model = RecipeIngredient
@@ -55,9 +81,29 @@ class RecipeAdmin(admin.ModelAdmin):
         'text',
         'image',
         'cooking_time',
+        'favorites_count',
+        'in_cart_count',
     )
+    readonly_fields = ('favorites_count', 'in_cart_count')
     inlines = (RecipeIngredientsInline,)
 
+    def save_related(self, request, form, formsets, change):
+        # Ингредиенты из инлайна меняют сводные списки покупок.
+        with ShoppingCartIngredient.objects.track_recipes(
+                [form.instance.pk]):
+            super().save_related(request, form, formsets, change)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            ShoppingCartIngredient.objects.remove_recipe_from_all(obj)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for recipe in queryset:
+                ShoppingCartIngredient.objects.remove_recipe_from_all(recipe)
+            super().delete_queryset(request, queryset)
+
 
 @admin.register(FavoriteRecipe)
 class FavoriteRecipeAdmin(admin.ModelAdmin):
@@ -75,3 +121,53 @@ class ShoppingListAdmin(admin.ModelAdmin):
         'user',
         'recipe',
     )
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            if change:
+                previous = ShoppingList.objects.select_related(
+                    'user'
+                ).get(pk=obj.pk)
+                ShoppingCartIngredient.objects.remove_recipes(
+                    previous.user, [previous.recipe_id]
+                )
+            super().save_model(request, obj, form, change)
+            ShoppingCartIngredient.objects.add_recipes(
+                obj.user, [obj.recipe_id]
+            )
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            ShoppingCartIngredient.objects.remove_recipes(
+                obj.user, [obj.recipe_id]
+            )
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        carts = defaultdict(list)
+        for item in queryset.select_related('user'):
+            carts[item.user].append(item.recipe_id)
+        with transaction.atomic():
+            for user, recipe_ids in carts.items():
+                ShoppingCartIngredient.objects.remove_recipes(user, recipe_ids)
+            super().delete_queryset(request, queryset)
+
+
+@admin.register(ShoppingCartIngredient)
+class ShoppingCartIngredientAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'user',
+        'ingredient',
+        'amount',
+    )
+
+
+@admin.register(TrendingRecipe)
+class TrendingRecipeAdmin(admin.ModelAdmin):
+    list_display = (
+        'recipe',
+        'score',
+        'refreshed_at',
+    )
+    list_select_related = ('recipe',)
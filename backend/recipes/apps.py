@@ -5,3 +5,29 @@ class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
     verbose_name = 'Рецепты'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save, pre_save
+
+        from .catalogue import catalogue_changed
+        from .counters import COUNTERS, row_deleted, row_pre_save, row_saved
+        from .images import recipe_image_saved
+        from .models import Ingredient, Recipe, Tag
+        from .search import recipe_deleted, recipe_saved
+        from .timeline import follow_deleted, follow_saved, recipe_created
+        from users.models import Follow
+
+        post_save.connect(catalogue_changed, sender=Ingredient)
+        post_delete.connect(catalogue_changed, sender=Ingredient)
+        post_save.connect(catalogue_changed, sender=Tag)
+        post_delete.connect(catalogue_changed, sender=Tag)
+        post_save.connect(recipe_saved, sender=Recipe)
+        post_save.connect(recipe_image_saved, sender=Recipe)
+        post_delete.connect(recipe_deleted, sender=Recipe)
+        post_save.connect(recipe_created, sender=Recipe)
+        post_save.connect(follow_saved, sender=Follow)
+        post_delete.connect(follow_deleted, sender=Follow)
+        for sender in COUNTERS:
+            pre_save.connect(row_pre_save, sender=sender)
+            post_save.connect(row_saved, sender=sender)
+            post_delete.connect(row_deleted, sender=sender)
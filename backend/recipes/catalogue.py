@@ -0,0 +1,39 @@
+from django.db.models import F
+
+from .models import CatalogueVersion
+
+
+def get_model_key(model):
+    return model._meta.label_lower
+
+
+def get_catalogue_versions(*models):
+    """Текущие версии справочников (тегов, ингредиентов) одним запросом.
+
+    Версия - строка CatalogueVersion в базе, поэтому её видят все
+    воркеры и процессы manage.py, а изменение справочника и новая
+    версия фиксируются одной транзакцией.
+    """
+    versions = dict(CatalogueVersion.objects.filter(
+        model__in=[get_model_key(model) for model in models]
+    ).values_list('model', 'version'))
+    return tuple(versions.get(get_model_key(model), 0) for model in models)
+
+
+def get_catalogue_version(model):
+    return get_catalogue_versions(model)[0]
+
+
+def bump_catalogue_version(model):
+    key = get_model_key(model)
+    updated = CatalogueVersion.objects.filter(model=key).update(
+        version=F('version') + 1
+    )
+    if not updated:
+        CatalogueVersion.objects.get_or_create(
+            model=key, defaults={'version': 1}
+        )
+
+
+def catalogue_changed(sender, **kwargs):
+    bump_catalogue_version(sender)
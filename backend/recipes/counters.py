@@ -0,0 +1,74 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from users.models import Follow, User
+
+from .models import FavoriteRecipe, Recipe, ShoppingList
+
+# {модель строки: (модель со счётчиком, поле счётчика, внешний ключ)}
+COUNTERS = {
+    FavoriteRecipe: (Recipe, 'favorites_count', 'recipe'),
+    ShoppingList: (Recipe, 'in_cart_count', 'recipe'),
+    Recipe: (User, 'recipes_count', 'author'),
+    Follow: (User, 'followers_count', 'author'),
+}
+PREVIOUS_KEY = '_counter_previous_key'
+
+
+def change_counter(model, field, pks, delta):
+    """Атомарно сдвигает счётчик field у объектов pks на delta."""
+    if pks and delta:
+        model.objects.filter(pk__in=pks).update(**{field: F(field) + delta})
+
+
+def row_pre_save(sender, instance, update_fields=None, **kwargs):
+    """Запоминает внешний ключ строки до сохранения.
+
+    Строку могут перевесить на другой объект (админка), тогда счётчик
+    прежнего уменьшается, а нового - увеличивается.
+    """
+    _, _, key = COUNTERS[sender]
+    if instance.pk is None or (
+        update_fields is not None
+        and not {key, f'{key}_id'} & set(update_fields)
+    ):
+        return
+    instance.__dict__[PREVIOUS_KEY] = sender._default_manager.filter(
+        pk=instance.pk
+    ).values_list(f'{key}_id', flat=True).first()
+
+
+def row_saved(sender, instance, created, **kwargs):
+    model, field, key = COUNTERS[sender]
+    current = getattr(instance, f'{key}_id')
+    previous = instance.__dict__.pop(PREVIOUS_KEY, current)
+    if created:
+        change_counter(model, field, [current], 1)
+    elif previous != current:
+        change_counter(model, field, [previous], -1)
+        change_counter(model, field, [current], 1)
+
+
+def row_deleted(sender, instance, **kwargs):
+    model, field, key = COUNTERS[sender]
+    change_counter(model, field, [getattr(instance, f'{key}_id')], -1)
+
+
+def reconcile_counters(check=False):
+    """Пересчитывает все счётчики, {поле: исправлено строк}.
+
+    На каждый счётчик - один UPDATE с подзапросом, который трогает
+    только разошедшиеся строки. С check=True строки только считаются.
+    """
+    repaired = {}
+    for source, (model, field, key) in COUNTERS.items():
+        actual = Coalesce(Subquery(
+            source.objects.filter(**{key: OuterRef('pk')}).order_by().values(
+                key
+            ).annotate(count=Count('pk')).values('count')
+        ), Value(0))
+        drifted = model.objects.exclude(**{field: actual})
+        repaired[f'{model._meta.model_name}.{field}'] = (
+            drifted.count() if check else drifted.update(**{field: actual})
+        )
+    return repaired
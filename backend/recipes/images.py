@@ -0,0 +1,176 @@
+import base64
+import binascii
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'recipes/variants'
+VARIANT_SIZES = {
+    'small': (480, 480),
+    'large': (1280, 1280),
+}
+FORMATS = {
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+
+_executor = None
+
+INVALID_BASE64 = 'Некорректная строка base64.'
+INVALID_IMAGE = ('Загрузите правильное изображение. Файл, который вы '
+                 'загрузили, поврежден или не является изображением.')
+TOO_LARGE = ('Изображение больше допустимого: не более '
+             '{max_side} px по стороне и {max_pixels} пикселей.')
+
+
+def get_variant_name(image_name, variant, extension):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'{VARIANTS_DIR}/{stem}_{variant}.{extension}'
+
+
+def get_variant_url(recipe, variant, extension='jpg'):
+    """URL производного изображения или None, если оно ещё не готово."""
+    if not recipe.image or recipe.image_variants_for != recipe.image.name:
+        return None
+    return default_storage.url(
+        get_variant_name(recipe.image.name, variant, extension)
+    )
+
+
+def render_variants(image_name):
+    """Уменьшенные копии в JPEG и WebP для каждого размера."""
+    with default_storage.open(image_name) as file:
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGB')
+    for variant, size in VARIANT_SIZES.items():
+        thumbnail = image.copy()
+        thumbnail.thumbnail(size, Image.LANCZOS)
+        for extension, (image_format, options) in FORMATS.items():
+            output = BytesIO()
+            thumbnail.save(output, image_format, **options)
+            yield get_variant_name(image_name, variant, extension), output
+
+
+def decode_image_to_file(data, max_side, max_pixels):
+    """Декодирует изображение из data URI base64 во временный файл.
+
+    Не обращается ни к базе, ни к настройкам, поэтому выполняется
+    в пуле процессов; между процессами передаётся путь, а не содержимое.
+    Возвращает (путь, расширение, None) или (None, None, текст ошибки).
+    """
+    encoded = data.partition(';base64,')[2]
+    try:
+        content = base64.b64decode(encoded, validate=True)
+    except (binascii.Error, ValueError):
+        return None, None, INVALID_BASE64
+    try:
+        with Image.open(BytesIO(content)) as image:
+            width, height = image.size
+            image_format = image.format
+            image.verify()
+    except Exception:
+        return None, None, INVALID_IMAGE
+    if max(width, height) > max_side or width * height > max_pixels:
+        return None, None, TOO_LARGE.format(max_side=max_side,
+                                            max_pixels=max_pixels)
+    extension = 'jpg' if image_format == 'JPEG' else image_format.lower()
+    with tempfile.NamedTemporaryFile(delete=False) as file:
+        file.write(content)
+    return file.name, extension, None
+
+
+def delete_variants(image_name):
+    for variant in VARIANT_SIZES:
+        for extension in FORMATS:
+            default_storage.delete(
+                get_variant_name(image_name, variant, extension)
+            )
+
+
+def delete_unused_variants(image_name):
+    """Удаляет превью, если файл больше не нужен ни одному рецепту.
+
+    Имена превью строятся по имени файла, а один файл может быть
+    у многих рецептов (так заполняет базу seed_perf_data).
+    """
+    from .models import Recipe
+
+    if not Recipe.objects.filter(
+        Q(image=image_name) | Q(image_variants_for=image_name)
+    ).exists():
+        delete_variants(image_name)
+
+
+def build_variants(recipe_id, image_name):
+    """Строит производные изображения и отмечает рецепт готовым."""
+    from .models import Recipe
+
+    try:
+        for name, content in render_variants(image_name):
+            default_storage.delete(name)
+            default_storage.save(name, ContentFile(content.getvalue()))
+        previous = Recipe.objects.filter(pk=recipe_id).values_list(
+            'image_variants_for', flat=True
+        ).first()
+        updated = Recipe.objects.filter(
+            pk=recipe_id, image=image_name
+        ).update(image_variants_for=image_name)
+        if not updated:
+            delete_unused_variants(image_name)
+        elif previous and previous != image_name:
+            delete_unused_variants(previous)
+    except Exception:
+        logger.exception('Не удалось построить превью для %s', image_name)
+
+
+def build_variants_in_worker(recipe_id, image_name):
+    try:
+        build_variants(recipe_id, image_name)
+    finally:
+        # У потока пула собственные соединения с базой.
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_VARIANT_WORKERS,
+            thread_name_prefix='image-variants',
+        )
+    return _executor
+
+
+def schedule_variants(recipe):
+    """Ставит построение превью в пул после фиксации транзакции.
+
+    При IMAGE_VARIANT_WORKERS = 0 превью строятся сразу, в текущем потоке.
+    """
+    image_name = recipe.image.name
+
+    def submit():
+        if settings.IMAGE_VARIANT_WORKERS:
+            get_executor().submit(
+                build_variants_in_worker, recipe.pk, image_name
+            )
+        else:
+            build_variants(recipe.pk, image_name)
+
+    transaction.on_commit(submit)
+
+
+def recipe_image_saved(sender, instance, **kwargs):
+    if instance.image and instance.image_variants_for != instance.image.name:
+        schedule_variants(instance)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from recipes.images import build_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Строит превью и WebP-копии изображений рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Перестроить превью всех рецептов, а не только новых.',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.exclude(image_variants_for=F('image'))
+        count = 0
+        for recipe_id, image_name in recipes.values_list(
+                'id', 'image').iterator():
+            build_variants(recipe_id, image_name)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано рецептов: {count}.'))
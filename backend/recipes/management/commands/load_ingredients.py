@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.catalogue import bump_catalogue_version
+from recipes.models import Ingredient
+
+DEFAULT_PATH = settings.BASE_DIR.parent / 'data' / 'ingredients.csv'
+BATCH_SIZE = 5000
+STAGING_TABLE = 'ingredient_staging'
+
+
+def read_json(file):
+    for item in json.load(file):
+        if isinstance(item, dict):
+            yield item.get('name'), item.get('measurement_unit')
+        else:
+            yield item
+
+
+READERS = {'.csv': csv.reader, '.json': read_json}
+
+
+class Command(BaseCommand):
+    help = ('Загружает справочник ингредиентов из CSV или JSON. '
+            'Существующие пары (название, единица) пропускаются, '
+            'поэтому команду можно запускать при каждом деплое.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', type=Path, default=DEFAULT_PATH,
+                            help='Файл data/ingredients.csv или .json.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError(
+                f'Неизвестный формат {path.suffix}: ожидается '
+                f'{", ".join(READERS)}.'
+            )
+        started = time.monotonic()
+        self.skipped = 0
+        with open(path, encoding='utf-8') as file:
+            rows = self.clean_rows(reader(file))
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    created = self.load_copy(rows, options['batch_size'])
+                else:
+                    created = self.load_bulk(rows, options['batch_size'])
+                if created:
+                    # Запись в обход save() не шлёт сигналы: версию
+                    # справочника меняем сами, в той же транзакции -
+                    # воркеры перестроят индекс поиска и кеш списка.
+                    bump_catalogue_version(Ingredient)
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено ингредиентов: {created}, '
+            f'пропущено некорректных строк: {self.skipped}, '
+            f'за {time.monotonic() - started:.2f} с.'
+        ))
+
+    def clean_rows(self, rows):
+        name_length = Ingredient._meta.get_field('name').max_length
+        unit_length = Ingredient._meta.get_field(
+            'measurement_unit'
+        ).max_length
+        for row in rows:
+            if len(row) != 2 or not all(isinstance(v, str) for v in row):
+                self.skipped += 1
+                continue
+            name, measurement_unit = (value.strip() for value in row)
+            if (not name or not measurement_unit
+                    or len(name) > name_length
+                    or len(measurement_unit) > unit_length):
+                self.skipped += 1
+                continue
+            yield name, measurement_unit
+
+    @staticmethod
+    def iter_batches(rows, batch_size):
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def load_copy(self, rows, batch_size):
+        """PostgreSQL: COPY во временную таблицу и один INSERT.
+
+        Дубликаты отсекает ON CONFLICT DO NOTHING по ограничению
+        pair_unique (name, measurement_unit).
+        """
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {STAGING_TABLE} '
+                f'(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            for batch in self.iter_batches(rows, batch_size):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {STAGING_TABLE} (name, measurement_unit) '
+                    f'FROM STDIN WITH (FORMAT csv)',
+                    buffer,
+                )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                f'SELECT DISTINCT name, measurement_unit FROM {STAGING_TABLE} '
+                f'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+            return cursor.rowcount
+
+    def load_bulk(self, rows, batch_size):
+        before = Ingredient.objects.count()
+        for batch in self.iter_batches(rows, batch_size):
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=name, measurement_unit=measurement_unit)
+                 for name, measurement_unit in batch],
+                ignore_conflicts=True,
+            )
+        return Ingredient.objects.count() - before
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import TimelineEntry
+from recipes.timeline import rebuild_timeline
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает ленты подписок (TimelineEntry) по таблице '
+            'подписок. Нужна при переключении TIMELINE_BACKEND на fanout.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            nargs='+',
+            type=int,
+            help='id пользователей; по умолчанию - все.',
+        )
+
+    def handle(self, *args, **options):
+        rebuild_timeline(options['users'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны, записей: {TimelineEntry.objects.count()}.'
+        ))
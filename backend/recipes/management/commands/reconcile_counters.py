@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики избранного, корзин, рецептов автора '
+            'и подписчиков по исходным таблицам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только посчитать расхождения, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            repaired = reconcile_counters(check=options['check'])
+        for counter, rows in repaired.items():
+            self.stdout.write(f'{counter}: {rows}')
+        total = sum(repaired.values())
+        if options['check']:
+            if total:
+                raise CommandError(f'Расхождений: {total}.')
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны, исправлено строк: {total}.'
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from recipes.trending import refresh_trending
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рейтинг популярных рецептов для '
+            '/api/recipes/trending/. Рассчитана на запуск по расписанию, '
+            'например раз в несколько минут, и --full раз в сутки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересобрать таблицу по событиям за всё окно. Обычный '
+                 'запуск убирает только рецепты, которых не осталось ни в '
+                 'избранном, ни в корзинах; полный учитывает и частичные '
+                 'удаления.',
+        )
+
+    def handle(self, *args, **options):
+        result = refresh_trending(full=options['full'])
+        mode = 'полный' if result['full'] else 'с ' + (
+            result['events_since'].isoformat(timespec='seconds')
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтинг пересчитан ({mode}): новых {result["created"]}, '
+            f'обновлено {result["updated"]}, удалено {result["pruned"]}.'
+        ))
@@ -0,0 +1,262 @@
+import random
+import time
+from io import BytesIO
+from itertools import accumulate, islice
+from uuid import uuid4
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image
+
+from recipes.catalogue import bump_catalogue_version
+from recipes.counters import reconcile_counters
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCartIngredient,
+                            ShoppingList, Tag)
+from recipes.search import update_search_index
+from recipes.timeline import is_fanout, rebuild_timeline
+from users.models import Follow, User
+
+BATCH_SIZE = 1000
+PASSWORD = 'perf-password'
+DEFAULT_TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+TEXT_WORDS = (
+    'нарезать', 'обжарить', 'посолить', 'перемешать', 'запекать',
+    'довести', 'до', 'кипения', 'подавать', 'горячим', 'с', 'зеленью',
+    'на', 'сковороде', 'в', 'духовке', 'минут', 'остудить', 'добавить',
+)
+
+
+def batches(items, size=BATCH_SIZE):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def zipf_weights(count, exponent=1.1):
+    """Кумулятивные веса: первые элементы популярнее остальных."""
+    return list(accumulate(1 / (rank + 1) ** exponent
+                           for rank in range(count)))
+
+
+def sample_distinct(rng, population, cum_weights, count, exclude=None):
+    """До count разных элементов с учётом популярности.
+
+    Порядок выбора сохраняется, чтобы при одном --seed данные совпадали.
+    """
+    chosen = {}
+    for _ in range(count * 3):
+        if len(chosen) >= count:
+            break
+        item = rng.choices(population, cum_weights=cum_weights)[0]
+        if item != exclude:
+            chosen[item] = None
+    return list(chosen)
+
+
+def insert_ignoring_conflicts(model, objects):
+    """bulk_create пачками; возвращает число действительно добавленных.
+
+    Строки, пропущенные из-за ignore_conflicts, bulk_create не
+    сообщает, поэтому добавленные считаются по размеру таблицы.
+    """
+    before = model.objects.count()
+    for batch in batches(objects):
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+    return model.objects.count() - before
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими данными для нагрузочных '
+            'тестов: пользователи, рецепты, избранное, корзины, подписки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--ingredients-per-recipe', type=int,
+                            default=8, help='В среднем на рецепт.')
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Избранных рецептов на пользователя.')
+        parser.add_argument('--cart', type=int, default=5,
+                            help='Рецептов в корзине пользователя.')
+        parser.add_argument('--follows', type=int, default=10,
+                            help='Подписок на пользователя.')
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Зерно генератора для повторяемости.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        self.rng = random.Random(options['seed'])
+        self.run = uuid4().hex[:6]
+        if not Ingredient.objects.exists():
+            call_command('load_ingredients', stdout=self.stdout)
+        with transaction.atomic():
+            tag_ids = self.get_tag_ids()
+            user_ids = self.create_users(options['users'])
+            recipe_ids, author_ids = self.create_recipes(
+                options['recipes'], user_ids, tag_ids,
+                options['ingredients_per_recipe'],
+            )
+            counts = {
+                'favorites': self.create_links(
+                    FavoriteRecipe, user_ids, recipe_ids,
+                    options['favorites'],
+                ),
+                'cart': self.create_links(
+                    ShoppingList, user_ids, recipe_ids, options['cart'],
+                ),
+                'follows': self.create_follows(
+                    user_ids, author_ids, options['follows'],
+                ),
+            }
+            self.fill_shopping_cart_ingredients(user_ids)
+            # bulk_create не шлёт сигналы, счётчики и ленты считаются
+            # разом.
+            reconcile_counters()
+            if is_fanout():
+                rebuild_timeline(user_ids)
+            for batch in batches(recipe_ids):
+                update_search_index(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Серия {self.run}: пользователей {len(user_ids)}, '
+            f'рецептов {len(recipe_ids)}, избранного {counts["favorites"]}, '
+            f'в корзинах {counts["cart"]}, подписок {counts["follows"]} '
+            f'за {time.monotonic() - started:.1f} с. '
+            f'Пароль пользователей: {PASSWORD}.'
+        ))
+
+    def get_tag_ids(self):
+        created = False
+        for name, color, slug in DEFAULT_TAGS:
+            created |= Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color}
+            )[1]
+        if created:
+            bump_catalogue_version(Tag)
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def create_users(self, count):
+        # Хеш считается один раз: PBKDF2 на каждого пользователя занял
+        # бы больше времени, чем вся остальная генерация.
+        password = make_password(PASSWORD)
+        prefix = f'perf_{self.run}_'
+        for batch in batches(range(count)):
+            User.objects.bulk_create([
+                User(username=f'{prefix}{number}',
+                     email=f'{prefix}{number}@example.com',
+                     first_name='Тест', last_name=f'Пользователь {number}',
+                     password=password)
+                for number in batch
+            ])
+        return list(User.objects.filter(
+            username__startswith=prefix
+        ).order_by('id').values_list('id', flat=True))
+
+    def save_image(self):
+        output = BytesIO()
+        Image.new('RGB', (640, 480), (230, 180, 120)).save(output, 'JPEG')
+        return default_storage.save(f'recipes/perf-{self.run}.jpg',
+                                    ContentFile(output.getvalue()))
+
+    def create_recipes(self, count, user_ids, tag_ids, ingredients_average):
+        image = self.save_image()
+        ingredients = list(Ingredient.objects.values_list('id', 'name'))
+        ingredient_weights = zipf_weights(len(ingredients), exponent=0.8)
+        # Авторов мало: рецепты пишет каждый пятый пользователь,
+        # и у популярных их заметно больше.
+        authors = user_ids[::5] or user_ids
+        author_weights = zipf_weights(len(authors))
+        prefix = f'perf {self.run} '
+        recipes = []
+        for number in range(count):
+            size = max(1, min(len(ingredients), int(self.rng.gauss(
+                ingredients_average, ingredients_average / 3
+            ))))
+            chosen = sample_distinct(self.rng, ingredients,
+                                     ingredient_weights, size)
+            main_ingredient = chosen[0][1][:100]
+            recipes.append((
+                Recipe(
+                    name=f'{main_ingredient.capitalize()} {prefix}{number}',
+                    author_id=self.rng.choices(
+                        authors, cum_weights=author_weights
+                    )[0],
+                    text=' '.join(self.rng.choices(TEXT_WORDS, k=40)),
+                    cooking_time=self.rng.randint(5, 180),
+                    image=image,
+                ),
+                [ingredient_id for ingredient_id, _ in chosen],
+                self.rng.sample(tag_ids,
+                                self.rng.randint(1, min(3, len(tag_ids)))),
+            ))
+        for batch in batches(recipes):
+            Recipe.objects.bulk_create([recipe for recipe, _, _ in batch])
+        recipe_ids = dict(Recipe.objects.filter(
+            name__contains=prefix
+        ).values_list('name', 'id'))
+        RecipeTag = Recipe.tags.through
+        for batch in batches(recipes):
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(recipe_id=recipe_ids[recipe.name],
+                                 ingredient_id=ingredient_id,
+                                 amount=self.rng.randint(1, 500))
+                for recipe, ingredient_ids, _ in batch
+                for ingredient_id in ingredient_ids
+            ])
+            RecipeTag.objects.bulk_create([
+                RecipeTag(recipe_id=recipe_ids[recipe.name], tag_id=tag_id)
+                for recipe, _, recipe_tag_ids in batch
+                for tag_id in recipe_tag_ids
+            ])
+        return (
+            sorted(recipe_ids.values()),
+            sorted({recipe.author_id for recipe, _, _ in recipes}),
+        )
+
+    def create_links(self, model, user_ids, recipe_ids, average):
+        """Избранное или корзины: популярные рецепты встречаются чаще."""
+        weights = zipf_weights(len(recipe_ids))
+        links = (
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in sample_distinct(
+                self.rng, recipe_ids, weights,
+                self.rng.randint(0, 2 * average),
+            )
+        )
+        return insert_ignoring_conflicts(model, links)
+
+    def create_follows(self, user_ids, author_ids, average):
+        weights = zipf_weights(len(author_ids))
+        follows = (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in sample_distinct(
+                self.rng, author_ids, weights,
+                self.rng.randint(0, 2 * average), exclude=user_id,
+            )
+        )
+        return insert_ignoring_conflicts(Follow, follows)
+
+    @staticmethod
+    def fill_shopping_cart_ingredients(user_ids):
+        """Сводные списки покупок (см. ShoppingCartIngredientManager)."""
+        for batch in batches(user_ids, 500):
+            ShoppingCartIngredient.objects.bulk_create([
+                ShoppingCartIngredient(user_id=user_id,
+                                       ingredient_id=ingredient_id,
+                                       amount=amount)
+                for (user_id, ingredient_id), amount
+                in ShoppingCartIngredient.objects.expected(batch).items()
+            ])
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingCartIngredient
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает или проверяет сводные списки покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить списки с корзинами, ничего не меняя.',
+        )
+        parser.add_argument(
+            '--users',
+            nargs='+',
+            type=int,
+            help='id пользователей; по умолчанию - все.',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['users']
+        stored_rows = ShoppingCartIngredient.objects.all()
+        if user_ids is not None:
+            stored_rows = stored_rows.filter(user_id__in=user_ids)
+        expected = ShoppingCartIngredient.objects.expected(user_ids)
+
+        if options['check']:
+            stored = {
+                (user_id, ingredient_id): amount
+                for user_id, ingredient_id, amount in stored_rows.values_list(
+                    'user_id', 'ingredient_id', 'amount'
+                ).iterator()
+            }
+            drift = sorted(
+                key for key in expected.keys() | stored.keys()
+                if expected.get(key) != stored.get(key)
+            )
+            for user_id, ingredient_id in drift:
+                self.stdout.write(
+                    f'user={user_id} ingredient={ingredient_id}: '
+                    f'ожидалось {expected.get((user_id, ingredient_id))}, '
+                    f'в базе {stored.get((user_id, ingredient_id))}'
+                )
+            if drift:
+                raise CommandError(f'Расхождений: {len(drift)}.')
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+
+        with transaction.atomic():
+            stored_rows.delete()
+            ShoppingCartIngredient.objects.bulk_create(
+                (ShoppingCartIngredient(user_id=user_id,
+                                        ingredient_id=ingredient_id,
+                                        amount=amount)
+                 for (user_id, ingredient_id), amount in expected.items()),
+                batch_size=BATCH_SIZE,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны, строк: {len(expected)}.'
+        ))
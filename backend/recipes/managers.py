@@ -0,0 +1,270 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.db import connections, models, transaction
+from django.db.models import Case, F, Sum, Value, When, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def latest_per_author(self, author_ids, limit=None):
+        """Последние limit рецептов каждого автора одним запросом.
+
+        Возвращает словарь {author_id: [recipe, ...]}, рецепты от новых
+        к старым. Ограничение считается оконной функцией
+        ROW_NUMBER() OVER (PARTITION BY author), а не отдельным
+        запросом на каждого автора.
+        """
+        recipes = self.filter(author_id__in=author_ids)
+        if limit is not None:
+            ranked = recipes.annotate(position=Window(
+                expression=RowNumber(),
+                partition_by=[F('author_id')],
+                order_by=F('id').desc(),
+            ))
+            sql, params = ranked.query.sql_with_params()
+            recipes = self.raw(
+                f'SELECT * FROM ({sql}) ranked '
+                f'WHERE ranked.position <= %s ORDER BY ranked.id DESC',
+                (*params, limit),
+            )
+        by_author = {author_id: [] for author_id in author_ids}
+        for recipe in recipes:
+            by_author[recipe.author_id].append(recipe)
+        return by_author
+
+
+class RecipeLinkManager(models.Manager):
+    """Избранное и корзина: идемпотентные вставка и удаление.
+
+    На PostgreSQL и SQLite 3.35+ каждая операция - один запрос
+    INSERT ... ON CONFLICT DO NOTHING или DELETE с RETURNING: повторный
+    или параллельный запрос упирается в уникальное ограничение (user,
+    recipe) и ничего не меняет, а RETURNING сообщает, какие рецепты
+    действительно добавлены или удалены. На остальных базах - проверка
+    и bulk_create(ignore_conflicts=True) в транзакции.
+
+    Запросы идут мимо сигналов, поэтому счётчик рецепта (recipes.counters)
+    менеджер сдвигает сам и только для изменившихся рецептов.
+    """
+
+    def supports_returning(self):
+        connection = connections[self.db]
+        if connection.vendor == 'postgresql':
+            return True
+        return (connection.vendor == 'sqlite'
+                and connection.Database.sqlite_version_info >= (3, 35))
+
+    @property
+    def recipe_model(self):
+        return self.model._meta.get_field('recipe').related_model
+
+    def link_recipes(self, user_id, recipe_ids):
+        """Добавляет существующие рецепты из recipe_ids, возвращает id
+        добавленных."""
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return []
+        with transaction.atomic(using=self.db):
+            added = self.insert_links(user_id, recipe_ids)
+            self.change_counter(added, 1)
+        return added
+
+    def unlink_recipes(self, user_id, recipe_ids=None):
+        """Удаляет рецепты recipe_ids (None - все), возвращает id
+        удалённых."""
+        if recipe_ids is not None:
+            recipe_ids = list(recipe_ids)
+            if not recipe_ids:
+                return []
+        with transaction.atomic(using=self.db):
+            removed = self.delete_links(user_id, recipe_ids)
+            self.change_counter(removed, -1)
+        return removed
+
+    def change_counter(self, recipe_ids, delta):
+        from .counters import COUNTERS, change_counter
+
+        model, field, _ = COUNTERS[self.model]
+        change_counter(model, field, recipe_ids, delta)
+
+    def insert_links(self, user_id, recipe_ids):
+        recipe_model = self.recipe_model
+        if not self.supports_returning():
+            existing = self.filter(
+                user_id=user_id, recipe_id__in=recipe_ids,
+            ).values_list('recipe_id', flat=True)
+            added = list(recipe_model.objects.filter(
+                pk__in=recipe_ids,
+            ).exclude(pk__in=list(existing)).values_list('pk', flat=True))
+            self.bulk_create(
+                [self.model(user_id=user_id, recipe_id=recipe_id)
+                 for recipe_id in added],
+                ignore_conflicts=True,
+            )
+            return added
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        return self.execute(
+            f'INSERT INTO {self.model._meta.db_table} '
+            f'(user_id, recipe_id, created_at) '
+            f'SELECT %s, id, %s FROM {recipe_model._meta.db_table} '
+            f'WHERE id IN ({placeholders}) '
+            f'ON CONFLICT DO NOTHING RETURNING recipe_id',
+            [user_id,
+             connections[self.db].ops.adapt_datetimefield_value(
+                 timezone.now()
+             ),
+             *recipe_ids],
+        )
+
+    def delete_links(self, user_id, recipe_ids):
+        sql = f'DELETE FROM {self.model._meta.db_table} WHERE user_id = %s'
+        params = [user_id]
+        if recipe_ids is not None:
+            placeholders = ', '.join(['%s'] * len(recipe_ids))
+            sql += f' AND recipe_id IN ({placeholders})'
+            params += recipe_ids
+        if self.supports_returning():
+            return self.execute(sql + ' RETURNING recipe_id', params)
+        links = self.filter(user_id=user_id)
+        if recipe_ids is not None:
+            links = links.filter(recipe_id__in=recipe_ids)
+        removed = list(links.select_for_update().values_list(
+            'recipe_id', flat=True
+        ))
+        # Не queryset.delete(): он отправил бы post_delete, и счётчик
+        # сдвинулся бы дважды.
+        self.execute(sql, params)
+        return removed
+
+    def execute(self, sql, params):
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            if cursor.description is None:
+                return []
+            return [recipe_id for recipe_id, in cursor.fetchall()]
+
+
+class ShoppingCartIngredientManager(models.Manager):
+    """Поддержка сводного списка покупок дельтами."""
+
+    def apply_deltas(self, user_ids, deltas):
+        """Прибавляет deltas {ingredient_id: amount} к спискам user_ids."""
+        deltas = {
+            ingredient_id: amount
+            for ingredient_id, amount in deltas.items() if amount
+        }
+        user_ids = list(user_ids)
+        if not deltas or not user_ids:
+            return
+        with transaction.atomic():
+            self.bulk_create(
+                [
+                    self.model(user_id=user_id, ingredient_id=ingredient_id,
+                               amount=0)
+                    for user_id in user_ids
+                    for ingredient_id, amount in deltas.items() if amount > 0
+                ],
+                ignore_conflicts=True,
+            )
+            rows = self.filter(user_id__in=user_ids,
+                               ingredient_id__in=deltas)
+            rows.update(amount=F('amount') + Case(
+                *(When(ingredient_id=ingredient_id, then=Value(amount))
+                  for ingredient_id, amount in deltas.items()),
+                default=Value(0),
+                output_field=models.IntegerField(),
+            ))
+            rows.filter(amount__lte=0).delete()
+
+    @staticmethod
+    def get_recipe_amounts(recipe):
+        return dict(
+            recipe.recipe_ingredient.values_list('ingredient_id', 'amount')
+        )
+
+    @staticmethod
+    def get_recipes_amounts(recipe_ids):
+        """Суммы ингредиентов нескольких рецептов одним запросом."""
+        return dict(
+            apps.get_model('recipes', 'RecipeIngredient').objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list('ingredient_id').annotate(
+                amount=Sum('amount')
+            ).order_by()
+        )
+
+    def add_recipes(self, user, recipe_ids):
+        if recipe_ids:
+            self.apply_deltas([user.id], self.get_recipes_amounts(recipe_ids))
+
+    def remove_recipes(self, user, recipe_ids):
+        if recipe_ids:
+            self.apply_deltas([user.id], {
+                ingredient_id: -amount for ingredient_id, amount
+                in self.get_recipes_amounts(recipe_ids).items()
+            })
+
+    def clear(self, user):
+        self.filter(user=user).delete()
+
+    def remove_recipe_from_all(self, recipe):
+        """Вычитает рецепт из списков всех, у кого он в корзине."""
+        self.change_recipe(recipe, self.get_recipe_amounts(recipe), {})
+
+    def change_recipe(self, recipe, old_amounts, new_amounts):
+        """Переносит изменение состава рецепта в списки покупок."""
+        deltas = Counter(new_amounts)
+        deltas.subtract(old_amounts)
+        self.apply_deltas(
+            recipe.shopping_recipe.values_list('user_id', flat=True),
+            deltas,
+        )
+
+    @staticmethod
+    def get_amounts_by_recipe(recipe_ids):
+        amounts = defaultdict(dict)
+        rows = apps.get_model('recipes', 'RecipeIngredient').objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient_id', 'amount')
+        for recipe_id, ingredient_id, amount in rows:
+            amounts[recipe_id][ingredient_id] = amount
+        return amounts
+
+    @contextmanager
+    def track_recipes(self, recipe_ids):
+        """Переносит в списки покупок изменения состава recipe_ids,
+        сделанные внутри блока в обход AddRecipeSerializer (админка)."""
+        recipe_ids = set(recipe_ids)
+        with transaction.atomic():
+            old_amounts = self.get_amounts_by_recipe(recipe_ids)
+            yield
+            new_amounts = self.get_amounts_by_recipe(recipe_ids)
+            carts = apps.get_model('recipes', 'ShoppingList').objects
+            for recipe_id in recipe_ids:
+                deltas = Counter(new_amounts[recipe_id])
+                deltas.subtract(old_amounts[recipe_id])
+                self.apply_deltas(
+                    carts.filter(recipe_id=recipe_id).values_list(
+                        'user_id', flat=True
+                    ),
+                    deltas,
+                )
+
+    def expected(self, user_ids=None):
+        """Суммы ингредиентов по корзинам, посчитанные с нуля."""
+        lookup = {'recipe__shopping_recipe__isnull': False}
+        if user_ids is not None:
+            lookup = {'recipe__shopping_recipe__user__in': user_ids}
+        recipe_ingredients = apps.get_model(
+            'recipes', 'RecipeIngredient'
+        ).objects.filter(**lookup).values_list(
+            'recipe__shopping_recipe__user', 'ingredient',
+        ).annotate(amount=Sum('amount')).order_by()
+        return {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in recipe_ingredients.iterator()
+        }
@@ -0,0 +1,60 @@
+# Generated by Django 2.2.19 on 2026-10-18 19:19
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# DDL записан здесь, а не импортирован из recipes.search, чтобы правки
+# приложения не меняли уже применённую миграцию.
+RECIPE_TABLE = 'recipes_recipe'
+FTS_TABLE = 'recipes_recipe_fts'
+SEARCH_CONFIG = 'russian'
+
+
+def create_index(apps, schema_editor):
+    """PostgreSQL: GIN-индекс по search_vector. SQLite: таблица FTS5."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX {RECIPE_TABLE}_search_vector_gin '
+            f'ON {RECIPE_TABLE} USING gin (search_vector)'
+        )
+        schema_editor.execute(
+            f'UPDATE {RECIPE_TABLE} SET search_vector = '
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', name), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', text), 'B')"
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+            f"name, text, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+            f'SELECT id, name, text FROM {RECIPE_TABLE}'
+        )
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f'DROP INDEX IF EXISTS {RECIPE_TABLE}_search_vector_gin'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_shoppingcartingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
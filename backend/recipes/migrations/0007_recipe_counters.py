@@ -0,0 +1,46 @@
+# Generated by Django 2.2.19 on 2026-10-18 19:42
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('recipes', 'FavoriteRecipe', 'recipes', 'Recipe', 'favorites_count',
+     'recipe'),
+    ('recipes', 'ShoppingList', 'recipes', 'Recipe', 'in_cart_count',
+     'recipe'),
+    ('recipes', 'Recipe', 'users', 'User', 'recipes_count', 'author'),
+    ('users', 'Follow', 'users', 'User', 'followers_count', 'author'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for source_app, source, app, model, field, key in COUNTERS:
+        rows = apps.get_model(source_app, source).objects.filter(
+            **{key: OuterRef('pk')}
+        ).order_by().values(key).annotate(count=Count('pk')).values('count')
+        apps.get_model(app, model).objects.update(
+            **{field: Coalesce(Subquery(rows), Value(0))}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_image_variants_for'),
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_cart_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='В корзинах'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.19 on 2026-10-18 19:56
+
+from django.db import migrations, models
+
+CATALOGUES = ('recipes.tag', 'recipes.ingredient')
+
+
+def create_versions(apps, schema_editor):
+    CatalogueVersion = apps.get_model('recipes', 'CatalogueVersion')
+    CatalogueVersion.objects.bulk_create(
+        [CatalogueVersion(model=model) for model in CATALOGUES]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogueVersion',
+            fields=[
+                ('model', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Справочник')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия справочника',
+                'verbose_name_plural': 'Версии справочников',
+            },
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
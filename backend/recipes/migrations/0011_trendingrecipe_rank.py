@@ -0,0 +1,29 @@
+# Generated by Django 2.2.19 on 2026-10-18 20:30
+
+from django.db import migrations, models
+
+RANK_SCALE = 10 ** 9
+
+
+def fill_rank(apps, schema_editor):
+    model = apps.get_model('recipes', 'TrendingRecipe')
+    rows = list(model.objects.all())
+    for row in rows:
+        row.rank = round(row.score * RANK_SCALE)
+    model.objects.bulk_update(rows, ('rank',), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_catalogueversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trendingrecipe',
+            name='rank',
+            field=models.BigIntegerField(db_index=True, default=0, help_text='Рейтинг в целых числах: ключ сортировки и курсора.', verbose_name='Позиция'),
+        ),
+        migrations.RunPython(fill_rank, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,13 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.utils import timezone
 
 from users.models import User
 
+from .managers import (RecipeLinkManager, RecipeQuerySet,
+                       ShoppingCartIngredientManager)
+
 
 class Tag(models.Model):
     name = models.CharField(
@@ -67,6 +72,27 @@ class Ingredient(models.Model):
         return self.name
 
 
+class CatalogueVersion(models.Model):
+    """Номер версии справочника, общий для всех процессов."""
+
+    model = models.CharField(
+        verbose_name=('Справочник'),
+        max_length=100,
+        primary_key=True,
+    )
+    version = models.PositiveIntegerField(
+        verbose_name=('Версия'),
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Версия справочника'
+        verbose_name_plural = 'Версии справочников'
+
+    def __str__(self):
+        return f'{self.model}: {self.version}'
+
+
 class Recipe(models.Model):
     name = models.CharField(
         verbose_name=('Название'),
@@ -99,6 +125,12 @@ class Recipe(models.Model):
         upload_to='recipes/',
         help_text='Загрузите изображение с фотографией готового блюда',
     )
+    image_variants_for = models.CharField(
+        verbose_name=('Превью построены для'),
+        max_length=100,
+        blank=True,
+        editable=False,
+    )
     cooking_time = models.PositiveSmallIntegerField(
         validators=(MinValueValidator(
             1,
@@ -107,15 +139,46 @@ class Recipe(models.Model):
         verbose_name=('Время приготовления'),
         help_text='Задайте время приготовления блюда',
     )
+    updated_at = models.DateTimeField(
+        verbose_name=('Дата изменения'),
+        auto_now=True,
+    )
+    favorites_count = models.IntegerField(
+        verbose_name=('В избранном'),
+        default=0,
+        editable=False,
+    )
+    in_cart_count = models.IntegerField(
+        verbose_name=('В корзинах'),
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name=('Поисковый вектор'),
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-id',)
+        indexes = (
+            # Лента подписок: последние рецепты каждого автора.
+            models.Index(fields=('author', '-id'),
+                         name='recipe_author_id_desc'),
+        )
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def touch(cls, recipe_ids):
+        """Обновляет дату изменения без сохранения всего рецепта."""
+        cls.objects.filter(pk__in=recipe_ids).update(updated_at=timezone.now())
+
 
 class RecipeIngredient(models.Model):
     recipe = models.ForeignKey(
@@ -168,6 +231,14 @@ class FavoriteRecipe(models.Model):
         verbose_name=('Пользователь'),
         related_name='favorite',
     )
+    created_at = models.DateTimeField(
+        verbose_name=('Добавлено'),
+        default=timezone.now,
+        db_index=True,
+        editable=False,
+    )
+
+    objects = RecipeLinkManager()
 
     class Meta:
         constraints = (
@@ -197,6 +268,14 @@ class ShoppingList(models.Model):
         verbose_name=('Пользователь'),
         related_name='shopping_user',
     )
+    created_at = models.DateTimeField(
+        verbose_name=('Добавлено'),
+        default=timezone.now,
+        db_index=True,
+        editable=False,
+    )
+
+    objects = RecipeLinkManager()
 
     class Meta:
         constraints = (
@@ -211,3 +290,95 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f'{self.recipe} в корзине {self.user}'
+
+
+class ShoppingCartIngredient(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name=('Пользователь'),
+        related_name='shopping_cart_ingredients',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name=('Ингредиент'),
+        related_name='in_shopping_carts',
+    )
+    amount = models.IntegerField(verbose_name=('Количество'))
+
+    objects = ShoppingCartIngredientManager()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='shopping_cart_ingredient_exists',
+            ),
+        )
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Сводные списки покупок'
+
+    def __str__(self):
+        return f'{self.user} купить {self.amount} {self.ingredient}'
+
+
+class TrendingRecipe(models.Model):
+    """Предрасчитанный рейтинг популярности (recipes.trending)."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+        verbose_name=('Рецепт'),
+    )
+    score = models.FloatField(
+        verbose_name=('Рейтинг'),
+        db_index=True,
+    )
+    rank = models.BigIntegerField(
+        verbose_name=('Позиция'),
+        help_text='Рейтинг в целых числах: ключ сортировки и курсора.',
+        db_index=True,
+        default=0,
+    )
+    refreshed_at = models.DateTimeField(verbose_name=('Пересчитан'))
+
+    class Meta:
+        verbose_name = 'Популярный рецепт'
+        verbose_name_plural = 'Популярные рецепты'
+
+    def __str__(self):
+        return f'{self.recipe}: {self.score:.2f}'
+
+
+class TimelineEntry(models.Model):
+    """Рецепт в ленте подписчика при TIMELINE_BACKEND = 'fanout'."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name=('Подписчик'),
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name=('Рецепт'),
+    )
+
+    class Meta:
+        constraints = (
+            # Индекс (user, recipe) читается в обратном порядке лентой.
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='timeline_entry_exists',
+            ),
+        )
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
@@ -0,0 +1,109 @@
+import re
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+
+SEARCH_CONFIG = 'russian'
+RECIPE_TABLE = 'recipes_recipe'
+FTS_TABLE = 'recipes_recipe_fts'
+FTS_NAME_WEIGHT = 10.0
+FTS_TEXT_WEIGHT = 1.0
+
+
+def get_search_vector():
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_index(recipe_ids):
+    """Переиндексирует только переданные рецепты."""
+    from .models import Recipe
+
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    if connection.vendor == 'postgresql':
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            search_vector=get_search_vector()
+        )
+    elif connection.vendor == 'sqlite':
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                recipe_ids,
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+                f'SELECT id, name, text FROM {RECIPE_TABLE} '
+                f'WHERE id IN ({placeholders})',
+                recipe_ids,
+            )
+
+
+def remove_from_search_index(recipe_ids):
+    if connection.vendor != 'sqlite':
+        return
+    recipe_ids = list(recipe_ids)
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+            recipe_ids,
+        )
+
+
+def recipe_saved(sender, instance, **kwargs):
+    update_search_index([instance.pk])
+
+
+def recipe_deleted(sender, instance, **kwargs):
+    remove_from_search_index([instance.pk])
+
+
+def get_fts_query(value):
+    """Запрос FTS5: каждое слово в кавычках и с поиском по префиксу."""
+    return ' '.join(
+        f'"{word}"*' for word in re.findall(r'\w+', value.casefold())
+    )
+
+
+def search_recipes(queryset, value):
+    """Фильтрует рецепты по запросу и сортирует по релевантности."""
+    if not value.strip():
+        return queryset
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(value, config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-id')
+    if connection.vendor == 'sqlite':
+        query = get_fts_query(value)
+        if not query:
+            return queryset.none()
+        # bm25() доступна только в запросе, который сам читает таблицу
+        # FTS5 с MATCH, поэтому она присоединяется к рецептам по rowid:
+        # размер SQL не зависит от числа найденных рецептов.
+        return queryset.extra(
+            select={'rank': (f'-bm25({FTS_TABLE}, {FTS_NAME_WEIGHT}, '
+                             f'{FTS_TEXT_WEIGHT})')},
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {RECIPE_TABLE}.id',
+                   f'{FTS_TABLE} MATCH %s'],
+            params=[query],
+        ).order_by('-rank', '-id')
+    # Без полнотекстового индекса совпадения в названии выше, чем
+    # только в описании.
+    return queryset.filter(
+        Q(name__icontains=value) | Q(text__icontains=value)
+    ).annotate(
+        rank=Case(
+            When(name__icontains=value, then=Value(FTS_NAME_WEIGHT)),
+            default=Value(FTS_TEXT_WEIGHT),
+            output_field=FloatField(),
+        )
+    ).order_by('-rank', '-id')
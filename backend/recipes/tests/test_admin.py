@@ -0,0 +1,164 @@
+from django.test import TestCase
+
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCartIngredient, ShoppingList, Tag)
+from users.models import User
+
+CART_URL = '/admin/recipes/shoppinglist/'
+RECIPE_URL = '/admin/recipes/recipe/'
+RECIPE_INGREDIENT_URL = '/admin/recipes/recipeingredient/'
+INLINE_PREFIX = 'recipe_ingredient'
+
+
+class AdminShoppingCartAggregatesTest(TestCase):
+    """Правки в админке не расходятся со сводными списками покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='-'
+        )
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{number}',
+                email=f'user{number}@example.com', password='-',
+            )
+            for number in range(2)
+        ]
+        cls.tag = Tag.objects.create(name='Обед', color='#49B64E',
+                                     slug='lunch')
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(4)
+        ])
+        cls.ingredients = list(Ingredient.objects.order_by('id'))
+        cls.recipes = []
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                author=cls.admin, name=f'Рецепт {number}', text='-',
+                cooking_time=10, image='recipes/test.png',
+            )
+            recipe.tags.set([cls.tag])
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=10 * (number + 1))
+                for ingredient in cls.ingredients[number:number + 2]
+            ])
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        for user in self.users:
+            recipe_ids = [recipe.id for recipe in self.recipes[:2]]
+            ShoppingList.objects.link_recipes(user.id, recipe_ids)
+            ShoppingCartIngredient.objects.add_recipes(user, recipe_ids)
+        self.assertAggregatesMatch()
+
+    def assertAggregatesMatch(self):
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in ShoppingCartIngredient.objects.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            )
+        }
+        self.assertEqual(stored, ShoppingCartIngredient.objects.expected())
+
+    def post(self, url, data):
+        response = self.client.post(url, data)
+        # Админка отвечает редиректом после успешного сохранения; 200 -
+        # форма с ошибками.
+        self.assertEqual(response.status_code, 302, getattr(
+            response, 'context_data', {}
+        ).get('errors'))
+
+    def test_cart_add_change_and_delete(self):
+        user = self.users[0]
+        self.post(f'{CART_URL}add/',
+                  {'user': user.id, 'recipe': self.recipes[2].id})
+        self.assertAggregatesMatch()
+        item = ShoppingList.objects.get(user=user, recipe=self.recipes[0])
+        self.post(f'{CART_URL}{item.id}/change/',
+                  {'user': self.admin.id, 'recipe': self.recipes[1].id})
+        self.assertAggregatesMatch()
+        self.post(f'{CART_URL}{item.id}/delete/', {'post': 'yes'})
+        self.assertAggregatesMatch()
+        self.post(CART_URL, {
+            'action': 'delete_selected', 'post': 'yes',
+            '_selected_action': list(ShoppingList.objects.filter(
+                user=self.users[1]
+            ).values_list('id', flat=True)),
+        })
+        self.assertFalse(ShoppingList.objects.filter(user=self.users[1]))
+        self.assertAggregatesMatch()
+
+    def test_recipe_ingredient_change_and_delete(self):
+        row = RecipeIngredient.objects.filter(
+            recipe=self.recipes[0]
+        ).first()
+        self.post(f'{RECIPE_INGREDIENT_URL}{row.id}/change/', {
+            'recipe': self.recipes[1].id,
+            'ingredient': self.ingredients[3].id, 'amount': 7,
+        })
+        self.assertAggregatesMatch()
+        self.post(f'{RECIPE_INGREDIENT_URL}add/', {
+            'recipe': self.recipes[0].id,
+            'ingredient': self.ingredients[3].id, 'amount': 3,
+        })
+        self.assertAggregatesMatch()
+        self.post(f'{RECIPE_INGREDIENT_URL}{row.id}/delete/',
+                  {'post': 'yes'})
+        self.assertAggregatesMatch()
+        self.post(RECIPE_INGREDIENT_URL, {
+            'action': 'delete_selected', 'post': 'yes',
+            '_selected_action': list(RecipeIngredient.objects.filter(
+                recipe=self.recipes[0]
+            ).values_list('id', flat=True)),
+        })
+        self.assertAggregatesMatch()
+
+    def test_recipe_inline_change(self):
+        recipe = self.recipes[0]
+        rows = list(recipe.recipe_ingredient.order_by('id'))
+        data = {
+            'name': recipe.name, 'author': self.admin.id, 'text': '-',
+            'tags': [self.tag.id], 'cooking_time': 10,
+            f'{INLINE_PREFIX}-TOTAL_FORMS': len(rows) + 1,
+            f'{INLINE_PREFIX}-INITIAL_FORMS': len(rows),
+            f'{INLINE_PREFIX}-MIN_NUM_FORMS': 0,
+            f'{INLINE_PREFIX}-MAX_NUM_FORMS': 1000,
+        }
+        for number, row in enumerate(rows):
+            data.update({
+                f'{INLINE_PREFIX}-{number}-id': row.id,
+                f'{INLINE_PREFIX}-{number}-recipe': recipe.id,
+                f'{INLINE_PREFIX}-{number}-ingredient': row.ingredient_id,
+                f'{INLINE_PREFIX}-{number}-amount': row.amount + 5,
+            })
+        # Первая строка удаляется, добавляется новая.
+        data[f'{INLINE_PREFIX}-0-DELETE'] = 'on'
+        data.update({
+            f'{INLINE_PREFIX}-{len(rows)}-recipe': recipe.id,
+            f'{INLINE_PREFIX}-{len(rows)}-ingredient':
+                self.ingredients[3].id,
+            f'{INLINE_PREFIX}-{len(rows)}-amount': 4,
+        })
+        self.post(f'{RECIPE_URL}{recipe.id}/change/', data)
+        self.assertEqual(
+            dict(recipe.recipe_ingredient.values_list('ingredient_id',
+                                                      'amount')),
+            {rows[1].ingredient_id: rows[1].amount + 5,
+             self.ingredients[3].id: 4},
+        )
+        self.assertAggregatesMatch()
+
+    def test_recipe_delete(self):
+        self.post(f'{RECIPE_URL}{self.recipes[0].id}/delete/',
+                  {'post': 'yes'})
+        self.assertAggregatesMatch()
+        self.post(RECIPE_URL, {
+            'action': 'delete_selected', 'post': 'yes',
+            '_selected_action': [self.recipes[1].id],
+        })
+        self.assertFalse(ShoppingCartIngredient.objects.exists())
+        self.assertAggregatesMatch()
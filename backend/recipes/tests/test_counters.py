@@ -0,0 +1,101 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingList
+from users.models import Follow, User
+
+
+class CountersTest(TestCase):
+    """Денормализованные счётчики следуют за исходными таблицами."""
+
+    def setUp(self):
+        # Тесты меняют и удаляют объекты, поэтому они свои у каждого.
+        self.users = [
+            User.objects.create_user(
+                username=f'user{number}',
+                email=f'user{number}@example.com', password='-',
+            )
+            for number in range(3)
+        ]
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.users[0], name=f'Рецепт {number}', text='-',
+                cooking_time=10, image='recipes/test.png',
+            )
+            for number in range(2)
+        ]
+
+    def assertCounts(self, objects, field, counts):
+        for instance in objects:
+            instance.refresh_from_db()
+        self.assertEqual(
+            [getattr(instance, field) for instance in objects], counts
+        )
+
+    @staticmethod
+    def reconcile(*args):
+        call_command('reconcile_counters', *args, stdout=StringIO())
+
+    def test_create_and_delete(self):
+        self.assertCounts(self.users, 'recipes_count', [2, 0, 0])
+        for model, field in ((FavoriteRecipe, 'favorites_count'),
+                             (ShoppingList, 'in_cart_count')):
+            with self.subTest(model=model.__name__):
+                link = model.objects.create(user=self.users[1],
+                                            recipe=self.recipes[0])
+                model.objects.create(user=self.users[2],
+                                     recipe=self.recipes[0])
+                self.assertCounts(self.recipes, field, [2, 0])
+                link.delete()
+                self.assertCounts(self.recipes, field, [1, 0])
+        follow = Follow.objects.create(user=self.users[1],
+                                       author=self.users[0])
+        self.assertCounts(self.users, 'followers_count', [1, 0, 0])
+        follow.delete()
+        self.recipes[1].delete()
+        self.assertCounts(self.users, 'followers_count', [0, 0, 0])
+        self.assertCounts(self.users, 'recipes_count', [1, 0, 0])
+
+    def test_foreign_key_change(self):
+        for model, field in ((FavoriteRecipe, 'favorites_count'),
+                             (ShoppingList, 'in_cart_count')):
+            with self.subTest(model=model.__name__):
+                link = model.objects.create(user=self.users[1],
+                                            recipe=self.recipes[0])
+                link.recipe = self.recipes[1]
+                link.save()
+                self.assertCounts(self.recipes, field, [0, 1])
+                # Сохранение без смены ключа счётчики не трогает.
+                link.save()
+                self.assertCounts(self.recipes, field, [0, 1])
+        recipe = self.recipes[0]
+        recipe.author = self.users[2]
+        recipe.save()
+        self.assertCounts(self.users, 'recipes_count', [1, 0, 1])
+        recipe.name = 'Переименован'
+        recipe.author = self.users[1]
+        recipe.save(update_fields=['name'])
+        self.assertCounts(self.users, 'recipes_count', [1, 0, 1])
+        follow = Follow.objects.create(user=self.users[1],
+                                       author=self.users[0])
+        follow.author = self.users[2]
+        follow.save(update_fields=['author'])
+        self.assertCounts(self.users, 'followers_count', [0, 0, 1])
+
+    def test_reconcile_check_and_repair(self):
+        FavoriteRecipe.objects.create(user=self.users[1],
+                                      recipe=self.recipes[0])
+        self.reconcile('--check')
+        Recipe.objects.filter(pk=self.recipes[0].pk).update(
+            favorites_count=5
+        )
+        User.objects.filter(pk=self.users[0].pk).update(recipes_count=0)
+        with self.assertRaisesMessage(CommandError, 'Расхождений: 2.'):
+            self.reconcile('--check')
+        self.assertCounts(self.recipes, 'favorites_count', [5, 0])
+        self.reconcile()
+        self.assertCounts(self.recipes, 'favorites_count', [1, 0])
+        self.assertCounts(self.users, 'recipes_count', [2, 0, 0])
+        self.reconcile('--check')
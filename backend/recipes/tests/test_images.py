@@ -0,0 +1,95 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TransactionTestCase, override_settings
+from PIL import Image
+
+from recipes.images import (FORMATS, VARIANT_SIZES, build_variants,
+                            get_variant_name, get_variant_url)
+from recipes.models import Recipe
+from users.models import User
+
+
+def save_image(name, size=(1600, 900)):
+    output = BytesIO()
+    Image.new('RGB', size, (200, 120, 40)).save(output, 'PNG')
+    return default_storage.save(f'recipes/{name}.png',
+                                ContentFile(output.getvalue()))
+
+
+class RecipeImageVariantsTest(TransactionTestCase):
+    """Превью строятся после сохранения рецепта и удаляются, только когда
+    файл не нужен ни одному рецепту."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        # Без пула: превью строятся сразу после фиксации транзакции.
+        settings_override = override_settings(MEDIA_ROOT=media_root,
+                                              IMAGE_VARIANT_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com', password='-'
+        )
+
+    def create_recipe(self, name, image):
+        return Recipe.objects.create(author=self.author, name=name,
+                                     text='-', cooking_time=10, image=image)
+
+    def assertVariantsExist(self, image_name, exist=True):
+        for variant in VARIANT_SIZES:
+            for extension in FORMATS:
+                name = get_variant_name(image_name, variant, extension)
+                self.assertEqual(default_storage.exists(name), exist, name)
+
+    def test_variants_are_built(self):
+        recipe = self.create_recipe('Рецепт', save_image('photo'))
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants_for, recipe.image.name)
+        self.assertVariantsExist(recipe.image.name)
+        for variant, (width, height) in VARIANT_SIZES.items():
+            name = get_variant_name(recipe.image.name, variant, 'jpg')
+            with default_storage.open(name) as file:
+                size = Image.open(file).size
+            self.assertLessEqual(size[0], width)
+            self.assertLessEqual(size[1], height)
+        self.assertEqual(
+            get_variant_url(recipe, 'small', 'webp'),
+            default_storage.url(
+                get_variant_name(recipe.image.name, 'small', 'webp')
+            ),
+        )
+
+    def test_shared_image_keeps_variants(self):
+        shared = save_image('shared')
+        first = self.create_recipe('Первый', shared)
+        second = self.create_recipe('Второй', shared)
+        # Как в API и админке: правится свежая строка из базы.
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(second.image_variants_for, shared)
+        first.image = save_image('first')
+        first.save()
+        first.refresh_from_db()
+        self.assertEqual(first.image_variants_for, first.image.name)
+        self.assertVariantsExist(first.image.name)
+        # Второй рецепт всё ещё показывает превью общего файла.
+        self.assertVariantsExist(shared)
+        second.image = save_image('second')
+        second.save()
+        self.assertVariantsExist(second.image.name)
+        self.assertVariantsExist(shared, exist=False)
+
+    def test_stale_build_is_discarded(self):
+        recipe = self.create_recipe('Рецепт', save_image('current'))
+        stale = save_image('stale')
+        # Картинку успели заменить: превью старой не нужны.
+        build_variants(recipe.id, stale)
+        self.assertVariantsExist(stale, exist=False)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants_for, recipe.image.name)
+        self.assertVariantsExist(recipe.image.name)
@@ -0,0 +1,78 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from recipes.catalogue import get_catalogue_version
+from recipes.models import Ingredient
+
+CSV_ROWS = (
+    'соль,г\n'
+    'сахар,г\n'
+    'соль,г\n'
+    ' молоко , мл \n'
+    'без единицы\n'
+    ',г\n'
+)
+
+
+class LoadIngredientsTest(TestCase):
+    """Повторная загрузка справочника ничего не добавляет и не меняет
+    его версию."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.directory = Path(directory)
+
+    def write(self, name, content):
+        path = self.directory / name
+        path.write_text(content, encoding='utf-8')
+        return path
+
+    def load(self, path):
+        stdout = StringIO()
+        call_command('load_ingredients', path=path, stdout=stdout)
+        return stdout.getvalue()
+
+    def pairs(self):
+        return set(Ingredient.objects.values_list('name',
+                                                  'measurement_unit'))
+
+    def test_idempotent(self):
+        path = self.write('ingredients.csv', CSV_ROWS)
+        version = get_catalogue_version(Ingredient)
+        output = self.load(path)
+        self.assertIn('Добавлено ингредиентов: 3, пропущено '
+                      'некорректных строк: 2', output)
+        self.assertEqual(self.pairs(), {('соль', 'г'), ('сахар', 'г'),
+                                        ('молоко', 'мл')})
+        self.assertEqual(get_catalogue_version(Ingredient), version + 1)
+        output = self.load(path)
+        self.assertIn('Добавлено ингредиентов: 0', output)
+        self.assertEqual(Ingredient.objects.count(), 3)
+        self.assertEqual(get_catalogue_version(Ingredient), version + 1)
+
+    def test_json(self):
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        version = get_catalogue_version(Ingredient)
+        path = self.write('ingredients.json', json.dumps([
+            {'name': 'соль', 'measurement_unit': 'г'},
+            {'name': 'мука', 'measurement_unit': 'г'},
+            ['перец', 'г'],
+            {'name': 'вода'},
+        ]))
+        output = self.load(path)
+        self.assertIn('Добавлено ингредиентов: 2, пропущено '
+                      'некорректных строк: 1', output)
+        self.assertEqual(self.pairs(), {('соль', 'г'), ('мука', 'г'),
+                                        ('перец', 'г')})
+        self.assertEqual(get_catalogue_version(Ingredient), version + 1)
+
+    def test_unknown_format(self):
+        with self.assertRaisesMessage(CommandError, 'Неизвестный формат'):
+            self.load(self.write('ingredients.txt', CSV_ROWS))
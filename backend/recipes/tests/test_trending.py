@@ -0,0 +1,117 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from recipes.models import (FavoriteRecipe, Recipe, ShoppingList,
+                            TrendingRecipe)
+from recipes.trending import get_rank, refresh_trending
+from users.models import User
+
+
+class RefreshTrendingTest(TestCase):
+    """Рейтинг учитывает вес и давность событий, обычный пересчёт
+    сходится с полным."""
+
+    def setUp(self):
+        # Тесты удаляют связи, поэтому объекты свои у каждого.
+        self.now = timezone.now()
+        self.users = [
+            User.objects.create_user(
+                username=f'user{number}',
+                email=f'user{number}@example.com', password='-',
+            )
+            for number in range(3)
+        ]
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.users[0], name=f'Рецепт {number}', text='-',
+                cooking_time=10, image='recipes/test.png',
+            )
+            for number in range(3)
+        ]
+
+    def add(self, model, user, recipe, hours_ago=1):
+        link = model.objects.create(user=self.users[user],
+                                    recipe=self.recipes[recipe])
+        model.objects.filter(pk=link.pk).update(
+            created_at=self.now - timedelta(hours=hours_ago)
+        )
+        return link
+
+    def refresh(self, full=False, hours=0):
+        return refresh_trending(full=full,
+                                now=self.now + timedelta(hours=hours))
+
+    def ranking(self):
+        rows = TrendingRecipe.objects.order_by('-rank')
+        for row in rows:
+            self.assertEqual(row.rank, get_rank(row.score))
+        return [self.recipes.index(row.recipe) for row in rows]
+
+    def scores(self):
+        return dict(TrendingRecipe.objects.values_list('recipe_id', 'score'))
+
+    def test_weight_and_age(self):
+        # Два избранных четыре дня назад - два периода полураспада.
+        self.add(FavoriteRecipe, 0, 0, hours_ago=96)
+        self.add(FavoriteRecipe, 1, 0, hours_ago=96)
+        self.add(ShoppingList, 0, 1)
+        self.add(FavoriteRecipe, 0, 2)
+        result = self.refresh()
+        self.assertTrue(result['full'])
+        self.assertEqual(result['created'], 3)
+        self.assertEqual(self.ranking(), [1, 2, 0])
+
+    def test_incremental_matches_full(self):
+        self.add(FavoriteRecipe, 0, 0, hours_ago=3)
+        self.add(FavoriteRecipe, 1, 1, hours_ago=3)
+        self.refresh()
+        self.add(ShoppingList, 0, 1, hours_ago=-1)
+        self.add(FavoriteRecipe, 2, 2, hours_ago=-1)
+        result = self.refresh(hours=2)
+        self.assertFalse(result['full'])
+        self.assertEqual((result['created'], result['updated']), (1, 1))
+        self.assertEqual(self.ranking(), [1, 2, 0])
+        incremental = self.scores()
+        self.refresh(full=True, hours=2)
+        full = self.scores()
+        self.assertEqual(incremental.keys(), full.keys())
+        for recipe_id, score in full.items():
+            self.assertAlmostEqual(incremental[recipe_id], score)
+        # Событий не было - обычный пересчёт ничего не меняет.
+        result = self.refresh(hours=3)
+        self.assertEqual((result['created'], result['updated']), (0, 0))
+        self.assertEqual(self.scores(), full)
+
+    def test_removals(self):
+        first = self.add(FavoriteRecipe, 0, 0)
+        self.add(FavoriteRecipe, 1, 0)
+        self.add(FavoriteRecipe, 0, 1)
+        self.refresh()
+        before = self.scores()[self.recipes[0].id]
+        FavoriteRecipe.objects.filter(recipe=self.recipes[1]).delete()
+        first.delete()
+        # Рецепт без избранного и корзин уходит и при обычном пересчёте.
+        result = self.refresh(hours=1)
+        self.assertEqual(result['pruned'], 1)
+        self.assertEqual(self.ranking(), [0])
+        self.assertEqual(self.scores()[self.recipes[0].id], before)
+        # Частичное удаление учитывает только полный пересчёт.
+        self.refresh(full=True, hours=1)
+        self.assertLess(self.scores()[self.recipes[0].id], before)
+
+    def test_events_outside_window_are_ignored(self):
+        self.add(FavoriteRecipe, 0, 0, hours_ago=24 * 31)
+        self.add(FavoriteRecipe, 0, 1)
+        self.refresh()
+        self.assertEqual(self.ranking(), [1])
+
+    def test_command(self):
+        self.add(FavoriteRecipe, 0, 0)
+        stdout = StringIO()
+        call_command('refresh_trending', '--full', stdout=stdout)
+        self.assertIn('Рейтинг пересчитан (полный): новых 1',
+                      stdout.getvalue())
@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from users.models import Follow
+
+from .models import Recipe, TimelineEntry
+
+JOIN = 'join'
+FANOUT = 'fanout'
+
+
+def is_fanout():
+    return settings.TIMELINE_BACKEND == FANOUT
+
+
+def timeline_recipes(queryset, user):
+    """Рецепты авторов, на которых подписан user.
+
+    join: полусоединение Follow -> Recipe по автору, новые рецепты
+    каждого автора читаются по индексу (author, -id). fanout: готовая
+    лента из TimelineEntry. Ключ сортировки и пагинации
+    timeline_position - id рецепта, но для fanout он берётся из
+    TimelineEntry, чтобы индекс (user, recipe) читался с конца без
+    сортировки всей ленты.
+    """
+    if is_fanout():
+        return queryset.filter(timeline_entries__user=user).annotate(
+            timeline_position=F('timeline_entries__recipe_id')
+        )
+    return queryset.filter(author_id__in=Follow.objects.filter(
+        user=user
+    ).values('author_id')).annotate(timeline_position=F('id'))
+
+
+def execute(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def fan_out_recipes(recipe_ids):
+    """Добавляет рецепты в ленты подписчиков их авторов одним INSERT."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    execute(
+        f'INSERT INTO {TimelineEntry._meta.db_table} (user_id, recipe_id) '
+        f'SELECT follow.user_id, recipe.id '
+        f'FROM {Recipe._meta.db_table} recipe '
+        f'JOIN {Follow._meta.db_table} follow '
+        f'ON follow.author_id = recipe.author_id '
+        f'WHERE recipe.id IN ({placeholders}) '
+        f'ON CONFLICT DO NOTHING',
+        recipe_ids,
+    )
+
+
+def copy_author_recipes(user_id, author_id):
+    execute(
+        f'INSERT INTO {TimelineEntry._meta.db_table} (user_id, recipe_id) '
+        f'SELECT %s, id FROM {Recipe._meta.db_table} '
+        f'WHERE author_id = %s '
+        f'ON CONFLICT DO NOTHING',
+        [user_id, author_id],
+    )
+
+
+def rebuild_timeline(user_ids=None):
+    """Собирает ленты user_ids (None - всех) заново по подпискам."""
+    entries = TimelineEntry.objects.all()
+    sql = (
+        f'INSERT INTO {TimelineEntry._meta.db_table} (user_id, recipe_id) '
+        f'SELECT follow.user_id, recipe.id '
+        f'FROM {Follow._meta.db_table} follow '
+        f'JOIN {Recipe._meta.db_table} recipe '
+        f'ON recipe.author_id = follow.author_id'
+    )
+    params = []
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        entries = entries.filter(user_id__in=user_ids)
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        sql += f' WHERE follow.user_id IN ({placeholders})'
+        params = user_ids
+    with transaction.atomic():
+        entries.delete()
+        execute(sql, params)
+
+
+def recipe_created(sender, instance, created, **kwargs):
+    if created and is_fanout():
+        fan_out_recipes([instance.pk])
+
+
+def follow_saved(sender, instance, created, **kwargs):
+    if created and is_fanout():
+        copy_author_recipes(instance.user_id, instance.author_id)
+
+
+def follow_deleted(sender, instance, **kwargs):
+    if is_fanout():
+        TimelineEntry.objects.filter(
+            user_id=instance.user_id,
+            recipe__author_id=instance.author_id,
+        ).delete()
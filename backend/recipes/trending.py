@@ -0,0 +1,126 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone as django_timezone
+
+from .models import FavoriteRecipe, ShoppingList, TrendingRecipe
+
+# Вклад события в рейтинг: добавление в корзину весомее избранного.
+SOURCES = (
+    (FavoriteRecipe, 1.0),
+    (ShoppingList, 1.5),
+)
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+BATCH_SIZE = 1000
+# Позиция - рейтинг с точностью до 1e-9: целое число точно переживает
+# сериализацию в курсор пагинации, в отличие от float.
+RANK_SCALE = 10 ** 9
+
+
+def get_decay_rate():
+    return math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+
+
+def event_score(created_at, weight, rate):
+    """Логарифм вклада события, приведённый к моменту EPOCH.
+
+    Вклад w * exp(-rate * (now - t)) при любом now отличается от
+    w * exp(rate * (t - EPOCH)) одним и тем же множителем, поэтому
+    порядок рецептов по сумме таких вкладов со временем не меняется
+    и хранимые рейтинги не нужно «состаривать». Логарифм не даёт
+    числам переполниться.
+    """
+    return math.log(weight) + rate * (created_at - EPOCH).total_seconds()
+
+
+def get_rank(score):
+    return round(score * RANK_SCALE)
+
+
+def log_add(first, second):
+    """log(exp(first) + exp(second)) без переполнения."""
+    high, low = max(first, second), min(first, second)
+    return high + math.log1p(math.exp(low - high))
+
+
+def collect_scores(since, until):
+    """Суммарные вклады событий (since, until] по рецептам."""
+    rate = get_decay_rate()
+    scores = {}
+    for model, weight in SOURCES:
+        events = model.objects.filter(
+            created_at__gt=since, created_at__lte=until,
+        ).values_list('recipe_id', 'created_at').order_by()
+        for recipe_id, created_at in events.iterator():
+            score = event_score(created_at, weight, rate)
+            previous = scores.get(recipe_id)
+            scores[recipe_id] = (
+                score if previous is None else log_add(previous, score)
+            )
+    return scores
+
+
+def refresh_trending(full=False, now=None):
+    """Пересчитывает таблицу TrendingRecipe.
+
+    Обычный запуск добавляет к рейтингам только события, появившиеся
+    после прошлого пересчёта (их находит индекс по created_at), и
+    убирает рецепты, которых не осталось ни в избранном, ни в корзинах
+    (по счётчикам рецепта). Частичные удаления он не видит: рейтинг
+    рецепта, который убрали из части избранного, остаётся завышенным
+    до полного пересчёта. Полный пересобирает таблицу по событиям за
+    TRENDING_WINDOW_DAYS и учитывает все удаления. События
+    моложе TRENDING_REFRESH_LAG секунд откладываются до следующего
+    запуска: их транзакции могли ещё не завершиться. Рецепты, чей
+    рейтинг упал ниже одного избранного на краю окна, удаляются,
+    так что размер таблицы зависит от активности, а не от числа
+    рецептов.
+    """
+    now = now or django_timezone.now()
+    until = now - timedelta(seconds=settings.TRENDING_REFRESH_LAG)
+    window_start = until - timedelta(days=settings.TRENDING_WINDOW_DAYS)
+    since = None
+    if not full:
+        since = TrendingRecipe.objects.aggregate(
+            last=Max('refreshed_at')
+        )['last']
+    full = since is None
+    if full:
+        since = window_start
+    scores = collect_scores(since, until)
+    with transaction.atomic():
+        if full:
+            TrendingRecipe.objects.all().delete()
+            created, updated = scores, {}
+        else:
+            existing = TrendingRecipe.objects.select_for_update().in_bulk(
+                list(scores)
+            )
+            created = {
+                recipe_id: score for recipe_id, score in scores.items()
+                if recipe_id not in existing
+            }
+            updated = existing
+            for recipe_id, row in existing.items():
+                row.score = log_add(row.score, scores[recipe_id])
+                row.rank = get_rank(row.score)
+                row.refreshed_at = until
+        TrendingRecipe.objects.bulk_create(
+            (TrendingRecipe(recipe_id=recipe_id, score=score,
+                            rank=get_rank(score), refreshed_at=until)
+             for recipe_id, score in created.items()),
+            batch_size=BATCH_SIZE,
+        )
+        TrendingRecipe.objects.bulk_update(
+            updated.values(), ('score', 'rank', 'refreshed_at'),
+            batch_size=BATCH_SIZE,
+        )
+        pruned, _ = TrendingRecipe.objects.filter(
+            Q(score__lt=event_score(window_start, 1.0, get_decay_rate()))
+            | Q(recipe__favorites_count=0, recipe__in_cart_count=0)
+        ).delete()
+    return {'full': full, 'events_since': since, 'created': len(created),
+            'updated': len(updated), 'pruned': pruned}
@@ -13,7 +13,10 @@ class UserAdmin(admin.ModelAdmin):
         'email',
         'password',
         'is_superuser',
+        'recipes_count',
+        'followers_count',
     )
+    readonly_fields = ('recipes_count', 'followers_count')
 
 
 @admin.register(Follow)
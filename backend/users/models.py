@@ -3,7 +3,16 @@ from django.db import models
 
 
 class User(AbstractUser):
-    pass
+    recipes_count = models.IntegerField(
+        verbose_name='Рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.IntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False,
+    )
 
 
 class Follow(models.Model):
@@ -1,3 +1,4 @@
+from api.fields import RecipeImageField
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from recipes.models import Recipe
 from rest_framework import serializers
@@ -5,6 +6,22 @@ from rest_framework import serializers
 from .models import Follow, User
 
 
+def get_followed_author_ids(request):
+    """id авторов, на которых подписан пользователь.
+
+    Загружаются одним запросом и кешируются на объекте запроса.
+    """
+    if not request or request.user.is_anonymous:
+        return frozenset()
+    followed_ids = getattr(request, '_followed_author_ids', None)
+    if followed_ids is None:
+        followed_ids = frozenset(Follow.objects.filter(
+            user=request.user
+        ).values_list('author_id', flat=True))
+        request._followed_author_ids = followed_ids
+    return followed_ids
+
+
 class CustomUserCreateSerializer(UserCreateSerializer):
 
     class Meta:
@@ -51,24 +68,22 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        return Follow.objects.filter(user=self.context['request'].user,
-                                     author=obj).exists()
+        return obj.id in get_followed_author_ids(self.context.get('request'))
 
 
 class FollowRecipeSerializer(serializers.ModelSerializer):
 
+    image = RecipeImageField('small')
+    image_webp = RecipeImageField('small', 'webp')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_webp', 'cooking_time')
 
 
 class FollowSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
     recipes = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = User
@@ -81,25 +96,22 @@ class FollowSerializer(serializers.ModelSerializer):
             'is_subscribed',
             'recipes',
             'recipes_count',
+            'followers_count',
         )
+        read_only_fields = ('recipes_count', 'followers_count')
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if not user:
-            return False
-        return Follow.objects.filter(user=user, author=obj).exists()
+        return obj.id in get_followed_author_ids(self.context.get('request'))
 
     def get_recipes(self, obj):
         request = self.context.get('request')
-        limit_recipes = request.query_params.get('recipes_limit')
-        if limit_recipes is not None:
-            recipes = obj.recipes.all()[:(int(limit_recipes))]
-        else:
-            recipes = obj.recipes.all()
+        recipes = getattr(obj, 'latest_recipes', None)
+        if recipes is None:
+            limit_recipes = request.query_params.get('recipes_limit')
+            if limit_recipes is not None:
+                recipes = obj.recipes.all()[:(int(limit_recipes))]
+            else:
+                recipes = obj.recipes.all()
         context = {'request': request}
         return FollowRecipeSerializer(recipes, many=True,
                                       context=context).data
-
-    @staticmethod
-    def get_recipes_count(obj):
-        return obj.recipes.count()
@@ -0,0 +1,73 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import Follow, User
+
+USERS_URL = '/api/users/?limit=100'
+RECIPES_URL = '/api/recipes/?limit=100'
+AUTHORS = 10
+
+
+class IsSubscribedQueriesTest(TestCase):
+    """is_subscribed берётся из одного запроса подписок, а не из
+    отдельного запроса на каждого пользователя."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com', password='-',
+            )
+            for number in range(AUTHORS)
+        ]
+        for number, author in enumerate(cls.authors):
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='-',
+                cooking_time=10, image='recipes/test.png',
+            )
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com', password='-'
+        )
+        cls.followed = {author.id for author in cls.authors[::3]}
+        for author_id in cls.followed:
+            Follow.objects.create(user=cls.reader, author_id=author_id)
+
+    def get(self, url, follow_queries, user=None):
+        client = APIClient()
+        if user:
+            client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sum('"users_follow"' in query['sql'] for query in queries),
+            follow_queries,
+        )
+        return response.data['results']
+
+    def test_users_list(self):
+        with self.assertNumQueries(3):
+            # COUNT(*), пользователи и подписки читателя.
+            users = self.get(USERS_URL, 1, self.reader)
+        self.assertEqual(len(users), AUTHORS + 1)
+        self.assertEqual(
+            {user['id'] for user in users if user['is_subscribed']},
+            self.followed,
+        )
+
+    def test_recipes_list(self):
+        recipes = self.get(RECIPES_URL, 1, self.reader)
+        self.assertEqual(len(recipes), AUTHORS)
+        self.assertEqual(
+            {recipe['author']['id'] for recipe in recipes
+             if recipe['author']['is_subscribed']},
+            self.followed,
+        )
+        # Аноним ни на кого не подписан, и подписки не читаются.
+        recipes = self.get(RECIPES_URL, 0)
+        self.assertFalse(any(recipe['author']['is_subscribed']
+                             for recipe in recipes))
@@ -0,0 +1,85 @@
+from contextlib import nullcontext
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import Follow, User
+
+URL = '/api/users/subscriptions/?limit={}&recipes_limit=3'
+CURSOR_URL = URL + '&pagination=cursor'
+AUTHORS = 20
+
+
+class SubscriptionsQueriesTest(TestCase):
+    """Подписки: число запросов не зависит от числа авторов и рецептов,
+    новые подписки идут первыми."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com', password='-',
+            )
+            for number in range(AUTHORS)
+        ]
+        for number, author in enumerate(cls.authors):
+            for recipe_number in range(number % 5 + 1):
+                Recipe.objects.create(
+                    author=author, name=f'Рецепт {number}-{recipe_number}',
+                    text='-', cooking_time=10, image='recipes/test.png',
+                )
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com', password='-'
+        )
+        # Порядок подписок не совпадает с порядком id авторов.
+        cls.followed = [cls.authors[(number * 7) % AUTHORS]
+                        for number in range(AUTHORS)]
+        for author in cls.followed:
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.single = User.objects.create_user(
+            username='single', email='single@example.com', password='-'
+        )
+        Follow.objects.create(user=cls.single, author=cls.authors[4])
+
+    def get(self, user, url, queries=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.assertNumQueries(queries) if queries else nullcontext():
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_query_count_does_not_depend_on_page(self):
+        # Авторы, их последние рецепты, подписки для is_subscribed и,
+        # в постраничном режиме, COUNT(*).
+        for url, queries in ((URL, 4), (CURSOR_URL, 3)):
+            with self.subTest(url=url):
+                data = self.get(self.single, url.format(AUTHORS), queries)
+                self.assertEqual(len(data['results']), 1)
+                data = self.get(self.reader, url.format(AUTHORS), queries)
+                self.assertEqual(len(data['results']), AUTHORS)
+
+    def test_latest_recipes(self):
+        data = self.get(self.reader, URL.format(AUTHORS))
+        for author in data['results']:
+            recipe_ids = list(Recipe.objects.filter(
+                author_id=author['id']
+            ).order_by('-id').values_list('id', flat=True)[:3])
+            self.assertEqual(
+                [recipe['id'] for recipe in author['recipes']], recipe_ids
+            )
+            self.assertTrue(author['is_subscribed'])
+
+    def test_newest_subscriptions_first(self):
+        expected = [author.id for author in reversed(self.followed)]
+        data = self.get(self.reader, URL.format(AUTHORS))
+        self.assertEqual([author['id'] for author in data['results']],
+                         expected)
+        url, walked = CURSOR_URL.format(3), []
+        while url:
+            data = self.get(self.reader, url)
+            walked += [author['id'] for author in data['results']]
+            url = data['next']
+        self.assertEqual(walked, expected)
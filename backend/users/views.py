@@ -1,10 +1,13 @@
 from api.pagination import LimitPageNumberPaginator
+from recipes.models import Recipe
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import IntegrityError
+from django.db.models import F
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import filters, permissions, status, viewsets
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
 from .models import Follow, User
@@ -52,8 +55,37 @@ class SubscriptionListView(viewsets.ReadOnlyModelViewSet):
     filter_backends = (filters.SearchFilter,)
     permission_classes = (permissions.IsAuthenticated,)
     search_fields = ('^following__user',)
+    # Новые подписки первыми и в постраничном, и в курсорном режиме.
+    cursor_ordering = '-subscription_id'
 
     def get_queryset(self):
         user = self.request.user
-        new_queryset = User.objects.filter(following__user=user)
+        new_queryset = User.objects.filter(
+            following__user=user
+        ).annotate(
+            subscription_id=F('following__id')
+        ).order_by('-subscription_id')
         return new_queryset
+
+    def get_recipes_limit(self):
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is None:
+            return None
+        try:
+            recipes_limit = int(recipes_limit)
+        except ValueError:
+            raise ValidationError('recipes_limit должен быть числом.')
+        if recipes_limit < 0:
+            raise ValidationError('recipes_limit не может быть меньше нуля.')
+        return recipes_limit
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is None:
+            return page
+        recipes = Recipe.objects.latest_per_author(
+            [author.id for author in page], self.get_recipes_limit()
+        )
+        for author in page:
+            author.latest_recipes = recipes[author.id]
+        return page